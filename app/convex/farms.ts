@@ -71,6 +71,37 @@ export const getByExternalId = query({
   },
 })
 
+/**
+ * Get the boundaries of several farms in one query (batched imagery check).
+ * Farms are matched by externalId, then legacyExternalId; unknown IDs are skipped.
+ */
+export const getGeometriesByExternalIds = query({
+  args: { externalIds: v.array(v.string()) },
+  handler: async (ctx, args) => {
+    const geometries = []
+
+    for (const externalId of args.externalIds) {
+      let farm = await ctx.db
+        .query('farms')
+        .withIndex('by_externalId', (q) => q.eq('externalId', externalId))
+        .first()
+
+      if (!farm) {
+        farm = await ctx.db
+          .query('farms')
+          .withIndex('by_legacyExternalId', (q: any) => q.eq('legacyExternalId', externalId))
+          .first()
+      }
+
+      if (farm) {
+        geometries.push({ externalId, geometry: farm.geometry })
+      }
+    }
+
+    return geometries
+  },
+})
+
 export const seedSampleFarm = mutation({
   args: {
     farmId: v.optional(v.string()),
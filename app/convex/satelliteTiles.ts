@@ -1,5 +1,7 @@
-import { v } from 'convex/values'
+import { v, type Infer } from 'convex/values'
+import type { Id } from './_generated/dataModel'
 import { internalQuery, mutation, query } from './_generated/server'
+import type { MutationCtx, QueryCtx } from './_generated/server'
 
 /**
  * Get a tile by its document ID. Internal-only (used by HTTP tile server).
@@ -386,93 +388,138 @@ export const createTile = mutation({
   },
 })
 
+const tileByExternalIdShape = {
+  farmExternalId: v.string(),
+  captureDate: v.string(),
+  provider: v.string(),
+  tileType: v.union(
+    v.literal('rgb'),
+    v.literal('ndvi'),
+    v.literal('ndvi_heatmap'),
+    v.literal('evi'),
+    v.literal('ndwi')
+  ),
+  r2Key: v.string(),
+  r2Url: v.string(),
+  bounds: v.object({
+    west: v.number(),
+    south: v.number(),
+    east: v.number(),
+    north: v.number(),
+  }),
+  cloudCoverPct: v.number(),
+  resolutionMeters: v.number(),
+  fileSizeBytes: v.number(),
+  expiresAt: v.optional(v.string()),
+}
+
+const tileByExternalIdValidator = v.object(tileByExternalIdShape)
+
+async function lookupFarmByExternalId(ctx: QueryCtx, farmExternalId: string) {
+  // Look up farm by external ID
+  const farm = await ctx.db
+    .query('farms')
+    .withIndex('by_externalId', (q) => q.eq('externalId', farmExternalId))
+    .first()
+  if (farm) {
+    return farm
+  }
+
+  // Also try legacy external ID
+  return await ctx.db
+    .query('farms')
+    .withIndex('by_legacyExternalId', (q) =>
+      q.eq('legacyExternalId', farmExternalId)
+    )
+    .first()
+}
+
+async function findFarmByExternalId(ctx: MutationCtx, farmExternalId: string) {
+  const farm = await lookupFarmByExternalId(ctx, farmExternalId)
+  if (!farm) {
+    throw new Error(`Farm not found with external ID: ${farmExternalId}`)
+  }
+  return farm
+}
+
+async function upsertTile(
+  ctx: MutationCtx,
+  farmId: Id<'farms'>,
+  args: Infer<typeof tileByExternalIdValidator>
+) {
+  // Check if tile already exists (upsert behavior)
+  const existing = await ctx.db
+    .query('satelliteImageTiles')
+    .withIndex('by_farm_date', (q) =>
+      q.eq('farmId', farmId).eq('captureDate', args.captureDate)
+    )
+    .filter((q) => q.eq(q.field('tileType'), args.tileType))
+    .first()
+
+  if (existing) {
+    // Update existing tile (including bounds in case they were corrected)
+    await ctx.db.patch(existing._id, {
+      r2Key: args.r2Key,
+      r2Url: args.r2Url,
+      bounds: args.bounds,
+      cloudCoverPct: args.cloudCoverPct,
+      fileSizeBytes: args.fileSizeBytes,
+      expiresAt: args.expiresAt,
+    })
+    return existing._id
+  }
+
+  // Create new tile
+  return await ctx.db.insert('satelliteImageTiles', {
+    farmId,
+    captureDate: args.captureDate,
+    provider: args.provider,
+    tileType: args.tileType,
+    r2Key: args.r2Key,
+    r2Url: args.r2Url,
+    bounds: args.bounds,
+    cloudCoverPct: args.cloudCoverPct,
+    resolutionMeters: args.resolutionMeters,
+    fileSizeBytes: args.fileSizeBytes,
+    createdAt: new Date().toISOString(),
+    expiresAt: args.expiresAt,
+  })
+}
+
 /**
  * Create a tile using farm external ID (for pipeline use).
  * Looks up the farm by external ID first.
  */
 export const createTileByExternalId = mutation({
+  args: tileByExternalIdShape,
+  handler: async (ctx, args) => {
+    const farm = await findFarmByExternalId(ctx, args.farmExternalId)
+    return await upsertTile(ctx, farm._id, args)
+  },
+})
+
+/**
+ * Create all tiles for a capture in one mutation (for pipeline use).
+ * Same upsert behavior as createTileByExternalId; returns tile IDs in input order.
+ */
+export const createTilesByExternalId = mutation({
   args: {
-    farmExternalId: v.string(),
-    captureDate: v.string(),
-    provider: v.string(),
-    tileType: v.union(
-      v.literal('rgb'),
-      v.literal('ndvi'),
-      v.literal('ndvi_heatmap'),
-      v.literal('evi'),
-      v.literal('ndwi')
-    ),
-    r2Key: v.string(),
-    r2Url: v.string(),
-    bounds: v.object({
-      west: v.number(),
-      south: v.number(),
-      east: v.number(),
-      north: v.number(),
-    }),
-    cloudCoverPct: v.number(),
-    resolutionMeters: v.number(),
-    fileSizeBytes: v.number(),
-    expiresAt: v.optional(v.string()),
+    tiles: v.array(tileByExternalIdValidator),
   },
   handler: async (ctx, args) => {
-    // Look up farm by external ID
-    let farm = await ctx.db
-      .query('farms')
-      .withIndex('by_externalId', (q) => q.eq('externalId', args.farmExternalId))
-      .first()
-
-    // Also try legacy external ID
-    if (!farm) {
-      farm = await ctx.db
-        .query('farms')
-        .withIndex('by_legacyExternalId', (q) =>
-          q.eq('legacyExternalId', args.farmExternalId)
-        )
-        .first()
-    }
-
-    if (!farm) {
-      throw new Error(`Farm not found with external ID: ${args.farmExternalId}`)
-    }
-
-    // Check if tile already exists (upsert behavior)
-    const existing = await ctx.db
-      .query('satelliteImageTiles')
-      .withIndex('by_farm_date', (q) =>
-        q.eq('farmId', farm._id).eq('captureDate', args.captureDate)
-      )
-      .filter((q) => q.eq(q.field('tileType'), args.tileType))
-      .first()
-
-    if (existing) {
-      // Update existing tile (including bounds in case they were corrected)
-      await ctx.db.patch(existing._id, {
-        r2Key: args.r2Key,
-        r2Url: args.r2Url,
-        bounds: args.bounds,
-        cloudCoverPct: args.cloudCoverPct,
-        fileSizeBytes: args.fileSizeBytes,
-        expiresAt: args.expiresAt,
-      })
-      return existing._id
+    const farmIds = new Map<string, Id<'farms'>>()
+    const ids: Id<'satelliteImageTiles'>[] = []
+
+    for (const tile of args.tiles) {
+      let farmId = farmIds.get(tile.farmExternalId)
+      if (!farmId) {
+        farmId = (await findFarmByExternalId(ctx, tile.farmExternalId))._id
+        farmIds.set(tile.farmExternalId, farmId)
+      }
+      ids.push(await upsertTile(ctx, farmId, tile))
     }
 
-    // Create new tile
-    return await ctx.db.insert('satelliteImageTiles', {
-      farmId: farm._id,
-      captureDate: args.captureDate,
-      provider: args.provider,
-      tileType: args.tileType,
-      r2Key: args.r2Key,
-      r2Url: args.r2Url,
-      bounds: args.bounds,
-      cloudCoverPct: args.cloudCoverPct,
-      resolutionMeters: args.resolutionMeters,
-      fileSizeBytes: args.fileSizeBytes,
-      createdAt: new Date().toISOString(),
-      expiresAt: args.expiresAt,
-    })
+    return ids
   },
 })
 
@@ -566,6 +613,81 @@ export const refreshTileUrl = mutation({
   },
 })
 
+/**
+ * Get the tile records of several farms in one query (for batched URL refresh).
+ * Unknown farm IDs are skipped. Every tile of every farm is read, so callers
+ * pass a small chunk of farms per call to stay within query read limits.
+ */
+export const getTileRefsForFarmsByExternalIds = query({
+  args: {
+    farmExternalIds: v.array(v.string()),
+  },
+  handler: async (ctx, args) => {
+    const refs = []
+
+    for (const farmExternalId of args.farmExternalIds) {
+      const farm = await lookupFarmByExternalId(ctx, farmExternalId)
+      if (!farm) continue
+
+      const tiles = await ctx.db
+        .query('satelliteImageTiles')
+        .withIndex('by_farm_date', (q) => q.eq('farmId', farm._id))
+        .collect()
+
+      for (const tile of tiles) {
+        refs.push({
+          _id: tile._id,
+          farmExternalId,
+          captureDate: tile.captureDate,
+          tileType: tile.tileType,
+          r2Key: tile.r2Key,
+          expiresAt: tile.expiresAt,
+        })
+      }
+    }
+
+    return refs
+  },
+})
+
+/**
+ * Set fresh URLs on many tiles by document ID (batched presigned URL refresh).
+ * expiresAt is left unchanged when omitted and cleared when null.
+ */
+export const refreshTileUrlsBatch = mutation({
+  args: {
+    updates: v.array(
+      v.object({
+        tileId: v.id('satelliteImageTiles'),
+        r2Url: v.string(),
+        expiresAt: v.optional(v.union(v.string(), v.null())),
+      })
+    ),
+  },
+  handler: async (ctx, args) => {
+    let updated = 0
+    let missing = 0
+
+    for (const update of args.updates) {
+      const tile = await ctx.db.get(update.tileId)
+      if (!tile) {
+        missing++
+        continue
+      }
+
+      const patch: Record<string, string | undefined> = { r2Url: update.r2Url }
+      if (update.expiresAt !== undefined) {
+        patch.expiresAt = update.expiresAt ?? undefined
+      }
+
+      await ctx.db.patch(tile._id, patch)
+      updated++
+    }
+
+    return { updated, missing }
+  },
+})
+
 /**
  * Refresh all tile URLs for a farm using a public URL base.
  * Constructs new URLs from the r2Key and the provided base URL.
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Planet Orders API.
+
+Serves the three endpoints PlanetScopeProvider uses with
+PLANET_DELIVERY_MODE=orders (create order, poll order, download results)
+from synthetic AOI-clipped GeoTIFFs, then drives PlanetScopeProvider.load()
+and cloud_mask() against it. No Planet account or network access is needed.
+
+Each order delivers, per item, an analytic scene, a UDM2 mask and a decoy
+GeoTIFF (legacy UDM) that the provider must ignore. The run fails if the
+loaded reflectance, the clear fraction from the order's UDM2, or the order
+request itself is not what the Orders path should produce.
+
+Usage (from the repository root, with the ingestion requirements installed):
+    python scripts/planet_orders_standin.py
+    python scripts/planet_orders_standin.py --items 3 --polls 2
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "ingestion"))
+
+from providers.planet_scope import PlanetScopeProvider  # noqa: E402
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Small AOI (about 1 km square) the order is clipped to
+DEFAULT_BBOX = [175.60, -40.36, 175.61, -40.35]
+
+# Analytic DN of band b (1-4) in item i: ANALYTIC_DN * (i + 1) + b
+ANALYTIC_DN = 1000
+
+# The decoy file holds this DN everywhere; seeing it in the output means it was loaded
+DECOY_DN = 9999
+
+# Fraction of columns (from the west) flagged clear in each UDM2 mask
+CLEAR_FRACTION = 0.5
+
+
+def _geotiff(data, bbox: list[float]) -> bytes:
+    """Encode a (bands, y, x) array as an EPSG:4326 GeoTIFF covering the bbox."""
+    from rasterio.io import MemoryFile
+    from rasterio.transform import from_bounds
+
+    count, height, width = data.shape
+    with MemoryFile() as memfile:
+        with memfile.open(
+            driver="GTiff",
+            count=count,
+            height=height,
+            width=width,
+            dtype=data.dtype,
+            crs="EPSG:4326",
+            transform=from_bounds(*bbox, width, height),
+        ) as dst:
+            dst.write(data)
+        return memfile.read()
+
+
+def build_order_files(item_ids: list[str], bbox: list[float], size: int = 64) -> dict[str, bytes]:
+    """
+    Build the files an analytic_udm2 order with the clip tool would deliver.
+
+    Args:
+        item_ids: Ordered item IDs
+        bbox: Clip AOI [west, south, east, north]
+        size: Width and height of the delivered rasters
+
+    Returns:
+        Dictionary mapping delivered file name to GeoTIFF bytes
+    """
+    import numpy as np
+
+    files = {}
+    for i, item_id in enumerate(item_ids):
+        analytic = np.stack([
+            np.full((size, size), ANALYTIC_DN * (i + 1) + band, dtype=np.uint16)
+            for band in range(1, 5)
+        ])
+        files[f"{item_id}_3B_AnalyticMS_clip.tif"] = _geotiff(analytic, bbox)
+
+        udm2 = np.zeros((8, size, size), dtype=np.uint8)
+        clear_cols = int(size * CLEAR_FRACTION)
+        udm2[0, :, :clear_cols] = 1
+        udm2[5, :, clear_cols:] = 1
+        files[f"{item_id}_3B_udm2_clip.tif"] = _geotiff(udm2, bbox)
+
+        decoy = np.full((4, size, size), DECOY_DN, dtype=np.uint16)
+        files[f"{item_id}_3B_AnalyticMS_DN_udm_clip.tif"] = _geotiff(decoy, bbox)
+
+    return files
+
+
+class OrdersRequestHandler(BaseHTTPRequestHandler):
+    """Serve POST /orders, GET /orders/{id} and GET /results/{id}/{name}."""
+
+    server: 'OrdersStandIn'
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"stand-in: {format % args}")
+
+    def _send_json(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _not_found(self) -> None:
+        self.server.unexpected.append(f"{self.command} {self.path}")
+        self._send_json(404, {"message": "not found"})
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != "/orders":
+            self._not_found()
+            return
+
+        length = int(self.headers.get("Content-Length", "0"))
+        request = json.loads(self.rfile.read(length))
+
+        with self.server.lock:
+            order_id = f"order-{len(self.server.orders) + 1}"
+            self.server.orders[order_id] = {"request": request, "polls": 0}
+
+        self._send_json(202, {"id": order_id, "state": "queued"})
+
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path).path.strip("/").split("/")
+
+        if len(parts) == 2 and parts[0] == "orders" and parts[1] in self.server.orders:
+            self._send_json(200, self._order_status(parts[1]))
+        elif len(parts) == 3 and parts[0] == "results" and parts[2] in self.server.files:
+            data = self.server.files[parts[2]]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/tiff")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._not_found()
+
+    def _order_status(self, order_id: str) -> dict:
+        with self.server.lock:
+            order = self.server.orders[order_id]
+            order["polls"] += 1
+            done = order["polls"] > self.server.polls_before_success
+
+        if not done:
+            return {"id": order_id, "state": "running"}
+
+        item_ids = order["request"]["products"][0]["item_ids"]
+        results = [
+            {
+                "name": f"{order_id}/PSScene/{name}",
+                "location": f"{self.server.base_url}/results/{order_id}/{name}",
+            }
+            for name in self.server.files
+            if any(name.startswith(f"{item_id}_") for item_id in item_ids)
+        ]
+        # Planet also delivers a manifest, which is not a scene file
+        results.append({"name": f"{order_id}/manifest.json", "location": f"{self.server.base_url}/manifest"})
+
+        return {"id": order_id, "state": "success", "_links": {"results": results}}
+
+
+class OrdersStandIn(ThreadingHTTPServer):
+    """Orders API stand-in serving a fixed set of delivered files."""
+
+    daemon_threads = True
+
+    def __init__(self, files: dict[str, bytes], polls_before_success: int = 1, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the stand-in.
+
+        Args:
+            files: Delivered file name -> bytes (see build_order_files)
+            polls_before_success: Status polls answered "running" before "success"
+            host: Listen address
+            port: Listen port (0 picks a free port)
+        """
+        super().__init__((host, port), OrdersRequestHandler)
+        self.files = files
+        self.polls_before_success = polls_before_success
+        self.orders: dict[str, dict] = {}
+        self.unexpected: list[str] = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def run_standin_check(items: int = 2, polls_before_success: int = 1, bbox: Optional[list[float]] = None) -> list[str]:
+    """
+    Drive PlanetScopeProvider.load() and cloud_mask() against the stand-in.
+
+    Args:
+        items: Number of items in the order
+        polls_before_success: Status polls before the order succeeds
+        bbox: AOI [west, south, east, north]
+
+    Returns:
+        List of failed checks (empty if the Orders path behaved as expected)
+    """
+    import numpy as np
+
+    bbox = bbox or DEFAULT_BBOX
+    item_ids = [f"20260101_1000{i:02d}_00_24a{i}" for i in range(items)]
+    query_items = [{"id": item_id, "item_type": "PSScene", "properties": {}} for item_id in item_ids]
+
+    server = OrdersStandIn(build_order_files(item_ids, bbox), polls_before_success)
+    threading.Thread(target=server.serve_forever, name="orders-standin", daemon=True).start()
+    logger.info(f"Planet Orders stand-in listening on {server.base_url}")
+
+    failures = []
+    try:
+        provider = PlanetScopeProvider(
+            api_key="standin-api-key",
+            delivery_mode="orders",
+            orders_url=f"{server.base_url}/orders",
+        )
+        provider.cache = None  # Always go through the order
+
+        data = provider.load(query_items, ["red", "nir"], bbox)
+        masked, cloud_free_pct = provider.cloud_mask(data, query_items, bbox)
+
+        if len(server.orders) != 1:
+            failures.append(f"expected one order, got {len(server.orders)}")
+        else:
+            request = next(iter(server.orders.values()))["request"]
+            if request["products"][0]["item_ids"] != item_ids:
+                failures.append(f"order item_ids {request['products'][0]['item_ids']} != {item_ids}")
+            tools = request.get("tools", [])
+            if not any("clip" in tool for tool in tools):
+                failures.append("order request has no clip tool")
+            # Tools apply to every asset, so interpolating would corrupt the UDM2 bit flags
+            for tool in tools:
+                kernel = tool.get("reproject", {}).get("kernel", "near")
+                if kernel != "near":
+                    failures.append(f"order reprojects the UDM2 with the {kernel!r} kernel")
+
+        if data.sizes.get("time") != items:
+            failures.append(f"loaded {data.sizes.get('time')} scenes, expected {items}")
+
+        for i in range(min(items, data.sizes.get("time", 0))):
+            expected = (ANALYTIC_DN * (i + 1) + 3) / 10000.0  # red is band 3
+            red = float(np.nanmedian(data.isel(time=i).sel(band="red").values))
+            if abs(red - expected) > 1e-4:
+                decoy = " (decoy file loaded)" if abs(red - DECOY_DN / 10000.0) < 1e-4 else ""
+                failures.append(f"scene {i} red reflectance {red:.4f}, expected {expected:.4f}{decoy}")
+
+        if abs(cloud_free_pct - CLEAR_FRACTION) > 0.05:
+            failures.append(f"clear fraction {cloud_free_pct:.2f}, expected {CLEAR_FRACTION:.2f} from order UDM2")
+
+        # cloud_mask must reuse the order's UDM2 instead of calling the Data API
+        failures.extend(f"unexpected request: {request}" for request in server.unexpected)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exercise the PlanetScope Orders delivery path against a local stand-in"
+    )
+    parser.add_argument("--items", type=int, default=2, help="Items in the order (default: 2)")
+    parser.add_argument(
+        "--polls",
+        type=int,
+        default=1,
+        help="Status polls answered 'running' before the order succeeds (default: 1)",
+    )
+    args = parser.parse_args()
+
+    failures = run_standin_check(items=args.items, polls_before_success=args.polls)
+    if failures:
+        for failure in failures:
+            logger.error(f"FAIL: {failure}")
+        raise SystemExit(1)
+
+    logger.info("Planet Orders path OK")
+
+
+if __name__ == "__main__":
+    main()
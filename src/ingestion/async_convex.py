@@ -0,0 +1,164 @@
+"""
+Asyncio wrapper around the Convex HTTP client.
+
+Each scheduler job needs the farm, its paddocks and its settings before the
+pipeline can start, and those used to be three sequential round-trips per
+job. AsyncConvexClient issues independent queries concurrently, and
+ConvexPrefetcher loads that data for the next few pending jobs in the
+background while the current jobs compute, so a job's overhead outside the
+pipeline is roughly its claim_job call.
+
+HTTP calls are made by the synchronous client on worker threads
+(asyncio.to_thread) over the shared keep-alive session, so no async HTTP
+library is needed.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Optional, TypedDict
+
+logger = logging.getLogger(__name__)
+
+# Pending jobs whose farm data is fetched ahead of time
+DEFAULT_PREFETCH = 4
+
+
+class FarmBundle(TypedDict):
+    """Convex documents needed to build a FarmConfig."""
+    farm: Optional[dict]
+    paddocks: list[dict]
+    settings: Optional[dict]
+
+
+class AsyncConvexClient:
+    """
+    Async facade over a synchronous ConvexClient.
+
+    Args:
+        client: ConvexClient (scheduler.py)
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    async def query(self, function_name: str, args: Optional[dict] = None) -> Any:
+        """Execute a Convex query without blocking the event loop."""
+        return await asyncio.to_thread(self.client._query, function_name, args)
+
+    async def mutation(self, function_name: str, args: Optional[dict] = None) -> Any:
+        """Execute a Convex mutation without blocking the event loop."""
+        return await asyncio.to_thread(self.client._mutation, function_name, args)
+
+    async def get_farm_bundle(self, farm_external_id: str) -> FarmBundle:
+        """
+        Fetch a farm, its paddocks and its settings concurrently.
+
+        Args:
+            farm_external_id: Farm external ID
+
+        Returns:
+            FarmBundle for the farm
+        """
+        farm, paddocks, settings = await asyncio.gather(
+            asyncio.to_thread(self.client.get_farm, farm_external_id),
+            asyncio.to_thread(self.client.get_paddocks, farm_external_id),
+            asyncio.to_thread(self.client.get_settings, farm_external_id),
+        )
+        return FarmBundle(farm=farm, paddocks=paddocks or [], settings=settings)
+
+
+class ConvexPrefetcher:
+    """
+    Fetch FarmBundles for upcoming jobs on a background event loop.
+
+    Bundles are requested in job order, at most `lookahead` ahead of the jobs
+    that have started, so data is fetched shortly before it is needed rather
+    than all at once at the start of a long run.
+    """
+
+    def __init__(self, client: AsyncConvexClient, farm_ids: list[str], lookahead: int = DEFAULT_PREFETCH):
+        """
+        Start prefetching.
+
+        Args:
+            client: Async Convex client
+            farm_ids: Farm external IDs in the order their jobs will run
+            lookahead: Number of bundles kept in flight ahead of running jobs
+        """
+        self.client = client
+        self.lookahead = max(0, lookahead)
+
+        self._pending = list(dict.fromkeys(farm_ids))
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="convex-prefetch", daemon=True)
+        self._thread.start()
+
+        with self._lock:
+            self._fill()
+
+    def _schedule(self, farm_id: str) -> Future:
+        future = asyncio.run_coroutine_threadsafe(self.client.get_farm_bundle(farm_id), self._loop)
+        self._futures[farm_id] = future
+        return future
+
+    def _fill(self) -> None:
+        """Keep `lookahead` bundles in flight; the caller holds self._lock."""
+        while self._pending and len(self._futures) < self.lookahead:
+            farm_id = self._pending.pop(0)
+            if farm_id not in self._futures:
+                self._schedule(farm_id)
+
+    def get(self, farm_external_id: str, timeout: Optional[float] = None) -> FarmBundle:
+        """
+        Get a farm's bundle, waiting for (or starting) its fetch.
+
+        Args:
+            farm_external_id: Farm external ID
+            timeout: Seconds to wait for the fetch
+
+        Returns:
+            FarmBundle for the farm
+
+        Raises:
+            Exception: Whatever the underlying Convex queries raised
+        """
+        with self._lock:
+            future = self._futures.pop(farm_external_id, None)
+            if future is None:
+                if farm_external_id in self._pending:
+                    self._pending.remove(farm_external_id)
+                future = self._schedule(farm_external_id)
+                self._futures.pop(farm_external_id)
+            self._fill()
+
+        return future.result(timeout=timeout)
+
+    def discard(self, farm_external_id: str) -> None:
+        """Drop a farm's bundle whose job will not run (e.g. claimed elsewhere)."""
+        with self._lock:
+            future = self._futures.pop(farm_external_id, None)
+            if future is not None:
+                future.cancel()
+            self._fill()
+
+    def close(self) -> None:
+        """Cancel outstanding fetches and stop the event loop."""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._pending.clear()
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def __enter__(self) -> 'ConvexPrefetcher':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
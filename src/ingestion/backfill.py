@@ -0,0 +1,231 @@
+"""
+Concurrent, resumable historical backfill.
+
+A 2-year backfill is about 52 overlapping date windows, each a full
+run_pipeline_for_farm, and running them one after another made onboarding
+a farm take hours. run_backfill processes windows on a bounded thread pool
+(compositing, warping and encoding release the GIL); provider calls are
+still capped per provider by providers.provider_slot, so parallel windows
+do not multiply the load on Copernicus or Planet.
+
+Each completed window is recorded in a per-farm JSON checkpoint. The
+checkpoint also pins the end date the windows were generated from, so a
+crashed or interrupted backfill regenerates the same windows and only runs
+the ones that did not complete. Windows without any imagery (cloudy or no
+acquisitions) are checkpointed as empty rather than retried forever.
+
+Concurrent windows share the process's memory: each one holds its own
+composite, index cube and tiles. The composite memory budget and worker
+processes are split across the windows, but the rest of each window's
+peak is not, so expect up to `workers` times a single run's peak outside
+compositing.
+"""
+import dataclasses
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Optional
+
+from config import FarmConfig, PipelineConfig
+
+if TYPE_CHECKING:
+    from observation_types import ObservationRecord
+    from pipeline import PipelineResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = "cache/backfill"
+
+# Days between window end dates (windows overlap by window_days - step)
+BACKFILL_STEP_DAYS = 14
+
+
+class BackfillCheckpoint:
+    """
+    Completed windows of one farm's backfill, persisted as JSON.
+
+    Writes go to a temporary file that replaces the checkpoint, so a crash
+    mid-write never leaves a corrupt checkpoint behind.
+    """
+
+    def __init__(self, farm_external_id: str, years: int, checkpoint_dir: Optional[str] = None):
+        """
+        Load (or start) the checkpoint for a farm's backfill.
+
+        Args:
+            farm_external_id: Farm external ID
+            years: Backfill period; backfills of different lengths are tracked separately
+            checkpoint_dir: Directory (defaults to BACKFILL_CHECKPOINT_DIR env var, then cache/backfill)
+        """
+        checkpoint_dir = checkpoint_dir or os.getenv("BACKFILL_CHECKPOINT_DIR", DEFAULT_CHECKPOINT_DIR)
+        self.path = os.path.join(checkpoint_dir, f"{farm_external_id}_{years}y.json")
+
+        self._lock = threading.Lock()
+        self._state = {"end_date": None, "completed": {}}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._state.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable backfill checkpoint {self.path}: {e}")
+
+    @staticmethod
+    def _window_key(window: tuple[str, str]) -> str:
+        return f"{window[0]}:{window[1]}"
+
+    @property
+    def end_date(self) -> Optional[datetime]:
+        """End date the backfill's windows were generated from, if started."""
+        value = self._state.get("end_date")
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+    def start(self, end_date: datetime) -> None:
+        """Pin the windows' end date for a new backfill."""
+        with self._lock:
+            self._state = {"end_date": end_date.strftime("%Y-%m-%d"), "completed": {}}
+            self._save()
+
+    def is_complete(self, window: tuple[str, str]) -> bool:
+        """Check whether a window completed in an earlier run."""
+        with self._lock:
+            return self._window_key(window) in self._state["completed"]
+
+    def mark_complete(self, window: tuple[str, str], valid_observations: int, empty: bool = False) -> None:
+        """Record a completed window; empty windows had no imagery at all."""
+        with self._lock:
+            self._state["completed"][self._window_key(window)] = {
+                "valid_observations": valid_observations,
+                "empty": empty,
+                "completed_at": datetime.now().isoformat(),
+            }
+            self._save()
+
+    def _save(self) -> None:
+        """Write the checkpoint atomically; the caller holds self._lock."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def run_backfill(
+    farm_config: FarmConfig,
+    years: int,
+    pipeline_config: PipelineConfig,
+    convex_writer: Optional[Callable[[list['ObservationRecord']], int]] = None,
+    workers: int = 4,
+    resume: bool = True,
+    checkpoint_dir: Optional[str] = None,
+) -> list['PipelineResult']:
+    """
+    Run a farm's historical backfill across date windows concurrently.
+
+    Args:
+        farm_config: Farm configuration
+        years: Number of years to backfill
+        pipeline_config: Pipeline configuration
+        convex_writer: Optional function to write observations to Convex
+        workers: Windows processed at once (the composite memory budget and
+                 workers in pipeline_config are split between them)
+        resume: Skip windows completed by a previous run (otherwise start over)
+        checkpoint_dir: Checkpoint directory override
+
+    Returns:
+        PipelineResult for each window with imagery completed in this run, most recent first
+    """
+    from pipeline import NoImageryError, get_historical_windows, run_pipeline_for_farm
+
+    checkpoint = BackfillCheckpoint(farm_config.external_id, years, checkpoint_dir)
+    end_date = checkpoint.end_date if resume else None
+    if end_date is None:
+        end_date = datetime.now()
+        checkpoint.start(end_date)
+
+    windows = get_historical_windows(
+        years=years,
+        window_days=pipeline_config.composite_window_days,
+        step_days=BACKFILL_STEP_DAYS,
+        end_date=end_date,
+    )
+    pending = [window for window in windows if not checkpoint.is_complete(window)]
+
+    logger.info(f"Starting historical backfill for {farm_config.name}")
+    logger.info(f"  Backfill period: {years} years (windows ending {end_date.strftime('%Y-%m-%d')})")
+    logger.info(
+        f"  {len(windows)} date windows, {len(windows) - len(pending)} already complete, "
+        f"{len(pending)} to process with {workers} workers"
+    )
+
+    # Concurrent windows share the composite budget instead of each taking all of it
+    workers = max(1, workers)
+    window_config = dataclasses.replace(
+        pipeline_config,
+        composite_memory_budget_mb=max(1, pipeline_config.composite_memory_budget_mb // workers),
+        composite_workers=max(1, pipeline_config.composite_workers // workers),
+    )
+
+    def run_window(window: tuple[str, str]) -> Optional['PipelineResult']:
+        try:
+            result = run_pipeline_for_farm(
+                farm_config=farm_config,
+                pipeline_config=window_config,
+                convex_writer=convex_writer,
+                date_range=window,
+            )
+        except NoImageryError:
+            # Nothing to retry: no provider has imagery for this window
+            checkpoint.mark_complete(window, 0, empty=True)
+            return None
+        # run_pipeline_for_farm logs and swallows Convex write errors; a
+        # window whose observations were not stored must be retried
+        if result['convex_written'] is False:
+            raise RuntimeError("observations were not written to Convex")
+        checkpoint.mark_complete(window, result['valid_observations'])
+        return result
+
+    results: dict[tuple[str, str], 'PipelineResult'] = {}
+    failed = 0
+    empty = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as executor:
+        futures = {executor.submit(run_window, window): window for window in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            start_date, window_end = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"  Window {start_date} to {window_end} failed: {e}")
+                continue
+
+            if result is None:
+                empty += 1
+                logger.info(f"  Window {start_date} to {window_end} has no imagery ({done}/{len(pending)})")
+                continue
+
+            results[futures[future]] = result
+            logger.info(
+                f"  Window {start_date} to {window_end} complete ({done}/{len(pending)}): "
+                f"{result['valid_observations']}/{result['total_paddocks']} valid"
+            )
+
+    ordered = [results[window] for window in pending if window in results]
+
+    logger.info(f"\n{'='*40}")
+    logger.info("Historical backfill complete")
+    logger.info(
+        f"  Processed {len(ordered)}/{len(pending)} windows successfully "
+        f"({empty} without imagery, {failed} failed)"
+    )
+    if failed:
+        logger.info("  Re-run the backfill to retry failed windows")
+    total_observations = sum(r['valid_observations'] for r in ordered)
+    logger.info(f"  Total valid observations: {total_observations}")
+    logger.info(f"{'='*40}")
+
+    return ordered
@@ -0,0 +1,111 @@
+"""
+Lookup-table colorization of index rasters for heatmap tiles.
+
+A color ramp (value stops with RGB colors, linearly interpolated between
+stops) is rendered once into an RGBA lookup table. Colorizing an array is
+then a single quantize-and-take instead of a masked assignment per ramp
+segment and channel.
+"""
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ColorRamp = list[tuple[float, tuple[int, int, int]]]
+
+# Entries in each lookup table (the step is (max - min) / (size - 1))
+LUT_SIZE = 1024
+
+# NDVI color ramp matching frontend NDVIHeatmapLayer.tsx
+# Brown (low/bare) -> Yellow (sparse) -> Light Green (moderate) -> Dark Green (healthy)
+NDVI_COLOR_RAMP: ColorRamp = [
+    (-0.2, (139, 69, 19)),    # Brown #8B4513 (bare soil/water)
+    (0.0, (210, 105, 30)),    # Sienna #D2691E
+    (0.2, (218, 165, 32)),    # Goldenrod #DAA520
+    (0.3, (255, 215, 0)),     # Yellow #FFD700
+    (0.4, (154, 205, 50)),    # Yellow-green #9ACD32
+    (0.5, (124, 252, 0)),     # Light green #7CFC00
+    (0.6, (50, 205, 50)),     # Lime green #32CD32
+    (0.7, (34, 139, 34)),     # Forest green #228B22
+    (0.8, (0, 100, 0)),       # Dark green #006400
+]
+
+# EVI covers roughly the same range as NDVI for pasture
+EVI_COLOR_RAMP: ColorRamp = NDVI_COLOR_RAMP
+
+# NDWI: dry (tan) -> moist (light blue) -> open water (dark blue)
+NDWI_COLOR_RAMP: ColorRamp = [
+    (-0.6, (166, 124, 82)),   # Tan #A67C52 (dry vegetation/soil)
+    (-0.3, (222, 203, 164)),  # Wheat #DECBA4
+    (0.0, (224, 243, 248)),   # Pale blue #E0F3F8
+    (0.2, (116, 173, 209)),   # Light blue #74ADD1
+    (0.4, (69, 117, 180)),    # Blue #4575B4
+    (0.6, (49, 54, 149)),     # Dark blue #313695 (open water)
+]
+
+COLOR_RAMPS: dict[str, ColorRamp] = {
+    "ndvi": NDVI_COLOR_RAMP,
+    "evi": EVI_COLOR_RAMP,
+    "ndwi": NDWI_COLOR_RAMP,
+}
+
+
+@lru_cache(maxsize=16)
+def _build_lut(ramp: tuple[tuple[float, tuple[int, int, int]], ...], size: int) -> 'np.ndarray':
+    """Render a ramp into (size + 1, 4) uint8 RGBA; the last entry is transparent for NaN."""
+    import numpy as np
+
+    stops = np.array([value for value, _ in ramp], dtype=np.float64)
+    colors = np.array([color for _, color in ramp], dtype=np.float64)
+    values = np.linspace(stops[0], stops[-1], size)
+
+    lut = np.zeros((size + 1, 4), dtype=np.uint8)
+    for c in range(3):
+        lut[:size, c] = np.round(np.interp(values, stops, colors[:, c]))
+    lut[:size, 3] = 255
+
+    lut.setflags(write=False)
+    return lut
+
+
+def get_lut(ramp: ColorRamp, size: int = LUT_SIZE) -> 'np.ndarray':
+    """
+    Get the (cached) RGBA lookup table for a ramp.
+
+    Args:
+        ramp: (value, (r, g, b)) stops in ascending value order
+        size: Number of entries between the first and last stop
+
+    Returns:
+        Read-only (size + 1, 4) uint8 array; entry `size` is fully transparent
+    """
+    return _build_lut(tuple((float(v), tuple(c)) for v, c in ramp), size)
+
+
+def colorize(values: 'np.ndarray', ramp: ColorRamp, size: int = LUT_SIZE) -> 'np.ndarray':
+    """
+    Map index values to RGBA colors.
+
+    Values outside the ramp take the color of the nearest end stop; NaN
+    pixels are transparent.
+
+    Args:
+        values: 2D array of index values
+        ramp: (value, (r, g, b)) stops in ascending value order
+        size: Lookup table size
+
+    Returns:
+        (H, W, 4) uint8 RGBA array
+    """
+    import numpy as np
+
+    lut = get_lut(ramp, size)
+    vmin, vmax = ramp[0][0], ramp[-1][0]
+
+    scaled = (np.asarray(values, dtype=np.float32) - vmin) * ((size - 1) / (vmax - vmin))
+    np.clip(scaled, 0, size - 1, out=scaled)
+    np.rint(scaled, out=scaled)
+    scaled[np.isnan(scaled)] = size
+
+    return lut.take(scaled.astype(np.intp), axis=0)
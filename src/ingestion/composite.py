@@ -4,6 +4,8 @@ Time-series compositing for satellite imagery.
 Creates cloud-free composite images from multiple observations over a time window.
 Uses median compositing for robustness to outliers.
 """
+import os
+import warnings
 from typing import TYPE_CHECKING, Literal, TypedDict
 
 import numpy as np
@@ -25,7 +27,9 @@ class CompositeResult(TypedDict):
 def create_median_composite(
     data_stack: xr.DataArray,
     valid_mask: xr.DataArray | None = None,
-    min_valid_observations: int = 1
+    min_valid_observations: int = 1,
+    memory_budget_mb: int | None = None,
+    workers: int = 1,
 ) -> CompositeResult:
     """
     Create a median composite from a stack of images.
@@ -33,6 +37,9 @@ def create_median_composite(
     For each pixel, the median value across all valid observations is used.
     This is robust to outliers (clouds, shadows, anomalies).
 
+    If memory_budget_mb is set and the stack is larger than the budget, the
+    composite is computed out of core by create_median_composite_chunked.
+
     Args:
         data_stack: xarray DataArray with time dimension
                     Shape should be (time, band, y, x) or (time, y, x)
@@ -40,6 +47,8 @@ def create_median_composite(
                     If None, assumes all pixels are valid
         min_valid_observations: Minimum number of valid observations required
                                 for a pixel to be included
+        memory_budget_mb: Optional memory budget; larger stacks are chunked
+        workers: Worker processes for the chunked path
 
     Returns:
         CompositeResult with composite data and metadata
@@ -47,6 +56,15 @@ def create_median_composite(
     if data_stack.size == 0:
         raise ValueError("Empty data stack provided")
 
+    if memory_budget_mb is not None and data_stack.nbytes > memory_budget_mb * 1024 * 1024:
+        return create_median_composite_chunked(
+            data_stack,
+            valid_mask=valid_mask,
+            min_valid_observations=min_valid_observations,
+            memory_budget_mb=memory_budget_mb,
+            workers=workers,
+        )
+
     # Determine if we have band dimension
     has_bands = len(data_stack.dims) == 4 and "band" in data_stack.dims
     time_dim = "time"
@@ -104,6 +122,281 @@ def create_median_composite(
     )
 
 
+class TimeStack:
+    """
+    A (time, band, y, x) float32 stack spilled to a disk memmap slice by slice.
+
+    Providers that implement load_stack write each date's slice here as soon
+    as it is loaded, so a stack larger than memory is never assembled in RAM;
+    create_median_composite_from_stack then reduces it block by block. Slots
+    for max_time slices are preallocated, but the .npy file is sparse, so
+    unused slots take no disk. Writes are thread-safe.
+
+    Use as a context manager; the temporary file is removed on exit.
+    """
+
+    def __init__(self, max_time: int, tmp_dir: str | None = None):
+        """
+        Create an empty stack.
+
+        Args:
+            max_time: Maximum number of time slices (e.g. the number of items loaded)
+            tmp_dir: Directory for the memmap (defaults to the system temp dir)
+        """
+        import tempfile
+        import threading
+
+        self.max_time = max_time
+        self.bands: list[str] = []
+        self.coords: dict = {}
+        self.attrs: dict = {}
+        self.labels: list[str] = []
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="composite_", dir=tmp_dir)
+        self.path = os.path.join(self._tmpdir.name, "stack.npy")
+        self._memmap: np.memmap | None = None
+        self._slots: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, bands: list[str], y: np.ndarray, x: np.ndarray, attrs: dict | None = None) -> None:
+        """
+        Create the memmap for a grid; called once by the provider before writing.
+
+        Args:
+            bands: Band names of each slice
+            y: y coordinates (pixel centers)
+            x: x coordinates (pixel centers)
+            attrs: Attributes for the composite (e.g. crs)
+        """
+        self.bands = list(bands)
+        self.coords = {"band": self.bands, "y": y, "x": x}
+        self.attrs = dict(attrs or {})
+        self._memmap = np.lib.format.open_memmap(
+            self.path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(self.max_time, len(self.bands), len(y), len(x)),
+        )
+
+    def write(self, label: str, values: np.ndarray) -> None:
+        """
+        Write one (band, y, x) time slice.
+
+        A label already in the stack is mosaicked: the new values only fill
+        that slice's NaN pixels (products of one date on adjacent tiles).
+        """
+        with self._lock:
+            slot = self._slots.get(label)
+            if slot is not None:
+                existing = self._memmap[slot]
+                np.copyto(existing, values, where=np.isnan(existing))
+                return
+            if len(self.labels) >= self.max_time:
+                raise ValueError(f"TimeStack is full ({self.max_time} slices)")
+            self._slots[label] = len(self.labels)
+            self.labels.append(label)
+            self._memmap[self._slots[label]] = values
+
+    def mask(self, label: str, valid: np.ndarray) -> None:
+        """Set the pixels of one slice where valid (y, x) is False to NaN in every band."""
+        with self._lock:
+            self._memmap[self._slots[label], :, ~valid] = np.nan
+
+    @property
+    def n_time(self) -> int:
+        """Number of slices written."""
+        return len(self.labels)
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """Shape of the written part of the stack."""
+        if self._memmap is None:
+            return (0,)
+        return (self.n_time, *self._memmap.shape[1:])
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Data type of the stack (always float32)."""
+        return np.dtype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the written part of the stack on disk."""
+        return int(np.prod(self.shape, dtype=np.int64)) * 4
+
+    def flush(self) -> None:
+        """Flush pending writes so worker processes can read the file."""
+        if self._memmap is not None:
+            self._memmap.flush()
+
+    def close(self) -> None:
+        """Release the memmap and delete the temporary file."""
+        self._memmap = None
+        self._tmpdir.cleanup()
+
+    def __enter__(self) -> 'TimeStack':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def create_median_composite_chunked(
+    data_stack: xr.DataArray,
+    valid_mask: xr.DataArray | None = None,
+    min_valid_observations: int = 1,
+    memory_budget_mb: int = 512,
+    workers: int = 1,
+) -> CompositeResult:
+    """
+    Create a median composite out of core from an in-memory stack.
+
+    The stack is written time slice by time slice into a TimeStack (invalid
+    observations set to NaN on the way) and reduced by
+    create_median_composite_from_stack. Loaders that can write a TimeStack
+    directly should do so instead, so the stack is never held in memory.
+
+    Args:
+        data_stack: xarray DataArray with time dimension
+                    Shape should be (time, band, y, x) or (time, y, x)
+        valid_mask: Boolean mask where True = valid pixel for that observation
+                    (time, y, x). If None, NaN pixels are the only invalid ones
+        min_valid_observations: Minimum number of valid observations required
+                                for a pixel to be included
+        memory_budget_mb: Approximate peak memory for block processing
+        workers: Number of worker processes (1 = reduce in this process)
+
+    Returns:
+        CompositeResult with composite data and metadata
+    """
+    if data_stack.size == 0:
+        raise ValueError("Empty data stack provided")
+
+    has_bands = len(data_stack.dims) == 4 and "band" in data_stack.dims
+    if has_bands:
+        stack = data_stack.transpose("time", "band", "y", "x")
+        bands = list(stack.coords["band"].values) if "band" in stack.coords else list(range(stack.sizes["band"]))
+    else:
+        stack = data_stack.transpose("time", "y", "x").expand_dims("band", axis=1)
+        bands = ["value"]
+    mask = valid_mask.transpose("time", "y", "x") if valid_mask is not None else None
+
+    with TimeStack(stack.sizes["time"]) as spill:
+        spill.allocate(bands, stack.coords["y"].values, stack.coords["x"].values, attrs=data_stack.attrs)
+        for t in range(stack.sizes["time"]):
+            values = stack.isel(time=t).values.astype(np.float32)
+            if mask is not None:
+                values[:, ~mask.isel(time=t).values.astype(bool)] = np.nan
+            spill.write(str(t), values)
+
+        result = create_median_composite_from_stack(
+            spill,
+            min_valid_observations=min_valid_observations,
+            memory_budget_mb=memory_budget_mb,
+            workers=workers,
+        )
+
+    if not has_bands:
+        result["composite"] = result["composite"].isel(band=0, drop=True)
+    result["source_dates"] = [str(t) for t in data_stack.coords["time"].values] if "time" in data_stack.coords else []
+    return result
+
+
+def create_median_composite_from_stack(
+    stack: TimeStack,
+    min_valid_observations: int = 1,
+    memory_budget_mb: int = 512,
+    workers: int = 1,
+) -> CompositeResult:
+    """
+    Create a median composite from a TimeStack, one spatial block at a time.
+
+    Cloudy and out-of-footprint observations must already be NaN in the
+    stack; an observation counts as valid where any of its bands is finite.
+    The stack is reduced in row blocks sized so that a block plus the
+    working memory np.nanmedian needs for it fits in the memory budget. Blocks can be reduced on a
+    process pool; workers reopen the memmap by path so no block data is
+    pickled.
+
+    Args:
+        stack: TimeStack with at least one slice written
+        min_valid_observations: Minimum number of valid observations required
+                                for a pixel to be included
+        memory_budget_mb: Approximate peak memory for block processing
+        workers: Number of worker processes (1 = reduce in this process)
+
+    Returns:
+        CompositeResult with composite (band, y, x) and metadata
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if stack.n_time == 0:
+        raise ValueError("Empty data stack provided")
+
+    stack.flush()
+    n_time, n_bands, height, width = stack.shape
+
+    # Rows per block: float32 block values plus np.nanmedian's working memory
+    # (about 4x the block for its NaN mask, masked copy and partial sort)
+    bytes_per_row = n_time * n_bands * width * 4 * 5
+    rows_per_block = max(1, min(height, (memory_budget_mb * 1024 * 1024) // max(bytes_per_row, 1)))
+
+    blocks = [(y0, min(y0 + rows_per_block, height)) for y0 in range(0, height, rows_per_block)]
+    composite = np.empty((n_bands, height, width), dtype=np.float32)
+    valid_count = np.empty((height, width), dtype=np.int32)
+
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_median_block, stack.path, n_time, y0, y1)
+                for y0, y1 in blocks
+            ]
+            for (y0, y1), future in zip(blocks, futures):
+                composite[:, y0:y1, :], valid_count[y0:y1] = future.result()
+    else:
+        for y0, y1 in blocks:
+            composite[:, y0:y1, :], valid_count[y0:y1] = _median_block(stack.path, n_time, y0, y1)
+
+    # Apply minimum valid observations threshold
+    valid_pixels = valid_count >= min_valid_observations
+    composite[:, ~valid_pixels] = np.nan
+
+    return CompositeResult(
+        composite=xr.DataArray(composite, dims=["band", "y", "x"], coords=stack.coords, attrs=stack.attrs),
+        valid_pixel_count=int(valid_pixels.sum()),
+        total_pixel_count=int(valid_pixels.size),
+        source_dates=sorted(stack.labels),
+        source_count=n_time,
+    )
+
+
+def _median_block(
+    stack_path: str,
+    n_time: int,
+    y0: int,
+    y1: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce rows y0:y1 of the first n_time slices of a memmapped (time, band, y, x) stack.
+
+    Runs in worker processes, so it only takes paths and row bounds.
+
+    Returns:
+        Tuple of (NaN-aware median over time, valid observation count per pixel)
+    """
+    stack = np.load(stack_path, mmap_mode="r")
+    block = np.array(stack[:n_time, :, y0:y1, :])
+
+    # Masked observations are NaN in every band; count the ones with any finite band
+    count = np.isfinite(block).any(axis=1).sum(axis=0, dtype=np.int32)
+
+    # nanmedian partitions (partial sort) the time axis, ignoring NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN pixels
+        median = np.nanmedian(block, axis=0, overwrite_input=True)
+
+    return median.astype(np.float32, copy=False), count
+
+
 def resample_to_resolution(
     data: xr.DataArray,
     target_resolution: int,
@@ -292,46 +585,134 @@ def merge_providers(
         raise ValueError(f"Unknown merge method: {merge_method}")
 
 
-def compute_ndvi(data: xr.DataArray) -> xr.DataArray:
+# Spectral indices computed by compute_index_cube, with the bands each needs
+INDEX_BANDS = {
+    "ndvi": ("nir", "red"),
+    "evi": ("nir", "red", "blue"),
+    "ndwi": ("nir", "swir"),
+}
+
+# Sentinel-2 band IDs accepted in place of semantic names
+_BAND_ALIASES = {"nir": "B08", "red": "B04", "blue": "B02", "swir": "B11"}
+
+
+def compute_index_cube(
+    data: xr.DataArray,
+    indices: list[str] | None = None,
+    g: float = 2.5,
+    c1: float = 6.0,
+    c2: float = 7.5,
+    l: float = 1.0,
+) -> xr.DataArray:
     """
-    Compute NDVI from NIR and Red bands.
+    Compute spectral indices in a single pass into a banded index cube.
+
+    Each band is read once as float32 and every index is written into a
+    preallocated float32 output using in-place ufuncs, so the composite is
+    not re-sliced or upcast per index. Non-finite results (zero denominators)
+    become NaN.
+
+    NDVI = (NIR - Red) / (NIR + Red)
+    EVI  = G * (NIR - Red) / (NIR + C1*Red - C2*Blue + L)
+    NDWI = (NIR - SWIR) / (NIR + SWIR)
 
     Args:
-        data: DataArray with band dimension including "nir" and "red"
+        data: DataArray with band dimension (nir, red and optionally blue, swir)
+        indices: Indices to compute. If None, computes every index whose
+                 bands are available (NDVI is always required).
+        g: EVI gain factor (default 2.5)
+        c1: EVI coefficient 1 for aerosol resistance (default 6.0)
+        c2: EVI coefficient 2 for aerosol resistance (default 7.5)
+        l: EVI canopy background adjustment (default 1.0)
 
     Returns:
-        NDVI DataArray
+        float32 DataArray with dims (index, y, x), index coordinate naming
+        each layer, and the input attrs (e.g. crs)
     """
     if "band" not in data.dims:
         raise ValueError("Data must have 'band' dimension")
 
-    # Get NIR and Red bands
-    band_names = data.coords.get("band", list(range(data.sizes["band"])))
-
-    try:
-        nir_idx = list(band_names).index("nir")
-        red_idx = list(band_names).index("red")
-    except ValueError as e:
-        # Try alternative naming
-        try:
-            nir_idx = list(band_names).index("B08") if "B08" in band_names else None
-            red_idx = list(band_names).index("B04") if "B04" in band_names else None
-            if nir_idx is None or red_idx is None:
-                raise e
-        except (ValueError, TypeError):
+    band_names = list(data.coords.get("band", []))
+
+    def band_position(name: str) -> int | None:
+        for candidate in (name, _BAND_ALIASES.get(name)):
+            if candidate in band_names:
+                return band_names.index(candidate)
+        return None
+
+    if indices is None:
+        indices = [
+            name for name, required in INDEX_BANDS.items()
+            if name == "ndvi" or all(band_position(b) is not None for b in required)
+        ]
+
+    for name in indices:
+        if name not in INDEX_BANDS:
+            raise ValueError(f"Unknown index: {name}")
+        missing = [b for b in INDEX_BANDS[name] if band_position(b) is None]
+        if missing:
             raise ValueError(
-                "Data must contain 'nir' and 'red' bands. "
-                f"Available bands: {band_names}"
+                f"Data must contain {', '.join(repr(b) for b in INDEX_BANDS[name])} bands "
+                f"for {name.upper()}. Available bands: {band_names}"
             )
 
-    nir = data.isel(band=nir_idx)
-    red = data.isel(band=red_idx)
+    # Read each needed band once as float32 (no copy if already float32)
+    values = data.transpose("band", "y", "x").values
+    needed = {b for name in indices for b in INDEX_BANDS[name]}
+    bands = {b: values[band_position(b)].astype(np.float32, copy=False) for b in needed}
+
+    height, width = values.shape[1:]
+    cube = np.empty((len(indices), height, width), dtype=np.float32)
+    scratch = np.empty((height, width), dtype=np.float32)
+    blue_term = np.empty((height, width), dtype=np.float32) if "evi" in indices else None
 
     with np.errstate(divide="ignore", invalid="ignore"):
-        ndvi = (nir - red) / (nir + red)
-        ndvi = np.where(np.isfinite(ndvi), ndvi, np.nan)
+        for i, name in enumerate(indices):
+            out = cube[i]
+            nir = bands["nir"]
+
+            if name == "ndvi":
+                np.subtract(nir, bands["red"], out=out)
+                np.add(nir, bands["red"], out=scratch)
+            elif name == "evi":
+                np.subtract(nir, bands["red"], out=out)
+                out *= g
+                np.multiply(bands["red"], c1, out=scratch)
+                scratch += nir
+                np.multiply(bands["blue"], c2, out=blue_term)
+                scratch -= blue_term
+                scratch += l
+            elif name == "ndwi":
+                np.subtract(nir, bands["swir"], out=out)
+                np.add(nir, bands["swir"], out=scratch)
+
+            np.divide(out, scratch, out=out)
+
+        cube[~np.isfinite(cube)] = np.nan
+
+    return xr.DataArray(
+        cube,
+        dims=["index", "y", "x"],
+        coords={
+            "index": list(indices),
+            "y": data.coords["y"],
+            "x": data.coords["x"],
+        },
+        attrs=dict(data.attrs),
+    )
 
-    return ndvi
+
+def compute_ndvi(data: xr.DataArray) -> xr.DataArray:
+    """
+    Compute NDVI from NIR and Red bands.
+
+    Args:
+        data: DataArray with band dimension including "nir" and "red"
+
+    Returns:
+        NDVI DataArray
+    """
+    return compute_index_cube(data, ["ndvi"]).sel(index="ndvi", drop=True)
 
 
 def compute_evi(
@@ -356,30 +737,7 @@ def compute_evi(
     Returns:
         EVI DataArray
     """
-    if "band" not in data.dims:
-        raise ValueError("Data must have 'band' dimension")
-
-    band_names = list(data.coords.get("band", []))
-
-    try:
-        nir_idx = band_names.index("nir")
-        red_idx = band_names.index("red")
-        blue_idx = band_names.index("blue")
-    except ValueError as e:
-        raise ValueError(
-            f"Data must contain 'nir', 'red', and 'blue' bands. "
-            f"Available bands: {band_names}"
-        )
-
-    nir = data.isel(band=nir_idx).astype(float)
-    red = data.isel(band=red_idx).astype(float)
-    blue = data.isel(band=blue_idx).astype(float)
-
-    with np.errstate(divide="ignore", invalid="ignore"):
-        evi = g * (nir - red) / (nir + c1 * red - c2 * blue + l)
-        evi = np.where(np.isfinite(evi), evi, np.nan)
-
-    return evi
+    return compute_index_cube(data, ["evi"], g=g, c1=c1, c2=c2, l=l).sel(index="evi", drop=True)
 
 
 def compute_ndwi(data: xr.DataArray) -> xr.DataArray:
@@ -396,26 +754,4 @@ def compute_ndwi(data: xr.DataArray) -> xr.DataArray:
     Returns:
         NDWI DataArray
     """
-    if "band" not in data.dims:
-        raise ValueError("Data must have 'band' dimension")
-
-    band_names = list(data.coords.get("band", []))
-
-    try:
-        nir_idx = band_names.index("nir")
-        swir_idx = band_names.index("swir")
-    except ValueError as e:
-        # SWIR might not be available - try with reasonable defaults
-        raise ValueError(
-            f"Data must contain 'nir' and 'swir' bands. "
-            f"Available bands: {band_names}"
-        )
-
-    nir = data.isel(band=nir_idx).astype(float)
-    swir = data.isel(band=swir_idx).astype(float)
-
-    with np.errstate(divide="ignore", invalid="ignore"):
-        ndwi = (nir - swir) / (nir + swir)
-        ndwi = np.where(np.isfinite(ndwi), ndwi, np.nan)
-
-    return ndwi
+    return compute_index_cube(data, ["ndwi"]).sel(index="ndwi", drop=True)
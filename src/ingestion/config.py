@@ -40,17 +40,42 @@ class PipelineConfig:
     max_cloud_cover: int = 50
     min_cloud_free_pct: float = 0.3
 
+    # Median compositing: stacks larger than the budget are reduced in blocks
+    composite_memory_budget_mb: int = 1024
+    composite_workers: int = 1
+
     # Provider settings
     default_provider: str = "sentinel2"
     enable_planet_scope: bool = False
 
+    # Zonal statistics method: "raster" (cached label grid) or "clip" (per paddock)
+    zonal_stats_method: str = "raster"
+
     # Output settings
     output_dir: str = "output"
     write_to_convex: bool = True
+    # Tiles are encoded in memory and uploaded directly; also write them to output_dir
+    write_tile_files: bool = False
+
+    # Write index tiles as Cloud-Optimized GeoTIFFs with overviews
+    cog_tiles: bool = False
+    cog_blocksize: int = 512
+
+    # Web-mercator z/x/y tile pyramids for RGB and NDVI heatmap layers
+    tile_pyramid: bool = False
+    tile_pyramid_min_zoom: int = 12
+    tile_pyramid_max_zoom: int = 0  # 0 = native zoom of the imagery
+    tile_pyramid_workers: int = 4
+
+    # Historical backfill: date windows processed at once
+    backfill_workers: int = 4
 
     # Logging
     log_level: str = "INFO"
 
+    # Record per-stage timing/memory in PipelineResult["profile"]
+    profile_stages: bool = True
+
 
 def load_env_config() -> PipelineConfig:
     """
@@ -60,13 +85,27 @@ def load_env_config() -> PipelineConfig:
     - COMPOSITE_WINDOW_DAYS: Days for time-series composite (default: 21)
     - MAX_CLOUD_COVER: Max cloud cover percentage (default: 50)
     - MIN_CLOUD_FREE_PCT: Min cloud-free % for valid observation (default: 0.3)
+    - COMPOSITE_MEMORY_BUDGET_MB: Memory budget for median compositing (default: 1024)
+    - COMPOSITE_WORKERS: Worker processes for chunked compositing (default: 1)
     - DEFAULT_PROVIDER: Default satellite provider (default: sentinel2)
     - ENABLE_PLANET_SCOPE: Enable PlanetScope integration (default: false)
+    - ZONAL_STATS_METHOD: "raster" or "clip" (default: raster)
     - OUTPUT_DIR: Output directory (default: output)
     - WRITE_TO_CONVEX: Write results to Convex (default: true)
+    - WRITE_TILE_FILES: Also write tiles to OUTPUT_DIR for debugging (default: false)
+    - COG_TILES: Write index tiles as Cloud-Optimized GeoTIFFs (default: false)
+    - COG_BLOCKSIZE: COG internal tile size, 256 or 512 (default: 512)
+    - TILE_PYRAMID: Generate XYZ tile pyramids for RGB/heatmap layers (default: false)
+    - TILE_PYRAMID_MIN_ZOOM: Lowest pyramid zoom level (default: 12)
+    - TILE_PYRAMID_MAX_ZOOM: Highest pyramid zoom level, 0 = native (default: 0)
+    - TILE_PYRAMID_WORKERS: Threads rendering and uploading pyramid tiles (default: 4)
     - CONVEX_DEPLOYMENT_URL: Convex deployment URL (required for writing)
     - CONVEX_API_KEY: Convex API key (required for writing)
+    - BACKFILL_WORKERS: Historical backfill windows processed at once (default: 4);
+      they split COMPOSITE_MEMORY_BUDGET_MB and COMPOSITE_WORKERS, but the rest
+      of each window's memory (index cube, tiles) adds up
     - LOG_LEVEL: Logging level (default: INFO)
+    - PROFILE_STAGES: Record per-stage timing and memory (default: true)
     """
     def get_int(key: str, default: int) -> int:
         val = os.environ.get(key)
@@ -96,11 +135,23 @@ def load_env_config() -> PipelineConfig:
         composite_window_days=get_int("COMPOSITE_WINDOW_DAYS", 21),
         max_cloud_cover=get_int("MAX_CLOUD_COVER", 50),
         min_cloud_free_pct=get_float("MIN_CLOUD_FREE_PCT", 0.3),
+        composite_memory_budget_mb=get_int("COMPOSITE_MEMORY_BUDGET_MB", 1024),
+        composite_workers=get_int("COMPOSITE_WORKERS", 1),
         default_provider=os.environ.get("DEFAULT_PROVIDER", "sentinel2"),
         enable_planet_scope=get_bool("ENABLE_PLANET_SCOPE", False),
+        zonal_stats_method=os.environ.get("ZONAL_STATS_METHOD", "raster").lower(),
         output_dir=os.environ.get("OUTPUT_DIR", "output"),
         write_to_convex=get_bool("WRITE_TO_CONVEX", True),
+        write_tile_files=get_bool("WRITE_TILE_FILES", False),
+        cog_tiles=get_bool("COG_TILES", False),
+        cog_blocksize=get_int("COG_BLOCKSIZE", 512),
+        tile_pyramid=get_bool("TILE_PYRAMID", False),
+        tile_pyramid_min_zoom=get_int("TILE_PYRAMID_MIN_ZOOM", 12),
+        tile_pyramid_max_zoom=get_int("TILE_PYRAMID_MAX_ZOOM", 0),
+        tile_pyramid_workers=get_int("TILE_PYRAMID_WORKERS", 4),
+        backfill_workers=get_int("BACKFILL_WORKERS", 4),
         log_level=os.environ.get("LOG_LEVEL", "INFO"),
+        profile_stages=get_bool("PROFILE_STAGES", True),
     )
 
 
@@ -0,0 +1,108 @@
+"""
+Shared HTTP session for all outbound requests.
+
+Convex, Copernicus, Planet and the token endpoints used to be called through the
+bare requests.get/requests.post functions, which open a new TCP+TLS
+connection per call. get_session() returns one process-wide requests.Session
+with keep-alive connection pools per host and a retry/backoff policy, so a
+daily run reuses a handful of connections instead of opening thousands.
+"""
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# Connections kept alive per host
+DEFAULT_POOL_SIZE = 16
+
+# Hosts that get larger pools (parallel product and asset downloads)
+HOST_POOL_SIZES = {
+    "zipper.dataspace.copernicus.eu": 32,
+    "download.dataspace.copernicus.eu": 32,
+    "api.planet.com": 32,
+}
+
+# Retried for idempotent methods only; POST (Convex mutations, token
+# requests) is retried on connection errors but never on a status code
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+
+def _parse_host_pool_sizes(value: str) -> dict[str, int]:
+    """Parse "host=size,host=size" into a dict."""
+    sizes = {}
+    for entry in value.split(","):
+        host, _, size = entry.strip().partition("=")
+        if host and size.isdigit():
+            sizes[host] = int(size)
+    return sizes
+
+
+def create_session(
+    pool_size: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    backoff_factor: Optional[float] = None,
+) -> 'requests.Session':
+    """
+    Create a session with per-host connection pools and retries.
+
+    Args:
+        pool_size: Connections kept alive per host (defaults to HTTP_POOL_SIZE env var, then 16)
+        max_retries: Retries per request (defaults to HTTP_MAX_RETRIES env var, then 3)
+        backoff_factor: Exponential backoff factor in seconds (defaults to
+                        HTTP_BACKOFF_FACTOR env var, then 0.5)
+
+    Returns:
+        Configured requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", str(DEFAULT_POOL_SIZE)))
+    if max_retries is None:
+        max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    if backoff_factor is None:
+        backoff_factor = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        # Callers check status codes themselves
+        raise_on_status=False,
+    )
+
+    def adapter(size: int) -> HTTPAdapter:
+        return HTTPAdapter(pool_connections=4, pool_maxsize=size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter(pool_size))
+    session.mount("http://", adapter(pool_size))
+
+    host_sizes = {**HOST_POOL_SIZES, **_parse_host_pool_sizes(os.getenv("HTTP_HOST_POOL_SIZES", ""))}
+    for host, size in host_sizes.items():
+        session.mount(f"https://{host}", adapter(size))
+
+    return session
+
+
+_session: Optional['requests.Session'] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> 'requests.Session':
+    """Get the process-wide HTTP session."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
@@ -7,14 +7,24 @@ imagery is available, without downloading any actual data.
 This is used by the scheduler to determine which farms need processing.
 """
 import logging
+import math
 import os
+import threading
 from datetime import datetime, timedelta
 from typing import Optional
 
-import requests
+from http_session import get_session
+from providers.auth import get_token_manager
 
 logger = logging.getLogger(__name__)
 
+# Farms whose centres fall in the same cell of this size (degrees) share one
+# catalog query; 1 degree is roughly the size of a Sentinel-2 MGRS tile
+DEFAULT_GROUP_DEGREES = 1.0
+
+# Products fetched per grouped catalog query
+BATCH_QUERY_TOP = 200
+
 
 class CopernicusChecker:
     """
@@ -42,44 +52,17 @@ class CopernicusChecker:
         self.client_id = client_id or os.getenv("COPERNICUS_CLIENT_ID")
         self.client_secret = client_secret or os.getenv("COPERNICUS_CLIENT_SECRET")
 
-        self._access_token: Optional[str] = None
-        self._token_expires_at: Optional[datetime] = None
-
     def _get_access_token(self) -> str:
-        """Get or refresh the OAuth2 access token."""
-        # Check if we have a valid cached token
-        if self._access_token and self._token_expires_at:
-            if datetime.now() < self._token_expires_at - timedelta(minutes=5):
-                return self._access_token
-
+        """Get the access token shared with the Copernicus provider."""
         if not self.client_id or not self.client_secret:
             raise ValueError(
                 "Copernicus credentials not configured. "
                 "Set COPERNICUS_CLIENT_ID and COPERNICUS_CLIENT_SECRET environment variables."
             )
 
-        response = requests.post(
-            self.TOKEN_URL,
-            data={
-                "grant_type": "client_credentials",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            timeout=30,
-        )
-
-        if response.status_code != 200:
-            raise RuntimeError(
-                f"Failed to get Copernicus access token: {response.status_code} - {response.text}"
-            )
-
-        token_data = response.json()
-        self._access_token = token_data["access_token"]
-        expires_in = token_data.get("expires_in", 300)
-        self._token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-
-        return self._access_token
+        return get_token_manager(
+            self.TOKEN_URL, self.client_id, self.client_secret, name="Copernicus"
+        ).get_token()
 
     def get_latest_imagery_date(
         self,
@@ -130,7 +113,7 @@ class CopernicusChecker:
 
         logger.debug(f"Querying Copernicus catalog for latest imagery...")
 
-        response = requests.get(
+        response = get_session().get(
             url,
             params=params,
             headers={"Authorization": f"Bearer {token}"},
@@ -162,6 +145,104 @@ class CopernicusChecker:
 
         return None
 
+    def get_latest_imagery_dates(
+        self,
+        bboxes: dict[str, list[float]],
+        max_cloud_cover: int = 50,
+        days_back: int = 30,
+    ) -> dict[str, Optional[str]]:
+        """
+        Find the most recent imagery for several nearby areas with one query.
+
+        The catalog is queried once for the union of the bounding boxes, and
+        each product is matched back to the boxes its footprint intersects.
+        Areas with no match in a full result page are re-checked individually,
+        since older matching products may have been cut off.
+
+        Args:
+            bboxes: Bounding boxes [west, south, east, north] keyed by ID
+            max_cloud_cover: Maximum cloud cover percentage
+            days_back: How many days back to search
+
+        Returns:
+            Date string (YYYY-MM-DD) of the most recent imagery per ID, or None
+        """
+        from shapely.geometry import box, shape
+
+        token = self._get_access_token()
+
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days_back)
+
+        west = min(b[0] for b in bboxes.values())
+        south = min(b[1] for b in bboxes.values())
+        east = max(b[2] for b in bboxes.values())
+        north = max(b[3] for b in bboxes.values())
+        footprint = f"POLYGON(({west} {south},{east} {south},{east} {north},{west} {north},{west} {south}))"
+
+        filter_parts = [
+            "Collection/Name eq 'SENTINEL-2'",
+            "Attributes/OData.CSC.StringAttribute/any(att:att/Name eq 'productType' and att/OData.CSC.StringAttribute/Value eq 'S2MSI2A')",
+            f"ContentDate/Start gt {start_date.strftime('%Y-%m-%d')}T00:00:00.000Z",
+            f"ContentDate/Start lt {end_date.strftime('%Y-%m-%d')}T23:59:59.999Z",
+            f"OData.CSC.Intersects(area=geography'SRID=4326;{footprint}')",
+            f"Attributes/OData.CSC.DoubleAttribute/any(att:att/Name eq 'cloudCover' and att/OData.CSC.DoubleAttribute/Value lt {max_cloud_cover})",
+        ]
+
+        url = f"{self.CATALOG_URL}/Products"
+        params = {
+            "$filter": " and ".join(filter_parts),
+            "$orderby": "ContentDate/Start desc",
+            "$top": BATCH_QUERY_TOP,
+            "$select": "Id,Name,ContentDate,GeoFootprint",
+        }
+
+        logger.debug(f"Querying Copernicus catalog for {len(bboxes)} areas...")
+
+        response = get_session().get(
+            url,
+            params=params,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=60,
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Batch catalog query failed: {response.status_code}")
+            return {key: None for key in bboxes}
+
+        products = response.json().get("value", [])
+
+        areas = {key: box(*bbox) for key, bbox in bboxes.items()}
+        latest: dict[str, Optional[str]] = {key: None for key in bboxes}
+
+        # Products are newest first, so the first match per area is its latest
+        for product in products:
+            content_date = product.get("ContentDate", {}).get("Start")
+            try:
+                date = datetime.fromisoformat(content_date.replace("Z", "+00:00")).strftime("%Y-%m-%d")
+            except (AttributeError, ValueError, TypeError):
+                continue
+
+            geo_footprint = product.get("GeoFootprint")
+            product_area = shape(geo_footprint) if geo_footprint else None
+
+            for key, area in areas.items():
+                if latest[key] is None and (product_area is None or product_area.intersects(area)):
+                    latest[key] = date
+
+            if all(latest.values()):
+                break
+
+        if len(products) >= BATCH_QUERY_TOP:
+            for key in [k for k, v in latest.items() if v is None]:
+                latest[key] = self.get_latest_imagery_date(
+                    bbox=bboxes[key],
+                    max_cloud_cover=max_cloud_cover,
+                    days_back=days_back,
+                )
+
+        return latest
+
     def count_available_images(
         self,
         bbox: list[float],
@@ -202,7 +283,7 @@ class CopernicusChecker:
         url = f"{self.CATALOG_URL}/Products/$count"
         params = {"$filter": filter_str}
 
-        response = requests.get(
+        response = get_session().get(
             url,
             params=params,
             headers={"Authorization": f"Bearer {token}"},
@@ -257,6 +338,94 @@ def get_bbox_from_geometry(geometry: dict) -> list[float]:
     raise ValueError(f"Unsupported geometry type: {geometry.get('type')}")
 
 
+_shared_checker: Optional[CopernicusChecker] = None
+_shared_checker_lock = threading.Lock()
+
+
+def get_checker() -> CopernicusChecker:
+    """Get the process-wide checker, so its access token is reused across checks."""
+    global _shared_checker
+
+    with _shared_checker_lock:
+        if _shared_checker is None:
+            _shared_checker = CopernicusChecker()
+        return _shared_checker
+
+
+def _has_new_imagery(latest_date: Optional[str], last_known_date: Optional[str]) -> bool:
+    """Whether latest_date is newer than the last known imagery date."""
+    if not latest_date:
+        return False
+    # No previous date - consider as new
+    return latest_date > last_known_date if last_known_date else True
+
+
+def check_new_imagery_for_farms(
+    farms: list[dict],
+    max_cloud_cover: int = 50,
+    group_degrees: Optional[float] = None,
+) -> dict[str, tuple[bool, Optional[str]]]:
+    """
+    Check several farms for new imagery with one catalog query per area.
+
+    Farms are grouped by the grid cell their bounding box centre falls in,
+    each group is checked with a single catalog query, and the results are
+    fanned back out per farm. All queries share one access token.
+
+    Args:
+        farms: Dicts with farmExternalId, geometry (GeoJSON) and optional
+               lastNewImageryDate (YYYY-MM-DD)
+        max_cloud_cover: Maximum acceptable cloud cover percentage
+        group_degrees: Grid cell size in degrees (defaults to
+                       IMAGERY_CHECK_GROUP_DEGREES env var, then 1.0)
+
+    Returns:
+        Dict mapping farm ID to (has_new_imagery, latest_date)
+    """
+    if group_degrees is None:
+        group_degrees = float(os.getenv("IMAGERY_CHECK_GROUP_DEGREES", str(DEFAULT_GROUP_DEGREES)))
+
+    results: dict[str, tuple[bool, Optional[str]]] = {}
+    groups: dict[tuple[int, int], dict[str, list[float]]] = {}
+
+    for farm in farms:
+        farm_id = farm["farmExternalId"]
+        try:
+            bbox = get_bbox_from_geometry(farm.get("geometry", {}))
+        except ValueError as e:
+            logger.error(f"Failed to get bbox from geometry for {farm_id}: {e}")
+            results[farm_id] = (False, None)
+            continue
+
+        cell = (
+            math.floor((bbox[0] + bbox[2]) / 2 / group_degrees),
+            math.floor((bbox[1] + bbox[3]) / 2 / group_degrees),
+        )
+        groups.setdefault(cell, {})[farm_id] = bbox
+
+    logger.info(f"Checking imagery for {len(farms)} farms in {len(groups)} catalog queries")
+
+    checker = get_checker()
+    last_dates = {farm["farmExternalId"]: farm.get("lastNewImageryDate") for farm in farms}
+
+    for bboxes in groups.values():
+        try:
+            latest_dates = checker.get_latest_imagery_dates(
+                bboxes=bboxes,
+                max_cloud_cover=max_cloud_cover,
+                days_back=30,
+            )
+        except Exception as e:
+            logger.error(f"Failed to check imagery availability for {list(bboxes)}: {e}")
+            latest_dates = {}
+
+        for farm_id in bboxes:
+            latest_date = latest_dates.get(farm_id)
+            results[farm_id] = (_has_new_imagery(latest_date, last_dates[farm_id]), latest_date)
+
+    return results
+
+
 def check_new_imagery_available(
     farm_geometry: dict,
     last_known_date: Optional[str] = None,
@@ -281,7 +450,7 @@ def check_new_imagery_available(
         logger.error(f"Failed to get bbox from geometry: {e}")
         return (False, None)
 
-    checker = CopernicusChecker()
+    checker = get_checker()
 
     try:
         latest_date = checker.get_latest_imagery_date(
@@ -296,15 +465,7 @@ def check_new_imagery_available(
     if not latest_date:
         return (False, None)
 
-    # Compare with last known date
-    if last_known_date:
-        # New imagery is available if latest > last_known
-        has_new = latest_date > last_known_date
-    else:
-        # No previous date - consider as new
-        has_new = True
-
-    return (has_new, latest_date)
+    return (_has_new_imagery(latest_date, last_known_date), latest_date)
 
 
 # CLI for manual testing
@@ -0,0 +1,280 @@
+"""
+Process-isolated job execution.
+
+Pipeline jobs run in child processes from a small reusable pool so a hung
+download or an oversized reproject cannot block or take down the scheduler.
+The parent enforces a wall-clock timeout and an RSS limit per job; a worker
+that exceeds either (or dies) is killed together with any processes it
+started and replaced with a fresh one. Workers are also recycled after a
+number of jobs so memory fragmented by large rasters is returned to the OS.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import traceback
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# How often the parent checks a running job's deadline and memory
+POLL_INTERVAL = 0.5
+
+
+class JobError(Exception):
+    """Raised when a job fails inside a worker process."""
+    pass
+
+
+class JobTimeoutError(JobError):
+    """Raised when a job exceeds its wall-clock timeout."""
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__(f"Job timed out after {timeout:.0f}s")
+
+
+class JobMemoryError(JobError):
+    """Raised when a job's worker exceeds the RSS limit."""
+    def __init__(self, rss_mb: float, limit_mb: int):
+        self.rss_mb = rss_mb
+        self.limit_mb = limit_mb
+        super().__init__(f"Job exceeded memory limit: {rss_mb:.0f} MB RSS > {limit_mb} MB")
+
+
+class JobCrashedError(JobError):
+    """Raised when a worker process exits while running a job."""
+    def __init__(self, exitcode: Optional[int]):
+        self.exitcode = exitcode
+        super().__init__(f"Job worker exited unexpectedly (exit code {exitcode})")
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _worker_main(conn: Connection) -> None:
+    """
+    Worker process loop: run (func, args, kwargs) tasks until told to stop.
+
+    The worker starts its own process group so the parent can kill it along
+    with any pools it starts (e.g. parallel compositing).
+    """
+    os.setpgrp()
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        func, args, kwargs = task
+        try:
+            conn.send(("ok", func(*args, **kwargs)))
+        except BaseException as e:
+            logger.debug(traceback.format_exc())
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+@dataclass
+class _Worker:
+    process: multiprocessing.Process
+    conn: Connection
+    jobs_done: int = 0
+
+
+class JobPool:
+    """
+    Pool of reusable worker processes with per-job timeout and memory limits.
+
+    run() is thread-safe: each calling thread gets a worker to itself, and
+    callers block while all workers are busy. Functions and arguments must
+    be picklable (module-level functions, plain data).
+    """
+
+    def __init__(
+        self,
+        size: int,
+        timeout: float,
+        memory_limit_mb: int = 0,
+        max_jobs_per_worker: int = 0,
+    ):
+        """
+        Initialize the pool and start its workers.
+
+        Args:
+            size: Number of worker processes
+            timeout: Default wall-clock timeout per job in seconds
+            memory_limit_mb: RSS limit per worker in MB (0 = no limit)
+            max_jobs_per_worker: Replace a worker after this many jobs (0 = never)
+        """
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+
+        # spawn: workers must not inherit the scheduler's threads and locks
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: 'queue.Queue[_Worker]' = queue.Queue()
+        self._closed = False
+
+        for _ in range(self.size):
+            self._idle.put(self._start_worker())
+
+        logger.info(
+            f"Started {self.size} job workers (timeout {timeout:.0f}s, "
+            f"memory limit {memory_limit_mb or 'none'} MB)"
+        )
+
+    def _start_worker(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        # Not a daemon: daemonic processes may not start their own pools
+        process = self._ctx.Process(target=_worker_main, args=(child_conn,), name="job-worker")
+        process.start()
+        child_conn.close()
+        return _Worker(process=process, conn=parent_conn)
+
+    def _kill_worker(self, worker: _Worker) -> None:
+        """Kill a worker and everything in its process group."""
+        pid = worker.process.pid
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        worker.conn.close()
+
+    def _stop_worker(self, worker: _Worker) -> None:
+        """Ask an idle worker to exit, killing it if it does not."""
+        try:
+            worker.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        worker.process.join(timeout=5)
+
+        if worker.process.is_alive():
+            self._kill_worker(worker)
+            return
+
+        worker.conn.close()
+
+    def _release(self, worker: _Worker) -> None:
+        """Return a worker to the pool, recycling it if it is due."""
+        if self._closed:
+            self._stop_worker(worker)
+            return
+
+        recycle = self.max_jobs_per_worker > 0 and worker.jobs_done >= self.max_jobs_per_worker
+        if recycle:
+            logger.debug(f"Recycling job worker {worker.process.pid} after {worker.jobs_done} jobs")
+            self._stop_worker(worker)
+            worker = self._start_worker()
+
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        """Kill a failed worker and put a fresh one in the pool."""
+        self._kill_worker(worker)
+        if not self._closed:
+            self._idle.put(self._start_worker())
+
+    def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Run func(*args, **kwargs) in a worker process.
+
+        Args:
+            func: Picklable module-level function
+            *args: Positional arguments for func
+            timeout: Wall-clock timeout in seconds (defaults to the pool timeout)
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            func's return value
+
+        Raises:
+            JobTimeoutError: If the job ran longer than the timeout
+            JobMemoryError: If the worker's RSS exceeded the memory limit
+            JobCrashedError: If the worker died while running the job
+            JobError: If func raised an exception
+        """
+        if self._closed:
+            raise RuntimeError("JobPool is closed")
+
+        timeout = timeout or self.timeout
+        worker = self._idle.get()
+
+        try:
+            worker.conn.send((func, args, kwargs))
+        except (BrokenPipeError, OSError):
+            exitcode = worker.process.exitcode
+            self._replace(worker)
+            raise JobCrashedError(exitcode)
+
+        deadline = time.monotonic() + timeout
+
+        while not worker.conn.poll(POLL_INTERVAL):
+            if not worker.process.is_alive():
+                exitcode = worker.process.exitcode
+                self._replace(worker)
+                raise JobCrashedError(exitcode)
+
+            if time.monotonic() >= deadline:
+                logger.warning(f"Killing job worker {worker.process.pid}: timed out after {timeout:.0f}s")
+                self._replace(worker)
+                raise JobTimeoutError(timeout)
+
+            rss = _rss_mb(worker.process.pid)
+            if self.memory_limit_mb > 0 and rss is not None and rss > self.memory_limit_mb:
+                logger.warning(
+                    f"Killing job worker {worker.process.pid}: "
+                    f"{rss:.0f} MB RSS exceeds {self.memory_limit_mb} MB"
+                )
+                self._replace(worker)
+                raise JobMemoryError(rss, self.memory_limit_mb)
+
+        try:
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join(timeout=5)
+            exitcode = worker.process.exitcode
+            self._replace(worker)
+            raise JobCrashedError(exitcode)
+
+        worker.jobs_done += 1
+        self._release(worker)
+
+        if status == "error":
+            raise JobError(payload)
+        return payload
+
+    def close(self) -> None:
+        """Stop idle workers; busy workers are stopped when their job returns."""
+        if self._closed:
+            return
+        self._closed = True
+
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._stop_worker(worker)
+
+    def __enter__(self) -> 'JobPool':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,283 @@
+"""
+Cached rasterization of paddock boundaries.
+
+Paddock boundaries change rarely, but every pipeline run used to reproject
+the paddock GeoDataFrame and rasterize it against the composite grid. This
+module keeps the rasterized pixel footprint of each paddock, keyed by a hash
+of its geometry plus the target grid (CRS, transform, shape), in memory and
+on disk. Only paddocks whose geometry changed are re-rasterized; the hashes
+last used for each farm are recorded so the entries of changed or removed
+paddocks are pruned on the next run.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Optional
+
+from providers.cache import BandCache
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "cache/paddock_masks"
+DEFAULT_MAX_MB = 256
+
+# Footprints kept in memory (flat int32 pixel indices, a few KB each)
+MEMORY_ENTRIES = 4096
+
+
+def geometry_hash(geometry: Any) -> str:
+    """
+    Hash a paddock geometry.
+
+    The geometry is normalized through Shapely first, so a GeoJSON dict and
+    the Shapely geometry built from it (or the same boundary with integer
+    coordinates or extra keys such as "bbox") hash the same.
+
+    Args:
+        geometry: GeoJSON dict or Shapely geometry
+
+    Returns:
+        Hex digest that changes whenever the boundary changes
+    """
+    from shapely.geometry import mapping, shape
+
+    if not hasattr(geometry, "geom_type"):
+        geometry = shape(geometry)
+
+    payload = json.dumps(mapping(geometry), sort_keys=True, default=list)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PaddockMaskCache:
+    """
+    Two-level (memory + disk) cache of rasterized paddock footprints.
+
+    Each entry holds the flat indices of the grid pixels a paddock touches
+    (all_touched rasterization, matching the per-paddock clip).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (defaults to PADDOCK_MASK_CACHE_DIR env var, then cache/paddock_masks)
+            max_bytes: Disk budget in bytes (defaults to PADDOCK_MASK_CACHE_MAX_MB env var, then 256 MB)
+        """
+        if max_bytes is None:
+            max_bytes = int(os.getenv("PADDOCK_MASK_CACHE_MAX_MB", str(DEFAULT_MAX_MB))) * 1024 * 1024
+        self.disk = BandCache(
+            cache_dir=cache_dir or os.getenv("PADDOCK_MASK_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_bytes=max_bytes,
+        )
+        # (geometry hash, entry key) -> footprint
+        self._memory: 'OrderedDict[tuple[str, str], np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes farm index updates (concurrent jobs of the same farm)
+        self._index_lock = threading.Lock()
+
+    @staticmethod
+    def grid_key(crs: Any, transform: Any, shape: tuple[int, int]) -> dict:
+        """Describe a target grid for cache keys."""
+        return {
+            "crs": str(crs),
+            "transform": [round(v, 9) for v in list(transform)[:6]],
+            "shape": list(shape),
+        }
+
+    def _key(self, geom_hash: str, grid: dict) -> str:
+        return self.disk.make_key("paddock_mask", geom_hash, "all_touched", grid)
+
+    def _index_path(self, farm_id: str) -> str:
+        safe = hashlib.sha256(farm_id.encode()).hexdigest()[:16]
+        return os.path.join(self.disk.cache_dir, f"farm_{safe}.json")
+
+    def _load_index(self, farm_id: str) -> dict:
+        try:
+            with open(self._index_path(farm_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, farm_id: str, index: dict) -> None:
+        tmp_path = self._index_path(farm_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path(farm_id))
+
+    def pixel_indices(
+        self,
+        geometry: Any,
+        crs: Any,
+        transform: Any,
+        shape: tuple[int, int],
+        geometry_crs: Any = "EPSG:4326",
+        geom_hash: Optional[str] = None,
+    ) -> 'np.ndarray':
+        """
+        Get the flat pixel indices a paddock touches on a grid.
+
+        Args:
+            geometry: Paddock geometry (GeoJSON dict or Shapely geometry)
+            crs: Grid CRS
+            transform: Grid affine transform
+            shape: Grid (height, width)
+            geometry_crs: CRS of the geometry
+            geom_hash: Precomputed geometry_hash(geometry)
+
+        Returns:
+            Sorted int32 array of flat pixel indices
+        """
+        import numpy as np
+
+        geom_hash = geom_hash or geometry_hash(geometry)
+        key = self._key(geom_hash, self.grid_key(crs, transform, shape))
+        memory_key = (geom_hash, key)
+
+        with self._lock:
+            cached = self._memory.get(memory_key)
+            if cached is not None:
+                self._memory.move_to_end(memory_key)
+                return cached
+
+        cached = self.disk.get(key)
+        if cached is not None:
+            indices = np.array(cached)
+        else:
+            indices = self._rasterize(geometry, crs, transform, shape, geometry_crs)
+            self.disk.put(key, indices, meta={"geometry_hash": geom_hash})
+
+        with self._lock:
+            self._memory[memory_key] = indices
+            while len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+        return indices
+
+    @staticmethod
+    def _rasterize(
+        geometry: Any,
+        crs: Any,
+        transform: Any,
+        shape: tuple[int, int],
+        geometry_crs: Any,
+    ) -> 'np.ndarray':
+        """Project one paddock to the grid CRS and rasterize its footprint."""
+        import numpy as np
+        import geopandas as gpd
+        from rasterio import features
+        from shapely.geometry import shape as to_shape
+
+        if isinstance(geometry, dict):
+            geometry = to_shape(geometry)
+
+        projected = gpd.GeoSeries([geometry], crs=geometry_crs).to_crs(crs).iloc[0]
+
+        mask = features.rasterize(
+            [(projected, 1)],
+            out_shape=shape,
+            transform=transform,
+            fill=0,
+            all_touched=True,
+            dtype="uint8",
+        )
+        return np.flatnonzero(mask.ravel()).astype(np.int32)
+
+    def label_grid(
+        self,
+        paddocks: list[tuple[str, Any]],
+        crs: Any,
+        transform: Any,
+        shape: tuple[int, int],
+        geometry_crs: Any = "EPSG:4326",
+        farm_id: Optional[str] = None,
+    ) -> 'np.ndarray':
+        """
+        Build a flat label grid from cached paddock footprints.
+
+        Args:
+            paddocks: (paddock_id, geometry) pairs
+            crs: Grid CRS
+            transform: Grid affine transform
+            shape: Grid (height, width)
+            geometry_crs: CRS of the geometries
+            farm_id: Farm external ID; when given, footprints of the farm's
+                     changed or removed paddocks are pruned first
+
+        Returns:
+            Flat int32 array: 0 = outside any paddock, i + 1 = paddocks[i].
+            Where paddocks overlap, the later paddock wins.
+        """
+        import numpy as np
+
+        hashes = [geometry_hash(geometry) for _, geometry in paddocks]
+        if farm_id is not None:
+            self._sync_index(farm_id, {pid: h for (pid, _), h in zip(paddocks, hashes)})
+
+        labels = np.zeros(shape[0] * shape[1], dtype=np.int32)
+        for i, ((_, geometry), geom_hash) in enumerate(zip(paddocks, hashes)):
+            indices = self.pixel_indices(geometry, crs, transform, shape, geometry_crs, geom_hash=geom_hash)
+            labels[indices] = i + 1
+        return labels
+
+    def _sync_index(self, farm_id: str, current: dict[str, str]) -> list[str]:
+        """Prune entries whose hash left the farm's index and record the current hashes."""
+        with self._index_lock:
+            previous = self._load_index(farm_id)
+            if previous == current:
+                return []
+
+            changed = [pid for pid, h in current.items() if previous.get(pid) != h]
+            # A hash still used by another paddock is not stale
+            stale_hashes = {
+                h for pid, h in previous.items() if current.get(pid) != h
+            } - set(current.values())
+
+            if stale_hashes:
+                with self._lock:
+                    for memory_key in [k for k in self._memory if k[0] in stale_hashes]:
+                        del self._memory[memory_key]
+                removed = self._remove_disk_entries(stale_hashes)
+                logger.info(f"Pruned {removed} stale paddock masks for farm {farm_id}")
+
+            self._save_index(farm_id, current)
+
+        if changed and previous:
+            logger.info(f"Paddocks to re-rasterize for farm {farm_id}: {changed}")
+        return changed
+
+    def _remove_disk_entries(self, geom_hashes: set[str]) -> int:
+        """Delete disk entries whose metadata sidecar names one of the geometry hashes."""
+        removed = 0
+        for entry in os.scandir(self.disk.cache_dir):
+            if not entry.name.endswith(".json") or entry.name.startswith("farm_"):
+                continue
+            try:
+                with open(entry.path) as f:
+                    meta = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if meta.get("geometry_hash") in geom_hashes:
+                self.disk.remove(entry.name[:-len(".json")])
+                removed += 1
+        return removed
+
+
+_default_cache: Optional[PaddockMaskCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_paddock_mask_cache() -> PaddockMaskCache:
+    """Get the process-wide paddock mask cache."""
+    global _default_cache
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PaddockMaskCache()
+        return _default_cache
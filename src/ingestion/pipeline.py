@@ -35,18 +35,20 @@ from config import (
     get_farm_bbox,
     get_paddocks_geojson,
 )
-from providers import ProviderFactory, ActivationTimeoutError, QuotaExceededError
+from providers import ProviderFactory, ActivationTimeoutError, QuotaExceededError, provider_slot
 from composite import (
+    TimeStack,
     create_median_composite,
+    create_median_composite_from_stack,
     resample_to_resolution,
     merge_providers,
-    compute_ndvi,
-    compute_evi,
-    compute_ndwi,
+    compute_index_cube,
 )
 from zonal_stats import compute_zonal_stats
 from writer import write_observations_to_convex, notify_completion
 from observation_types import ObservationRecord
+from colormap import NDVI_COLOR_RAMP, ColorRamp, colorize
+from profiling import PipelineProfiler
 
 
 logging.basicConfig(
@@ -86,27 +88,38 @@ def create_rgb_composite(bands: 'xr.DataArray') -> 'np.ndarray':
     return rgb_scaled.astype(np.uint8)
 
 
-def save_geotiff(
+def encode_geotiff(
     data: 'np.ndarray',
     bounds: tuple[float, float, float, float],
     crs: str,
-    output_path: str,
     nodata: float | None = None,
-) -> str:
+    cog: bool = False,
+    blocksize: int = 512,
+    overview_resampling: str = "average",
+) -> bytes:
     """
-    Save array data as a GeoTIFF file.
+    Encode array data as GeoTIFF bytes (in memory, no temp file).
+
+    With cog=True the file is written as a Cloud-Optimized GeoTIFF: internal
+    blocksize x blocksize tiles, deflate with a predictor suited to the dtype
+    (horizontal differencing for integers, floating point for floats) and
+    internal overviews, so clients can fetch a zoom level and window with
+    HTTP range requests.
 
     Args:
         data: numpy array with shape (bands, H, W) or (H, W)
         bounds: Bounding box (west, south, east, north)
         crs: Coordinate reference system string
-        output_path: Path to write the GeoTIFF
         nodata: Optional nodata value
+        cog: Write a Cloud-Optimized GeoTIFF
+        blocksize: COG tile size (256 or 512)
+        overview_resampling: Resampling for COG overviews
 
     Returns:
-        Path to the saved file
+        GeoTIFF file contents
     """
-    import rasterio
+    import numpy as np
+    from rasterio.io import MemoryFile
     from rasterio.transform import from_bounds
 
     # Ensure 3D array
@@ -122,26 +135,92 @@ def save_geotiff(
     # Determine dtype
     dtype = data.dtype
 
-    # Write GeoTIFF
-    with rasterio.open(
-        output_path,
-        'w',
-        driver='GTiff',
-        height=height,
-        width=width,
-        count=bands,
-        dtype=dtype,
-        crs=crs,
-        transform=transform,
-        compress='deflate',
-        nodata=nodata,
-    ) as dst:
-        for i in range(bands):
-            dst.write(data[i], i + 1)
+    if cog:
+        # The COG driver builds the tiling and overviews when the file is closed
+        options = {
+            'driver': 'COG',
+            'blocksize': blocksize,
+            'predictor': 'FLOATING_POINT' if np.issubdtype(dtype, np.floating) else 'STANDARD',
+            'overviews': 'AUTO',
+            'overview_resampling': overview_resampling,
+        }
+    else:
+        options = {'driver': 'GTiff'}
+
+    # Write GeoTIFF into an in-memory GDAL file
+    with MemoryFile() as memfile:
+        with memfile.open(
+            height=height,
+            width=width,
+            count=bands,
+            dtype=dtype,
+            crs=crs,
+            transform=transform,
+            compress='deflate',
+            nodata=nodata,
+            **options,
+        ) as dst:
+            for i in range(bands):
+                dst.write(data[i], i + 1)
+        return memfile.read()
+
+
+def save_geotiff(
+    data: 'np.ndarray',
+    bounds: tuple[float, float, float, float],
+    crs: str,
+    output_path: str,
+    nodata: float | None = None,
+    cog: bool = False,
+    blocksize: int = 512,
+    overview_resampling: str = "average",
+) -> str:
+    """
+    Save array data as a GeoTIFF file.
+
+    See encode_geotiff for the COG options.
+
+    Args:
+        data: numpy array with shape (bands, H, W) or (H, W)
+        bounds: Bounding box (west, south, east, north)
+        crs: Coordinate reference system string
+        output_path: Path to write the GeoTIFF
+        nodata: Optional nodata value
+        cog: Write a Cloud-Optimized GeoTIFF
+        blocksize: COG tile size (256 or 512)
+        overview_resampling: Resampling for COG overviews
 
+    Returns:
+        Path to the saved file
+    """
+    with open(output_path, 'wb') as f:
+        f.write(encode_geotiff(data, bounds, crs, nodata, cog, blocksize, overview_resampling))
     return output_path
 
 
+def encode_png(data: 'np.ndarray') -> bytes:
+    """
+    Encode RGB array data as PNG bytes.
+
+    Args:
+        data: numpy array with shape (3, H, W) containing uint8 RGB values
+
+    Returns:
+        PNG file contents
+    """
+    import io
+    from PIL import Image
+    import numpy as np
+
+    # Transpose from (3, H, W) to (H, W, 3) for PIL
+    if data.shape[0] == 3:
+        data = np.transpose(data, (1, 2, 0))
+
+    buffer = io.BytesIO()
+    Image.fromarray(data, mode='RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
 def save_png(
     data: 'np.ndarray',
     output_path: str,
@@ -156,17 +235,32 @@ def save_png(
     Returns:
         Path to the saved file
     """
+    with open(output_path, 'wb') as f:
+        f.write(encode_png(data))
+    return output_path
+
+
+def encode_rgba_png(data: 'np.ndarray') -> bytes:
+    """
+    Encode RGBA array data as PNG bytes with transparency support.
+
+    Args:
+        data: numpy array with shape (4, H, W) or (H, W, 4) containing uint8 RGBA values
+
+    Returns:
+        PNG file contents
+    """
+    import io
     from PIL import Image
     import numpy as np
 
-    # Transpose from (3, H, W) to (H, W, 3) for PIL
-    if data.shape[0] == 3:
+    # Transpose from (4, H, W) to (H, W, 4) for PIL if needed
+    if data.shape[0] == 4:
         data = np.transpose(data, (1, 2, 0))
 
-    img = Image.fromarray(data, mode='RGB')
-    img.save(output_path, 'PNG')
-
-    return output_path
+    buffer = io.BytesIO()
+    Image.fromarray(data, mode='RGBA').save(buffer, 'PNG')
+    return buffer.getvalue()
 
 
 def save_rgba_png(
@@ -183,32 +277,33 @@ def save_rgba_png(
     Returns:
         Path to the saved file
     """
-    from PIL import Image
-    import numpy as np
+    with open(output_path, 'wb') as f:
+        f.write(encode_rgba_png(data))
+    return output_path
 
-    # Transpose from (4, H, W) to (H, W, 4) for PIL if needed
-    if data.shape[0] == 4:
-        data = np.transpose(data, (1, 2, 0))
 
-    img = Image.fromarray(data, mode='RGBA')
-    img.save(output_path, 'PNG')
+def colorize_index_to_png(
+    values: 'np.ndarray',
+    output_path: str,
+    ramp: ColorRamp,
+) -> str:
+    """
+    Apply a color ramp to an index raster and save as RGBA PNG.
 
-    return output_path
+    Args:
+        values: 2D numpy array with index values (NaN = no data)
+        output_path: Path to write the PNG
+        ramp: Color ramp, e.g. one of colormap.COLOR_RAMPS
 
+    Returns:
+        Path to the saved file
+    """
+    # Ensure 2D array
+    if values.ndim == 3:
+        values = values[0]  # Take first band if 3D
 
-# NDVI color ramp matching frontend NDVIHeatmapLayer.tsx
-# Brown (low/bare) -> Yellow (sparse) -> Light Green (moderate) -> Dark Green (healthy)
-NDVI_COLOR_RAMP = [
-    (-0.2, (139, 69, 19)),    # Brown #8B4513 (bare soil/water)
-    (0.0, (210, 105, 30)),    # Sienna #D2691E
-    (0.2, (218, 165, 32)),    # Goldenrod #DAA520
-    (0.3, (255, 215, 0)),     # Yellow #FFD700
-    (0.4, (154, 205, 50)),    # Yellow-green #9ACD32
-    (0.5, (124, 252, 0)),     # Light green #7CFC00
-    (0.6, (50, 205, 50)),     # Lime green #32CD32
-    (0.7, (34, 139, 34)),     # Forest green #228B22
-    (0.8, (0, 100, 0)),       # Dark green #006400
-]
+    # Invalid (NaN) pixels are transparent (alpha = 0)
+    return save_rgba_png(colorize(values, ramp), output_path)
 
 
 def colorize_ndvi_to_png(
@@ -232,59 +327,166 @@ def colorize_ndvi_to_png(
     Returns:
         Path to the saved file
     """
+    return colorize_index_to_png(ndvi, output_path, NDVI_COLOR_RAMP)
+
+
+class EncodedTile(TypedDict):
+    """An encoded tile file held in memory."""
+    data: bytes
+    file_extension: str  # "png" or "tif"
+
+
+class EncodedTiles(TypedDict):
+    """Output of encode_tiles."""
+    tiles: dict[str, EncodedTile]  # tile_type -> encoded file
+    pyramids: dict[str, dict[str, bytes]]  # tile_type -> {"{z}/{x}/{y}.png": bytes}
+
+
+def encode_tiles(
+    bands: 'xr.DataArray',
+    ndvi: 'xr.DataArray',
+    bounds: tuple[float, float, float, float],
+    crs: str,
+    index_layers: Optional[dict[str, 'xr.DataArray']] = None,
+    cog: bool = False,
+    cog_blocksize: int = 512,
+    pyramid: bool = False,
+    pyramid_min_zoom: int = 12,
+    pyramid_max_zoom: Optional[int] = None,
+    pyramid_workers: int = 4,
+    resolution_meters: Optional[float] = None,
+) -> EncodedTiles:
+    """
+    Encode image tiles for RGB and index layers in memory.
+
+    RGB tiles are encoded as PNG for direct MapLibre rendering.
+    NDVI tiles are encoded as GeoTIFF for data preservation.
+
+    In COG mode the index GeoTIFFs are Cloud-Optimized GeoTIFFs with
+    overviews, and EVI/NDWI tiles are encoded alongside NDVI when
+    index_layers provides them.
+
+    With pyramid enabled, the RGB and NDVI heatmap layers are also cut into
+    web-mercator {z}/{x}/{y}.png tile pyramids.
+
+    Args:
+        bands: xarray DataArray with band data
+        ndvi: xarray DataArray with NDVI values
+        bounds: Outer pixel edges (west, south, east, north) in `crs`
+        crs: Coordinate reference system string
+        index_layers: Additional index layers by tile type ("evi", "ndwi")
+        cog: Encode index tiles as Cloud-Optimized GeoTIFFs
+        cog_blocksize: COG internal tile size (256 or 512)
+        pyramid: Also render XYZ tile pyramids for the PNG layers
+        pyramid_min_zoom: Lowest pyramid zoom level
+        pyramid_max_zoom: Highest pyramid zoom level (None = native zoom)
+        pyramid_workers: Threads rendering pyramid tiles
+        resolution_meters: Imagery resolution, used for the native zoom
+
+    Returns:
+        EncodedTiles with tile files and pyramids by tile type
+    """
     import numpy as np
 
-    # Ensure 2D array
-    if ndvi.ndim == 3:
-        ndvi = ndvi[0]  # Take first band if 3D
+    tiles: dict[str, EncodedTile] = {}
+    pyramids: dict[str, dict[str, bytes]] = {}
 
-    height, width = ndvi.shape
+    def add_pyramid(tile_type: str, rgba: 'np.ndarray') -> None:
+        from tile_pyramid import generate_pyramid
+
+        logger.info(f"Generating {tile_type} tile pyramid...")
+        pyramids[tile_type] = generate_pyramid(
+            rgba, bounds, crs,
+            min_zoom=pyramid_min_zoom,
+            max_zoom=pyramid_max_zoom,
+            resolution_meters=resolution_meters,
+            workers=pyramid_workers,
+        )['tiles']
+
+    # Generate RGB composite as PNG if all bands available
+    band_names = list(bands.coords.get('band', []))
+    if 'red' in band_names and 'green' in band_names and 'blue' in band_names:
+        logger.info("Generating RGB composite tile (PNG)...")
+        rgb_data = create_rgb_composite(bands)
+        tiles['rgb'] = EncodedTile(data=encode_png(rgb_data), file_extension='png')
+
+        if pyramid:
+            # Transparent where any band is missing
+            valid = np.isfinite(bands.sel(band=['red', 'green', 'blue']).values).all(axis=0)
+            alpha = (valid * 255).astype(np.uint8)[np.newaxis, ...]
+            add_pyramid('rgb', np.concatenate([rgb_data, alpha], axis=0))
+
+    # Generate index tiles as GeoTIFF (for data preservation)
+    geotiff_layers = {'ndvi': ndvi}
+    if cog and index_layers:
+        geotiff_layers.update({k: v for k, v in index_layers.items() if k in ('evi', 'ndwi')})
+
+    for tile_type, layer in geotiff_layers.items():
+        logger.info(f"Generating {tile_type.upper()} tile ({'COG' if cog else 'GeoTIFF'})...")
+        # Handle both xarray DataArray and numpy array
+        layer_data = layer.values if hasattr(layer, 'values') else layer
+        if layer_data.ndim == 2:
+            layer_data = layer_data[np.newaxis, ...]
+        # Scale index from -1..1 to 0..255 for storage (0 = nodata)
+        layer_scaled = np.clip((layer_data + 1) / 2 * 255, 0, 255)
+        layer_scaled = np.nan_to_num(layer_scaled, nan=0).astype(np.uint8)
+        tiles[tile_type] = EncodedTile(
+            data=encode_geotiff(layer_scaled, bounds, crs, nodata=0, cog=cog, blocksize=cog_blocksize),
+            file_extension='tif',
+        )
 
-    # Create RGBA output array
-    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    # Generate colorized NDVI heatmap as PNG for direct MapLibre display
+    logger.info("Generating NDVI heatmap tile (PNG)...")
+    # Use the raw NDVI data (not scaled) for colorization
+    ndvi_raw = ndvi.values if hasattr(ndvi, 'values') else ndvi
+    ndvi_rgba = colorize(ndvi_raw, NDVI_COLOR_RAMP)
+    tiles['ndvi_heatmap'] = EncodedTile(data=encode_rgba_png(ndvi_rgba), file_extension='png')
 
-    # Create mask for valid (non-NaN) pixels
-    valid_mask = ~np.isnan(ndvi)
+    if pyramid:
+        add_pyramid('ndvi_heatmap', ndvi_rgba)
 
-    # Apply color ramp using linear interpolation
-    for i in range(len(NDVI_COLOR_RAMP) - 1):
-        val_low, color_low = NDVI_COLOR_RAMP[i]
-        val_high, color_high = NDVI_COLOR_RAMP[i + 1]
+    return EncodedTiles(tiles=tiles, pyramids=pyramids)
 
-        # Find pixels in this range
-        in_range = valid_mask & (ndvi >= val_low) & (ndvi < val_high)
 
-        if np.any(in_range):
-            # Calculate interpolation factor (0-1)
-            t = (ndvi[in_range] - val_low) / (val_high - val_low)
-            t = np.clip(t, 0, 1)
+def write_tiles(
+    encoded: EncodedTiles,
+    output_dir: str,
+    capture_date: str,
+) -> dict[str, str]:
+    """
+    Write encoded tiles to disk (for debugging and local inspection).
 
-            # Interpolate RGB values
-            for c in range(3):
-                rgba[in_range, c] = np.round(
-                    color_low[c] + t * (color_high[c] - color_low[c])
-                ).astype(np.uint8)
+    Args:
+        encoded: Output of encode_tiles
+        output_dir: Directory to write tiles
+        capture_date: Capture date YYYY-MM-DD
 
-            # Set alpha to fully opaque for valid pixels
-            rgba[in_range, 3] = 255
+    Returns:
+        Dictionary mapping tile type to file path (directory for *_pyramid)
+    """
+    import os
 
-    # Handle values at or above the max threshold
-    at_max = valid_mask & (ndvi >= NDVI_COLOR_RAMP[-1][0])
-    if np.any(at_max):
-        for c in range(3):
-            rgba[at_max, c] = NDVI_COLOR_RAMP[-1][1][c]
-        rgba[at_max, 3] = 255
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
 
-    # Handle values below the min threshold
-    at_min = valid_mask & (ndvi < NDVI_COLOR_RAMP[0][0])
-    if np.any(at_min):
-        for c in range(3):
-            rgba[at_min, c] = NDVI_COLOR_RAMP[0][1][c]
-        rgba[at_min, 3] = 255
+    for tile_type, tile in encoded['tiles'].items():
+        tile_path = os.path.join(output_dir, f"{tile_type}_{capture_date}.{tile['file_extension']}")
+        with open(tile_path, 'wb') as f:
+            f.write(tile['data'])
+        paths[tile_type] = tile_path
+        logger.info(f"  Saved {tile_type} tile: {tile_path}")
 
-    # Invalid (NaN) pixels remain transparent (alpha = 0)
+    for tile_type, pyramid_tiles in encoded['pyramids'].items():
+        pyramid_dir = os.path.join(output_dir, f"{tile_type}_pyramid_{capture_date}")
+        for relative_path, data in pyramid_tiles.items():
+            tile_path = os.path.join(pyramid_dir, relative_path)
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+            with open(tile_path, 'wb') as f:
+                f.write(data)
+        paths[f"{tile_type}_pyramid"] = pyramid_dir
+        logger.info(f"  Saved {tile_type} tile pyramid: {pyramid_dir}")
 
-    return save_rgba_png(rgba, output_path)
+    return paths
 
 
 def generate_tiles(
@@ -294,12 +496,10 @@ def generate_tiles(
     crs: str,
     output_dir: str,
     capture_date: str,
+    **kwargs: Any,
 ) -> dict[str, str]:
     """
-    Generate image tiles for RGB and index layers.
-
-    RGB tiles are saved as PNG for direct MapLibre rendering.
-    NDVI tiles are saved as GeoTIFF for data preservation.
+    Generate image tiles for RGB and index layers and write them to output_dir.
 
     Args:
         bands: xarray DataArray with band data
@@ -308,49 +508,18 @@ def generate_tiles(
         crs: Coordinate reference system string
         output_dir: Directory to write tiles
         capture_date: Capture date YYYY-MM-DD
+        **kwargs: Tile options passed to encode_tiles
 
     Returns:
-        Dictionary mapping tile type to file path
+        Dictionary mapping tile type to file path (directory for *_pyramid)
     """
-    import os
-    import numpy as np
-
-    os.makedirs(output_dir, exist_ok=True)
-    tiles = {}
-
-    # Generate RGB composite as PNG if all bands available
-    band_names = list(bands.coords.get('band', []))
-    if 'red' in band_names and 'green' in band_names and 'blue' in band_names:
-        logger.info("Generating RGB composite tile (PNG)...")
-        rgb_data = create_rgb_composite(bands)
-        rgb_path = os.path.join(output_dir, f"rgb_{capture_date}.png")
-        save_png(rgb_data, rgb_path)
-        tiles['rgb'] = rgb_path
-        logger.info(f"  Saved RGB tile: {rgb_path}")
-
-    # Generate NDVI tile as GeoTIFF (for data preservation)
-    logger.info("Generating NDVI tile (GeoTIFF)...")
-    # Handle both xarray DataArray and numpy array
-    ndvi_data = ndvi.values if hasattr(ndvi, 'values') else ndvi
-    if ndvi_data.ndim == 2:
-        ndvi_data = ndvi_data[np.newaxis, ...]
-    ndvi_path = os.path.join(output_dir, f"ndvi_{capture_date}.tif")
-    # Scale NDVI from -1..1 to 0..255 for storage
-    ndvi_scaled = np.clip((ndvi_data + 1) / 2 * 255, 0, 255).astype(np.uint8)
-    save_geotiff(ndvi_scaled, bounds, crs, ndvi_path, nodata=0)
-    tiles['ndvi'] = ndvi_path
-    logger.info(f"  Saved NDVI tile: {ndvi_path}")
+    encoded = encode_tiles(bands, ndvi, bounds, crs, **kwargs)
+    return write_tiles(encoded, output_dir, capture_date)
 
-    # Generate colorized NDVI heatmap as PNG for direct MapLibre display
-    logger.info("Generating NDVI heatmap tile (PNG)...")
-    # Use the raw NDVI data (not scaled) for colorization
-    ndvi_raw = ndvi.values if hasattr(ndvi, 'values') else ndvi
-    ndvi_heatmap_path = os.path.join(output_dir, f"ndvi_heatmap_{capture_date}.png")
-    colorize_ndvi_to_png(ndvi_raw, ndvi_heatmap_path)
-    tiles['ndvi_heatmap'] = ndvi_heatmap_path
-    logger.info(f"  Saved NDVI heatmap tile: {ndvi_heatmap_path}")
 
-    return tiles
+class NoImageryError(ValueError):
+    """Raised when no provider has any imagery for the date range (not a failure to retry)."""
+    pass
 
 
 class PipelineResult(TypedDict):
@@ -362,7 +531,9 @@ class PipelineResult(TypedDict):
     resolution: int
     total_paddocks: int
     valid_observations: int
-    tiles_generated: dict[str, str]  # tile_type -> file_path
+    tiles_generated: dict[str, str]  # tile_type -> file_path (directory for *_pyramid); empty unless WRITE_TILE_FILES
+    profile: dict  # Per-stage timing/memory from PipelineProfiler.to_dict()
+    convex_written: Optional[bool]  # Whether the Convex write succeeded; None if not configured
 
 
 def get_date_range(window_days: int, end_date: Optional[datetime] = None) -> tuple[str, str]:
@@ -390,6 +561,7 @@ def get_historical_windows(
     years: int,
     window_days: int = 21,
     step_days: int = 14,
+    end_date: Optional[datetime] = None,
 ) -> list[tuple[str, str]]:
     """
     Generate date windows for historical backfill.
@@ -401,12 +573,14 @@ def get_historical_windows(
         years: Number of years to go back
         window_days: Size of each composite window (default 21 days)
         step_days: Step size between windows (default 14 days)
+        end_date: End of the most recent window (defaults to now)
 
     Returns:
         List of (start_date, end_date) tuples in YYYY-MM-DD format
     """
     windows = []
-    end_date = datetime.now()
+    if end_date is None:
+        end_date = datetime.now()
     earliest_date = end_date - timedelta(days=years * 365)
 
     current_end = end_date
@@ -424,7 +598,8 @@ def get_historical_windows(
 def run_pipeline_for_farm(
     farm_config: FarmConfig,
     pipeline_config: Optional[PipelineConfig] = None,
-    convex_writer: Optional[Callable[[list[ObservationRecord]], int]] = None
+    convex_writer: Optional[Callable[[list[ObservationRecord]], int]] = None,
+    date_range: Optional[tuple[str, str]] = None,
 ) -> PipelineResult:
     """
     Run the complete processing pipeline for a single farm.
@@ -433,13 +608,21 @@ def run_pipeline_for_farm(
         farm_config: Farm configuration
         pipeline_config: Pipeline configuration (uses defaults if None)
         convex_writer: Optional function to write observations to Convex
+        date_range: (start_date, end_date) YYYY-MM-DD composite window
+                    (defaults to the composite_window_days before now)
 
     Returns:
         PipelineResult with observation records
+
+    Raises:
+        NoImageryError: If every provider answered and none had imagery for the window
+        ValueError: If no provider produced data because of errors
     """
     if pipeline_config is None:
         pipeline_config = load_env_config()
 
+    profiler = PipelineProfiler(enabled=pipeline_config.profile_stages)
+
     logger.info(f"Processing farm: {farm_config.name} ({farm_config.external_id})")
     logger.info(f"  Tier: {farm_config.subscription_tier}")
     logger.info(f"  Premium features: {farm_config.is_premium}")
@@ -472,7 +655,10 @@ def run_pipeline_for_farm(
 
     # Step 2: Get bounding box and date range
     bbox = get_farm_bbox(farm_config)
-    start_date, end_date = get_date_range(pipeline_config.composite_window_days)
+    if date_range is not None:
+        start_date, end_date = date_range
+    else:
+        start_date, end_date = get_date_range(pipeline_config.composite_window_days)
 
     logger.info(f"  Bounding box: {bbox}")
     logger.info(f"  Date range: {start_date} to {end_date}")
@@ -482,18 +668,21 @@ def run_pipeline_for_farm(
     all_provider_masks = []
     all_provider_cloud_pcts = []
     all_provider_cloud_masks = []  # Boolean cloud masks for zonal stats
+    provider_failures = 0
 
     for provider in providers:
         logger.info(f"Querying {provider.__class__.__name__}...")
+        stage_prefix = provider.__class__.__name__.replace("Provider", "").lower()
 
         try:
             # Query for imagery
-            items = provider.query(
-                bbox=bbox,
-                start_date=start_date,
-                end_date=end_date,
-                max_cloud_cover=pipeline_config.max_cloud_cover,
-            )
+            with provider_slot(stage_prefix), profiler.stage(f"{stage_prefix}.query"):
+                items = provider.query(
+                    bbox=bbox,
+                    start_date=start_date,
+                    end_date=end_date,
+                    max_cloud_cover=pipeline_config.max_cloud_cover,
+                )
 
             if not items:
                 logger.warning(f"No imagery found from {provider.__class__.__name__}")
@@ -506,15 +695,64 @@ def run_pipeline_for_farm(
             if "swir" in band_names and not provider.band_names.get("swir"):
                 band_names.remove("swir")
 
+            if hasattr(provider, "load_stack"):
+                # Stream cloud-masked slices to disk and composite block by
+                # block, so the time stack is never held in memory
+                logger.info(f"  Loading bands: {band_names} (streamed to disk)")
+                with TimeStack(max_time=len(items)) as stack:
+                    with provider_slot(stage_prefix), profiler.stage(f"{stage_prefix}.load"):
+                        provider.load_stack(items, band_names, bbox, stack)
+                        profiler.record_array("data", stack)
+
+                    logger.info(f"  Median compositing {stack.n_time} observations...")
+                    with profiler.stage(f"{stage_prefix}.composite"):
+                        composite_result = create_median_composite_from_stack(
+                            stack,
+                            memory_budget_mb=pipeline_config.composite_memory_budget_mb,
+                            workers=pipeline_config.composite_workers,
+                        )
+                        masked_data = composite_result["composite"]
+                        profiler.record_array("composite", masked_data)
+
+                # A pixel is cloudy if no observation saw it clearly
+                cloud_mask = masked_data.isnull().all(dim="band").assign_attrs(
+                    crs=masked_data.attrs.get("crs", "EPSG:4326"),
+                )
+                total_pixels = composite_result["total_pixel_count"]
+                cloud_free_pct = composite_result["valid_pixel_count"] / total_pixels if total_pixels else 0.0
+                logger.info(f"  Cloud-free pixels: {cloud_free_pct:.1%}")
+
+                all_provider_data.append(masked_data)
+                all_provider_masks.append(~masked_data.isnull())
+                all_provider_cloud_pcts.append(cloud_free_pct)
+                all_provider_cloud_masks.append(cloud_mask)
+                continue
+
             # Load bands
             logger.info(f"  Loading bands: {band_names}")
-            data = provider.load(items, band_names, bbox)
+            with provider_slot(stage_prefix), profiler.stage(f"{stage_prefix}.load"):
+                data = provider.load(items, band_names, bbox)
+                profiler.record_array("data", data)
 
             # Apply cloud masking
             logger.info("  Applying cloud mask...")
-            masked_data, cloud_free_pct, cloud_mask = provider.cloud_mask(data, items, bbox)
+            with provider_slot(stage_prefix), profiler.stage(f"{stage_prefix}.cloud_mask"):
+                masked_data, cloud_free_pct, cloud_mask = provider.cloud_mask(data, items, bbox)
             logger.info(f"  Cloud-free pixels: {cloud_free_pct:.1%}")
 
+            # Reduce time-stacked observations to a per-pixel median
+            if "time" in masked_data.dims:
+                logger.info(f"  Median compositing {masked_data.sizes['time']} observations...")
+                with profiler.stage(f"{stage_prefix}.composite"):
+                    composite_result = create_median_composite(
+                        masked_data,
+                        valid_mask=masked_data.notnull().any(dim="band"),
+                        memory_budget_mb=pipeline_config.composite_memory_budget_mb,
+                        workers=pipeline_config.composite_workers,
+                    )
+                    masked_data = composite_result["composite"].assign_attrs(data.attrs)
+                    profiler.record_array("composite", masked_data)
+
             all_provider_data.append(masked_data)
             # Create mask where True = valid pixel
             valid_mask = ~masked_data.isnull()
@@ -528,6 +766,7 @@ def run_pipeline_for_farm(
                 f"  Activation timeout for {provider.__class__.__name__}: {e}. "
                 f"Skipping and trying other providers."
             )
+            provider_failures += 1
             continue
         except QuotaExceededError as e:
             # Quota exceeded - skip this provider but don't fail the pipeline
@@ -535,12 +774,16 @@ def run_pipeline_for_farm(
                 f"  Quota exceeded for {provider.__class__.__name__}: {e}. "
                 f"Skipping and trying other providers."
             )
+            provider_failures += 1
             continue
         except Exception as e:
             logger.error(f"  Error processing {provider.__class__.__name__}: {e}")
+            provider_failures += 1
             continue
 
     if not all_provider_data:
+        if not provider_failures:
+            raise NoImageryError(f"No imagery from any provider for {start_date} to {end_date}")
         raise ValueError("No valid data from any provider")
 
     # Step 4: Create composite
@@ -555,12 +798,14 @@ def run_pipeline_for_farm(
     else:
         # Multiple providers - merge at target resolution
         logger.info(f"  Merging {len(all_provider_data)} providers at {target_resolution}m")
-        composite_data = merge_providers(
-            all_provider_data,
-            all_provider_masks,
-            target_resolution=target_resolution,
-            merge_method="highest_resolution",
-        )
+        with profiler.stage("merge_providers"):
+            composite_data = merge_providers(
+                all_provider_data,
+                all_provider_masks,
+                target_resolution=target_resolution,
+                merge_method="highest_resolution",
+            )
+            profiler.record_array("composite", composite_data)
         avg_cloud_free_pct = sum(all_provider_cloud_pcts) / len(all_provider_cloud_pcts)
         # For multiple providers, use OR of cloud masks (pixel is cloudy if any provider says so)
         # This is conservative - we only trust pixels clear in all providers
@@ -573,105 +818,131 @@ def run_pipeline_for_farm(
     # Step 5: Compute vegetation indices
     logger.info("Computing vegetation indices...")
 
-    # Compute NDVI
-    ndvi = compute_ndvi(composite_data)
+    # Single pass over the composite: (index, y, x) cube shared by tiles and zonal stats
+    with profiler.stage("indices"):
+        index_cube = compute_index_cube(composite_data)
+        profiler.record_array("index_cube", index_cube)
+    ndvi = index_cube.sel(index="ndvi")
     logger.info(f"  NDVI: min={float(ndvi.min()):.2f}, max={float(ndvi.max()):.2f}, mean={float(ndvi.mean()):.2f}")
+    logger.info(f"  Indices: {list(index_cube.coords['index'].values)}")
 
-    # Compute EVI and NDWI if bands available
-    evi = None
-    ndwi = None
-
-    band_names = list(composite_data.coords.get("band", []))
-    if "blue" in band_names and "swir" in band_names:
-        evi = compute_evi(composite_data)
-        ndwi = compute_ndwi(composite_data)
-    elif "blue" in band_names:
-        evi = compute_evi(composite_data)
-    elif "swir" in band_names:
-        ndwi = compute_ndwi(composite_data)
-
-    # Step 5.5: Generate GeoTIFF tiles for visualization
+    # Step 5.5: Encode tiles for visualization (in memory; files are opt-in)
     tiles_generated = {}
-    if pipeline_config.output_dir:
-        logger.info("Generating GeoTIFF tiles...")
+    if pipeline_config.write_to_convex or pipeline_config.write_tile_files:
+        logger.info("Generating tiles...")
         try:
             # Extract bounds from composite data
             x_coords = composite_data.coords.get('x')
             y_coords = composite_data.coords.get('y')
             if x_coords is not None and y_coords is not None:
+                # Coordinates are pixel centers; the tile bounds are the outer
+                # pixel edges (from_bounds would otherwise shift every tile
+                # by half a pixel)
+                half_x = abs(float(x_coords[1] - x_coords[0])) / 2 if x_coords.size > 1 else 0.0
+                half_y = abs(float(y_coords[1] - y_coords[0])) / 2 if y_coords.size > 1 else 0.0
                 tile_bounds = (
-                    float(x_coords.min()),
-                    float(y_coords.min()),
-                    float(x_coords.max()),
-                    float(y_coords.max()),
+                    float(x_coords.min()) - half_x,
+                    float(y_coords.min()) - half_y,
+                    float(x_coords.max()) + half_x,
+                    float(y_coords.max()) + half_y,
                 )
                 tile_crs = composite_data.attrs.get('crs', 'EPSG:32616')
 
-                tiles_generated = generate_tiles(
-                    bands=composite_data,
-                    ndvi=ndvi,
-                    bounds=tile_bounds,
-                    crs=tile_crs,
-                    output_dir=pipeline_config.output_dir,
-                    capture_date=end_date,
+                with profiler.stage("tiles"):
+                    encoded_tiles = encode_tiles(
+                        bands=composite_data,
+                        ndvi=ndvi,
+                        bounds=tile_bounds,
+                        crs=tile_crs,
+                        index_layers={
+                            str(name): index_cube.sel(index=name)
+                            for name in index_cube.coords['index'].values
+                        },
+                        cog=pipeline_config.cog_tiles,
+                        cog_blocksize=pipeline_config.cog_blocksize,
+                        pyramid=pipeline_config.tile_pyramid,
+                        pyramid_min_zoom=pipeline_config.tile_pyramid_min_zoom,
+                        pyramid_max_zoom=pipeline_config.tile_pyramid_max_zoom or None,
+                        pyramid_workers=pipeline_config.tile_pyramid_workers,
+                        resolution_meters=target_resolution,
+                    )
+                    if pipeline_config.write_tile_files and pipeline_config.output_dir:
+                        tiles_generated = write_tiles(encoded_tiles, pipeline_config.output_dir, end_date)
+                logger.info(
+                    f"  Generated {len(encoded_tiles['tiles'])} tiles, "
+                    f"{len(encoded_tiles['pyramids'])} tile pyramids"
                 )
-                logger.info(f"  Generated {len(tiles_generated)} tiles")
 
                 # Step 5.6: Upload tiles to R2 and write metadata to Convex
-                if tiles_generated and pipeline_config.write_to_convex:
+                if encoded_tiles['tiles'] and pipeline_config.write_to_convex:
                     logger.info("Uploading tiles to R2...")
                     try:
-                        from storage.r2 import R2Storage, get_retention_days
-                        from writer import SatelliteTileRecord, write_satellite_tile_to_convex
-                        from rasterio.warp import transform_bounds
-
-                        r2 = R2Storage()
-                        retention_days = get_retention_days(
-                            farm_config.subscription_tier,
-                            'raw_imagery'
-                        )
+                        with profiler.stage("r2_upload"):
+                            from storage.r2 import R2Storage, get_retention_days
+                            from writer import SatelliteTileRecord, write_satellite_tiles_to_convex
+                            from rasterio.warp import transform_bounds
+
+                            r2 = R2Storage()
+                            retention_days = get_retention_days(
+                                farm_config.subscription_tier,
+                                'raw_imagery'
+                            )
 
-                        # Convert bounds from projected CRS to WGS84 for storage
-                        wgs84_bounds = transform_bounds(
-                            tile_crs,  # Source CRS (e.g., EPSG:32616)
-                            'EPSG:4326',  # Target CRS (WGS84)
-                            *tile_bounds
-                        )
-                        bounds_dict = {
-                            'west': wgs84_bounds[0],
-                            'south': wgs84_bounds[1],
-                            'east': wgs84_bounds[2],
-                            'north': wgs84_bounds[3],
-                        }
-                        logger.info(f"  Tile bounds (WGS84): {bounds_dict}")
-
-                        for tile_type, tile_path in tiles_generated.items():
-                            logger.info(f"  Uploading {tile_type} tile to R2...")
-                            result = r2.upload_tile(
-                                file_path=tile_path,
+                            # Convert bounds from projected CRS to WGS84 for storage
+                            wgs84_bounds = transform_bounds(
+                                tile_crs,  # Source CRS (e.g., EPSG:32616)
+                                'EPSG:4326',  # Target CRS (WGS84)
+                                *tile_bounds
+                            )
+                            bounds_dict = {
+                                'west': wgs84_bounds[0],
+                                'south': wgs84_bounds[1],
+                                'east': wgs84_bounds[2],
+                                'north': wgs84_bounds[3],
+                            }
+                            logger.info(f"  Tile bounds (WGS84): {bounds_dict}")
+
+                            # Pyramids live under a predictable prefix; no per-tile Convex records
+                            for tile_type, pyramid_tiles in encoded_tiles['pyramids'].items():
+                                pyramid_result = r2.upload_pyramid(
+                                    pyramid_tiles,
+                                    farm_external_id=farm_config.external_id,
+                                    capture_date=end_date,
+                                    tile_type=tile_type,
+                                    retention_days=retention_days,
+                                    workers=pipeline_config.tile_pyramid_workers,
+                                )
+                                logger.info(f"    Uploaded {tile_type} pyramid: {pyramid_result['url_template']}")
+
+                            logger.info(f"  Uploading {len(encoded_tiles['tiles'])} tiles to R2...")
+                            upload_results = r2.upload_tiles(
+                                encoded_tiles['tiles'],
                                 farm_external_id=farm_config.external_id,
                                 capture_date=end_date,
-                                tile_type=tile_type,
                                 resolution_meters=target_resolution,
                                 retention_days=retention_days,
                             )
 
-                            # Write tile metadata to Convex
-                            tile_record = SatelliteTileRecord(
-                                farm_external_id=farm_config.external_id,
-                                capture_date=end_date,
-                                provider=source_provider,
-                                tile_type=tile_type,
-                                r2_key=result['r2_key'],
-                                r2_url=result['r2_url'],
-                                bounds=bounds_dict,
-                                cloud_cover_pct=(1.0 - avg_cloud_free_pct) * 100,
-                                resolution_meters=target_resolution,
-                                file_size_bytes=result['file_size_bytes'],
-                                expires_at=result['expires_at'],
-                            )
-                            write_satellite_tile_to_convex(tile_record)
-                            logger.info(f"    Uploaded {tile_type}: {result['r2_key']}")
+                            # Write all tile metadata to Convex in one mutation
+                            tile_records = [
+                                SatelliteTileRecord(
+                                    farm_external_id=farm_config.external_id,
+                                    capture_date=end_date,
+                                    provider=source_provider,
+                                    tile_type=tile_type,
+                                    r2_key=result['r2_key'],
+                                    r2_url=result['r2_url'],
+                                    bounds=bounds_dict,
+                                    cloud_cover_pct=(1.0 - avg_cloud_free_pct) * 100,
+                                    resolution_meters=target_resolution,
+                                    file_size_bytes=result['file_size_bytes'],
+                                    expires_at=result['expires_at'],
+                                )
+                                for tile_type, result in upload_results.items()
+                            ]
+                            write_satellite_tiles_to_convex(tile_records)
+                            for tile_type, result in upload_results.items():
+                                logger.info(f"    Uploaded {tile_type}: {result['r2_key']}")
 
                     except ImportError as e:
                         logger.warning(f"  R2 storage not available: {e}")
@@ -688,22 +959,15 @@ def run_pipeline_for_farm(
 
     paddocks_geojson = get_paddocks_geojson(farm_config.paddocks)
 
-    # Add NDVI as a band for zonal stats
-    if "band" in composite_data.dims:
-        # Create a combined DataArray with all indices
-        index_data = composite_data.copy()
-        # Add NDVI, EVI, NDWI as new bands
-        # This is simplified - ideally we'd stack them properly
-    else:
-        # Stack indices into a band dimension
-        pass
-
-    stats = compute_zonal_stats(
-        data=composite_data,
-        paddocks=farm_config.paddocks,
-        resolution_meters=target_resolution,
-        cloud_mask=combined_cloud_mask,
-    )
+    with profiler.stage("zonal_stats"):
+        stats = compute_zonal_stats(
+            data=index_cube,
+            paddocks=farm_config.paddocks,
+            resolution_meters=target_resolution,
+            cloud_mask=combined_cloud_mask,
+            method=pipeline_config.zonal_stats_method,
+            farm_id=farm_config.external_id,
+        )
 
     logger.info(f"  Processed {len(stats)} paddocks")
 
@@ -752,19 +1016,21 @@ def run_pipeline_for_farm(
         logger.warning(f"  All {len(observations)} paddocks failed - detected boundary_overlap failure")
 
     # Step 8: Write to Convex if configured
-    write_success = False
+    write_success = None
     if pipeline_config.write_to_convex:
+        write_success = False
         logger.info("Writing observations to Convex...")
         logger.info(f"  DEBUG: About to write {len(observations)} observations to Convex")
         try:
-            if convex_writer:
-                # Use provided writer function
-                result = convex_writer(observations)
-                logger.info(f"  Wrote {result} observations")
-            else:
-                # Use default writer
-                result = write_observations_to_convex(observations)
-                logger.info(f"  Wrote {result} observations")
+            with profiler.stage("convex_write"):
+                if convex_writer:
+                    # Use provided writer function
+                    result = convex_writer(observations)
+                    logger.info(f"  Wrote {result} observations")
+                else:
+                    # Use default writer
+                    result = write_observations_to_convex(observations)
+                    logger.info(f"  Wrote {result} observations")
             write_success = True
         except Exception as e:
             logger.error(f"  Error writing to Convex: {e}", exc_info=True)
@@ -782,6 +1048,8 @@ def run_pipeline_for_farm(
         total_paddocks=len(observations),
         valid_observations=valid_count,
         tiles_generated=tiles_generated,
+        profile=profiler.to_dict(),
+        convex_written=write_success,
     )
 
 
@@ -823,74 +1091,42 @@ def run_historical_backfill(
     farm_config: FarmConfig,
     years: int,
     pipeline_config: Optional[PipelineConfig] = None,
-    convex_writer: Optional[Callable[[list[ObservationRecord]], int]] = None
+    convex_writer: Optional[Callable[[list[ObservationRecord]], int]] = None,
+    workers: Optional[int] = None,
+    resume: bool = True,
 ) -> list[PipelineResult]:
     """
     Run historical backfill for a farm, processing multiple date windows.
 
+    Windows run concurrently (see backfill.py) and completed windows are
+    checkpointed, so an interrupted backfill resumes where it left off.
+
     Args:
         farm_config: Farm configuration
         years: Number of years to backfill
         pipeline_config: Pipeline configuration (uses defaults if None)
         convex_writer: Optional function to write observations to Convex
+        workers: Windows processed at once (defaults to pipeline_config.backfill_workers)
+        resume: Skip windows completed by a previous run of the same backfill
 
     Returns:
-        List of PipelineResult objects for each successful window
+        List of PipelineResult objects for each window completed in this run,
+        most recent window first
     """
+    from backfill import run_backfill
+
     if pipeline_config is None:
         pipeline_config = load_env_config()
 
-    logger.info(f"Starting historical backfill for {farm_config.name}")
-    logger.info(f"  Backfill period: {years} years")
-
-    # Generate historical windows
-    windows = get_historical_windows(
+    return run_backfill(
+        farm_config=farm_config,
         years=years,
-        window_days=pipeline_config.composite_window_days,
-        step_days=14,  # 2-week steps for good coverage
+        pipeline_config=pipeline_config,
+        convex_writer=convex_writer,
+        workers=workers or pipeline_config.backfill_workers,
+        resume=resume,
     )
 
-    logger.info(f"  Generated {len(windows)} date windows to process")
-
-    results = []
-    for i, (start_date, end_date) in enumerate(windows):
-        logger.info(f"\n{'='*40}")
-        logger.info(f"Window {i+1}/{len(windows)}: {start_date} to {end_date}")
-        logger.info(f"{'='*40}")
-
-        try:
-            # Create a modified config for this specific window
-            window_config = PipelineConfig(
-                composite_window_days=pipeline_config.composite_window_days,
-                max_cloud_cover=pipeline_config.max_cloud_cover,
-                min_cloud_free_pct=pipeline_config.min_cloud_free_pct,
-                write_to_convex=pipeline_config.write_to_convex,
-                output_dir=pipeline_config.output_dir,
-            )
-
-            # Run pipeline for this window
-            result = run_pipeline_for_farm(
-                farm_config=farm_config,
-                pipeline_config=window_config,
-                convex_writer=convex_writer,
-            )
-
-            results.append(result)
-            logger.info(f"  Window complete: {result['valid_observations']}/{result['total_paddocks']} valid")
-
-        except Exception as e:
-            logger.error(f"  Window failed: {e}")
-            continue
-
-    logger.info(f"\n{'='*40}")
-    logger.info(f"Historical backfill complete")
-    logger.info(f"  Processed {len(results)}/{len(windows)} windows successfully")
-    total_observations = sum(r['valid_observations'] for r in results)
-    logger.info(f"  Total valid observations: {total_observations}")
-    logger.info(f"{'='*40}")
-
-    return results
-
 
 def main():
     """
@@ -977,7 +1213,7 @@ def main():
             )
 
             # Use the most recent result for output
-            result = results[-1] if results else None
+            result = results[0] if results else None
 
         else:
             result = run_pipeline_for_dev_farm(
@@ -1027,6 +1263,12 @@ def main():
                 "observation_count": len(result["observations"]),
             }, f, indent=2)
 
+        if result.get("profile", {}).get("stages"):
+            profile_file = output_dir / "pipeline_profile.json"
+            with open(profile_file, "w") as f:
+                json.dump(result["profile"], f, indent=2)
+            logger.info(f"Stage profile saved to {profile_file}")
+
         logger.info(f"Pipeline complete. Results saved to {result_file}")
         logger.info(f"  Farm: {result['farm_id']}")
         logger.info(f"  Date: {result['observation_date']}")
@@ -0,0 +1,279 @@
+"""
+Per-stage timing and memory instrumentation for the processing pipeline.
+
+run_pipeline_for_farm goes through query, load, cloud mask, composite,
+indices, tiles, R2 upload, zonal stats and the Convex write. PipelineProfiler
+records wall time, CPU time, RSS, bytes downloaded and the sizes of the main
+arrays for each of those stages so a regression in job time can be traced to
+the stage that caused it.
+
+Bytes downloaded are counted per profiler: record_download() adds to the
+profiler whose stage is active in the calling context, so concurrent jobs
+(scheduler worker pool, parallel backfill windows) do not count each other's
+traffic. Provider thread pools pass that context to their workers with
+in_current_context(). Reads made by GDAL itself (Copernicus range mode
+over /vsicurl/) never pass through record_download(); providers flag them
+with record_unmeasured_download() and the stage reports downloads_unmeasured
+so its byte count is read as a lower bound. RSS is per process, so a stage's sampled peak still
+includes memory held by jobs running alongside it.
+"""
+import contextvars
+import logging
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypedDict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+# Interval between RSS samples while a stage runs
+RSS_SAMPLE_INTERVAL_S = 0.05
+
+
+class StageProfile(TypedDict):
+    """Measurements for one pipeline stage."""
+    name: str
+    wall_s: float
+    cpu_s: float
+    rss_start_mb: Optional[float]
+    rss_end_mb: Optional[float]
+    peak_rss_mb: Optional[float]  # Highest RSS sampled during the stage
+    bytes_downloaded: int
+    downloads_unmeasured: bool  # Some transfers were not counted in bytes_downloaded
+    arrays: dict[str, dict]
+    error: Optional[str]
+
+
+# Profiler whose stage is running in the current context
+_active_profiler: contextvars.ContextVar[Optional['PipelineProfiler']] = contextvars.ContextVar(
+    "active_profiler", default=None
+)
+
+
+def record_download(num_bytes: int) -> None:
+    """
+    Count bytes downloaded from a remote service.
+
+    Called by providers as data arrives; safe to call from worker threads.
+    Bytes are added to the profiler of the calling context, and dropped when
+    no profiled stage is running.
+
+    Args:
+        num_bytes: Number of bytes received
+    """
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler._add_downloaded(num_bytes)
+
+
+def record_unmeasured_download() -> None:
+    """
+    Flag that data was downloaded without its bytes being counted.
+
+    For transfers made outside Python (GDAL's /vsicurl/ handler), where the
+    byte count is not available. The active stage and run report
+    downloads_unmeasured, so bytes_downloaded is only a lower bound.
+    """
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler._add_unmeasured()
+
+
+def in_current_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap a function to run in (a copy of) the caller's context.
+
+    ThreadPoolExecutor workers do not inherit context variables, so
+    downloads made by a provider's pool would not be attributed to the
+    job's profiler. Submit in_current_context(fn) instead of fn.
+
+    Args:
+        fn: Function to run on a worker thread
+
+    Returns:
+        Wrapped function
+    """
+    context = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        # A context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def _current_rss_mb() -> Optional[float]:
+    """Current resident set size in MB (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _process_peak_rss_mb() -> float:
+    """Peak resident set size over the life of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB on Linux
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class _RssSampler:
+    """Track the highest RSS seen between start() and stop() on a background thread."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.peak: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        rss = _current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._sample()
+        self._thread.start()
+
+    def stop(self) -> Optional[float]:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak
+
+
+class PipelineProfiler:
+    """
+    Collects StageProfile records for one pipeline run.
+
+    Bytes downloaded are counted per profiler. CPU time and RSS are
+    process-wide, so when several jobs run concurrently in one process
+    their stages include each other's work.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: list[StageProfile] = []
+        self._current: Optional[StageProfile] = None
+        self._started = time.perf_counter()
+        self._downloaded = 0
+        self._unmeasured = 0
+        self._downloaded_lock = threading.Lock()
+
+    def _add_downloaded(self, num_bytes: int) -> None:
+        with self._downloaded_lock:
+            self._downloaded += num_bytes
+
+    def _add_unmeasured(self) -> None:
+        with self._downloaded_lock:
+            self._unmeasured += 1
+
+    def unmeasured_downloads(self) -> int:
+        """Number of downloads flagged as not counted in downloaded_bytes()."""
+        with self._downloaded_lock:
+            return self._unmeasured
+
+    def downloaded_bytes(self) -> int:
+        """Bytes downloaded during this profiler's stages so far."""
+        with self._downloaded_lock:
+            return self._downloaded
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Measure a pipeline stage.
+
+        Exceptions propagate unchanged; the stage is still recorded with the
+        error message.
+
+        Args:
+            name: Stage name (e.g. "copernicus.load", "zonal_stats")
+        """
+        if not self.enabled:
+            yield
+            return
+
+        parent = self._current
+        profile = StageProfile(
+            name=name,
+            wall_s=0.0,
+            cpu_s=0.0,
+            rss_start_mb=_current_rss_mb(),
+            rss_end_mb=None,
+            peak_rss_mb=None,
+            bytes_downloaded=0,
+            downloads_unmeasured=False,
+            arrays={},
+            error=None,
+        )
+        self._current = profile
+        token = _active_profiler.set(self)
+        sampler = _RssSampler()
+        sampler.start()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        bytes_start = self.downloaded_bytes()
+        unmeasured_start = self.unmeasured_downloads()
+
+        try:
+            yield
+        except Exception as e:
+            profile["error"] = str(e)
+            raise
+        finally:
+            profile["wall_s"] = round(time.perf_counter() - wall_start, 3)
+            profile["cpu_s"] = round(time.process_time() - cpu_start, 3)
+            profile["rss_end_mb"] = _current_rss_mb()
+            peak = sampler.stop()
+            profile["peak_rss_mb"] = round(peak, 1) if peak is not None else None
+            profile["bytes_downloaded"] = self.downloaded_bytes() - bytes_start
+            profile["downloads_unmeasured"] = self.unmeasured_downloads() > unmeasured_start
+            self.stages.append(profile)
+            self._current = parent
+            _active_profiler.reset(token)
+
+            logger.debug(
+                f"Stage {name}: {profile['wall_s']:.2f}s wall, {profile['cpu_s']:.2f}s CPU, "
+                f"peak RSS {profile['peak_rss_mb'] or 0:.0f} MB, "
+                f"{profile['bytes_downloaded'] / 1024 / 1024:.1f} MB downloaded"
+                f"{' (plus unmeasured GDAL reads)' if profile['downloads_unmeasured'] else ''}"
+            )
+
+    def record_array(self, name: str, array: Any) -> None:
+        """
+        Record the shape, dtype and size of an array in the current stage.
+
+        Args:
+            name: Label for the array (e.g. "composite")
+            array: numpy array or xarray DataArray
+        """
+        if not self.enabled or self._current is None or array is None:
+            return
+
+        self._current["arrays"][name] = {
+            "shape": list(getattr(array, "shape", ())),
+            "dtype": str(getattr(array, "dtype", "")),
+            "mb": round(getattr(array, "nbytes", 0) / 1024 / 1024, 2),
+        }
+
+    def to_dict(self) -> dict:
+        """Summarize the run as a JSON-serializable dictionary."""
+        return {
+            "total_wall_s": round(time.perf_counter() - self._started, 3),
+            "process_peak_rss_mb": round(_process_peak_rss_mb(), 1),
+            "bytes_downloaded": self.downloaded_bytes(),
+            "downloads_unmeasured": self.unmeasured_downloads() > 0,
+            "stages": self.stages,
+        }
@@ -5,8 +5,10 @@ This module provides a common interface for different satellite providers,
 allowing the pipeline to work with Sentinel-2, PlanetScope, and future
 providers through a unified API.
 """
+import os
 from abc import ABC, abstractmethod
-from typing import Protocol, TypedDict
+from contextlib import contextmanager
+from typing import Iterator, Protocol, TypedDict
 
 
 # Provider-specific exceptions
@@ -48,6 +50,11 @@ class SatelliteProvider(Protocol):
     Protocol defining the interface for satellite data providers.
 
     All providers must implement these methods to work with the pipeline.
+
+    Providers that return time-stacked data may also implement
+    load_stack(items, bands, bbox, stack), which writes cloud-masked time
+    slices into a composite.TimeStack instead of returning them; the pipeline
+    then composites from disk without holding the stack in memory.
     """
 
     @property
@@ -260,6 +267,7 @@ class ProviderFactory:
             return CopernicusProvider(
                 client_id=kwargs.get("client_id"),
                 client_secret=kwargs.get("client_secret"),
+                download_mode=kwargs.get("download_mode"),
             )
         elif provider_name == "sentinel2":
             # Legacy Planetary Computer provider (fallback)
@@ -271,6 +279,8 @@ class ProviderFactory:
                 api_key=kwargs.get("api_key"),
                 client_id=kwargs.get("client_id"),
                 client_secret=kwargs.get("client_secret"),
+                delivery_mode=kwargs.get("delivery_mode"),
+                orders_url=kwargs.get("orders_url"),
             )
         else:
             raise ValueError(f"Unknown provider: {provider_name}")
@@ -384,3 +394,58 @@ class ProviderFactory:
 
         # Multiple providers - use highest resolution
         return min(p.resolution_meters for p in providers)
+
+
+# Concurrent calls allowed per provider when no PROVIDER_CONCURRENCY_<NAME> is set
+DEFAULT_PROVIDER_CONCURRENCY = 2
+
+# Seconds between attempts to take a provider slot while all are busy
+PROVIDER_SLOT_POLL_INTERVAL = 0.5
+
+
+@contextmanager
+def provider_slot(provider_name: str) -> Iterator[None]:
+    """
+    Limit how many scheduler jobs talk to a provider at the same time.
+
+    The limit is read from PROVIDER_CONCURRENCY_<NAME> (e.g.
+    PROVIDER_CONCURRENCY_COPERNICUS=2); 0 disables it. Slots are flock()ed
+    lock files under PROVIDER_SLOT_DIR, so the limit holds across job
+    threads, job worker processes and scheduler replicas on the same host,
+    and a slot is released by the kernel if its holder is killed.
+
+    Args:
+        provider_name: Short provider name (e.g. "copernicus", "planetscope")
+    """
+    import fcntl
+    import tempfile
+    import time
+
+    limit = int(os.getenv(
+        f"PROVIDER_CONCURRENCY_{provider_name.upper()}",
+        str(DEFAULT_PROVIDER_CONCURRENCY),
+    ))
+    if limit <= 0:
+        yield
+        return
+
+    slot_dir = os.getenv("PROVIDER_SLOT_DIR", os.path.join(tempfile.gettempdir(), "provider_slots"))
+    os.makedirs(slot_dir, exist_ok=True)
+
+    while True:
+        for i in range(limit):
+            lock_file = open(os.path.join(slot_dir, f"{provider_name}.{i}.lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+
+        time.sleep(PROVIDER_SLOT_POLL_INTERVAL)
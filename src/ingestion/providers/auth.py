@@ -0,0 +1,162 @@
+"""
+Shared OAuth2 client-credentials tokens.
+
+Copernicus tokens live for a few minutes, and the provider and imagery
+checker used to request their own per instance - and the pipeline creates a
+new provider per job. TokenManager keeps one token per (token URL, client)
+for the whole process, hands it to every thread that asks, and refreshes it
+in the background shortly before it expires so callers rarely wait on the
+identity server.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from http_session import get_session
+
+logger = logging.getLogger(__name__)
+
+# Refresh tokens this many seconds before they expire
+REFRESH_MARGIN = 60
+
+
+class TokenManager:
+    """
+    Thread-safe OAuth2 client-credentials token cache with proactive refresh.
+
+    A background refresh is only scheduled for tokens that were used since
+    they were fetched, so an idle scheduler does not keep requesting tokens.
+    """
+
+    def __init__(
+        self,
+        token_url: str,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        name: str = "OAuth2",
+        refresh_margin: int = REFRESH_MARGIN,
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            token_url: Token endpoint
+            client_id: OAuth2 client ID
+            client_secret: OAuth2 client secret
+            name: Service name used in log and error messages
+            refresh_margin: Seconds before expiry at which tokens are refreshed
+        """
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.name = name
+        self.refresh_margin = refresh_margin
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._used = False
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def get_token(self) -> str:
+        """
+        Get a valid access token, requesting one if needed.
+
+        Returns:
+            Access token
+
+        Raises:
+            ValueError: If credentials are not configured
+            RuntimeError: If the token request fails
+        """
+        with self._lock:
+            self._used = True
+            if self._token and time.monotonic() < self._expires_at - self.refresh_margin:
+                return self._token
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> str:
+        """Request a new token; the caller holds self._lock."""
+        if not self.client_id or not self.client_secret:
+            raise ValueError(f"{self.name} credentials not configured.")
+
+        logger.info(f"Requesting new {self.name} access token...")
+
+        response = get_session().post(
+            self.token_url,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=30,
+        )
+
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"Failed to get {self.name} access token: {response.status_code} - {response.text}"
+            )
+
+        token_data = response.json()
+        expires_in = token_data.get("expires_in", 300)
+
+        self._token = token_data["access_token"]
+        self._expires_at = time.monotonic() + expires_in
+        self._used = False
+        self._schedule_refresh(expires_in)
+
+        logger.info(f"Got {self.name} access token, expires in {expires_in}s")
+        return self._token
+
+    def _schedule_refresh(self, expires_in: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._timer = threading.Timer(max(expires_in - self.refresh_margin, 1), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        with self._lock:
+            if not self._used:
+                logger.debug(f"{self.name} token unused since last refresh, letting it expire")
+                return
+            try:
+                self._refresh_locked()
+            except Exception as e:
+                # get_token() retries synchronously once the token expires
+                logger.warning(f"Background {self.name} token refresh failed: {e}")
+
+
+_managers: dict[tuple[str, str], TokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(
+    token_url: str,
+    client_id: Optional[str],
+    client_secret: Optional[str],
+    name: str = "OAuth2",
+) -> TokenManager:
+    """
+    Get the process-wide token manager for a token endpoint and client.
+
+    Args:
+        token_url: Token endpoint
+        client_id: OAuth2 client ID
+        client_secret: OAuth2 client secret
+        name: Service name used in log and error messages
+
+    Returns:
+        Shared TokenManager
+    """
+    key = (token_url, client_id or "")
+
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None or manager.client_secret != client_secret:
+            manager = TokenManager(token_url, client_id, client_secret, name=name)
+            _managers[key] = manager
+        return manager
@@ -0,0 +1,206 @@
+"""
+On-disk cache of clipped band arrays.
+
+The scheduler re-runs the pipeline for boundary updates, manual refreshes and
+daily checks, usually against the same products. Band windows that were
+already downloaded and clipped to a farm grid are stored here as .npy files
+so later runs load them with a memory map instead of hitting the network.
+
+Entries are keyed by provider, product, band and the target grid, and the
+cache is kept under a size budget by evicting the least recently used files.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "cache/bands"
+DEFAULT_MAX_MB = 2048
+
+
+class BandCache:
+    """
+    Size-bounded LRU cache of band arrays stored as memory-mappable .npy files.
+
+    Writes are atomic (temp file + rename), so concurrent loaders in the same
+    or different processes never see partial entries.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Cache directory (defaults to BAND_CACHE_DIR env var, then cache/bands)
+            max_bytes: Size budget in bytes (defaults to BAND_CACHE_MAX_MB env var, then 2 GB)
+        """
+        self.cache_dir = cache_dir or os.getenv("BAND_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("BAND_CACHE_MAX_MB", str(DEFAULT_MAX_MB))) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(provider: str, product_id: str, band: str, grid: dict) -> str:
+        """
+        Build a cache key.
+
+        Args:
+            provider: Provider name (e.g. "copernicus")
+            product_id: Product or scene identifier
+            band: Band or asset identifier
+            grid: JSON-serializable description of the output grid
+                  (CRS, snapped bounds/transform and shape)
+
+        Returns:
+            Hex digest identifying the entry
+        """
+        payload = json.dumps(
+            {"provider": provider, "product": product_id, "band": band, "grid": grid},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional['np.ndarray']:
+        """
+        Load an entry as a read-only memory map.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            The cached array, or None on a miss
+        """
+        import numpy as np
+
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {key[:12]}: {e}")
+            self._remove(path)
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        logger.debug(f"Band cache hit {key[:12]}")
+        return array
+
+    def put(self, key: str, array: 'np.ndarray', meta: Optional[dict] = None) -> None:
+        """
+        Store an entry and evict old entries if over budget.
+
+        Args:
+            key: Key from make_key()
+            array: Array to store
+            meta: Optional metadata written to a JSON sidecar for inspection
+        """
+        import numpy as np
+
+        if self.max_bytes <= 0:
+            return
+
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {key[:12]}: {e}")
+            self._remove(tmp_path)
+            return
+
+        if meta:
+            with open(os.path.join(self.cache_dir, f"{key}.json"), "w") as f:
+                json.dump(meta, f, default=str)
+
+        self._evict()
+
+    def remove(self, key: str) -> None:
+        """
+        Delete an entry and its metadata sidecar, if present.
+
+        Args:
+            key: Key from make_key()
+        """
+        path = self._path(key)
+        self._remove(path)
+        self._remove(path[:-len(".npy")] + ".json")
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits the budget."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                self._remove(path[:-len(".npy")] + ".json")
+                total -= size
+
+            logger.info(f"Band cache evicted to {total / 1024 / 1024:.0f} MB")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+_default_cache: Optional[BandCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_band_cache() -> Optional[BandCache]:
+    """
+    Get the process-wide band cache.
+
+    Returns:
+        Shared BandCache, or None when disabled (BAND_CACHE_MAX_MB=0)
+    """
+    global _default_cache
+
+    if int(os.getenv("BAND_CACHE_MAX_MB", str(DEFAULT_MAX_MB))) <= 0:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = BandCache()
+        return _default_cache
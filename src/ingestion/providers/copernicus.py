@@ -6,18 +6,24 @@ Provides access to Sentinel-2 L2A data from Copernicus Data Space
 """
 import logging
 import os
-from datetime import datetime, timedelta
 from typing import TYPE_CHECKING
 
-import requests
-
 from . import BaseSatelliteProvider, BandNames
+from .auth import get_token_manager
+from .cache import get_band_cache
+from http_session import get_session
+from profiling import in_current_context, record_download, record_unmeasured_download
 
 if TYPE_CHECKING:
+    import numpy as np
     import xarray as xr
+    from composite import TimeStack
 
 logger = logging.getLogger(__name__)
 
+# SCL classes masked as cloudy: 3 (shadow), 8 (cloud med), 9 (cloud high), 10 (cirrus)
+SCL_CLOUD_CLASSES = (3, 8, 9, 10)
+
 
 class CopernicusProvider(BaseSatelliteProvider):
     """
@@ -40,10 +46,16 @@ class CopernicusProvider(BaseSatelliteProvider):
     DOWNLOAD_URL = "https://zipper.dataspace.copernicus.eu/odata/v1"  # Zipper service for downloads
     S3_ENDPOINT = "https://eodata.dataspace.copernicus.eu"
 
+    # Bands stored in the R20m folder of the SAFE product
+    BANDS_20M = ("B11", "SCL")
+
     def __init__(
         self,
         client_id: str | None = None,
         client_secret: str | None = None,
+        download_mode: str | None = None,
+        max_products: int | None = None,
+        max_workers: int | None = None,
     ):
         """
         Initialize the Copernicus provider.
@@ -51,12 +63,16 @@ class CopernicusProvider(BaseSatelliteProvider):
         Args:
             client_id: OAuth2 client ID (defaults to COPERNICUS_CLIENT_ID env var)
             client_secret: OAuth2 client secret (defaults to COPERNICUS_CLIENT_SECRET env var)
+            download_mode: "full" or "range" (defaults to COPERNICUS_DOWNLOAD_MODE env var, then "full")
+            max_products: Maximum products stacked per load (defaults to COPERNICUS_MAX_PRODUCTS env var, then 8)
+            max_workers: Concurrent product reads (defaults to COPERNICUS_LOAD_WORKERS env var, then 4)
         """
         self.client_id = client_id or os.getenv("COPERNICUS_CLIENT_ID")
         self.client_secret = client_secret or os.getenv("COPERNICUS_CLIENT_SECRET")
-
-        self._access_token: str | None = None
-        self._token_expires_at: datetime | None = None
+        self.download_mode = (download_mode or os.getenv("COPERNICUS_DOWNLOAD_MODE", "full")).lower()
+        self.max_products = max_products or int(os.getenv("COPERNICUS_MAX_PRODUCTS", "8"))
+        self.max_workers = max_workers or int(os.getenv("COPERNICUS_LOAD_WORKERS", "4"))
+        self.cache = get_band_cache()
 
     @property
     def resolution_meters(self) -> int:
@@ -91,10 +107,11 @@ class CopernicusProvider(BaseSatelliteProvider):
 
     def _get_access_token(self) -> str:
         """
-        Get or refresh the OAuth2 access token.
+        Get the OAuth2 access token.
 
-        Uses client credentials flow to obtain an access token.
-        Tokens are cached and refreshed 5 minutes before expiry.
+        Tokens come from the process-wide token manager, so they are shared
+        with other provider instances, the imagery checker and concurrent
+        jobs, and refreshed in the background before they expire.
 
         Returns:
             Valid access token
@@ -103,12 +120,6 @@ class CopernicusProvider(BaseSatelliteProvider):
             ValueError: If credentials are not configured
             RuntimeError: If token request fails
         """
-        # Check if we have a valid cached token
-        if self._access_token and self._token_expires_at:
-            # Refresh 5 minutes before expiry
-            if datetime.now() < self._token_expires_at - timedelta(minutes=5):
-                return self._access_token
-
         # Validate credentials
         if not self.client_id or not self.client_secret:
             raise ValueError(
@@ -116,33 +127,9 @@ class CopernicusProvider(BaseSatelliteProvider):
                 "Set COPERNICUS_CLIENT_ID and COPERNICUS_CLIENT_SECRET environment variables."
             )
 
-        logger.info("Requesting new Copernicus access token...")
-
-        response = requests.post(
-            self.TOKEN_URL,
-            data={
-                "grant_type": "client_credentials",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            timeout=30,
-        )
-
-        if response.status_code != 200:
-            raise RuntimeError(
-                f"Failed to get Copernicus access token: {response.status_code} - {response.text}"
-            )
-
-        token_data = response.json()
-        self._access_token = token_data["access_token"]
-
-        # Calculate expiry time (typically 300 seconds)
-        expires_in = token_data.get("expires_in", 300)
-        self._token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-
-        logger.info(f"Got access token, expires in {expires_in}s")
-        return self._access_token
+        return get_token_manager(
+            self.TOKEN_URL, self.client_id, self.client_secret, name="Copernicus"
+        ).get_token()
 
     def query(
         self,
@@ -193,7 +180,7 @@ class CopernicusProvider(BaseSatelliteProvider):
 
         logger.info(f"Querying Copernicus catalog for {start_date} to {end_date}...")
 
-        response = requests.get(
+        response = get_session().get(
             url,
             params=params,
             headers={"Authorization": f"Bearer {token}"},
@@ -247,7 +234,18 @@ class CopernicusProvider(BaseSatelliteProvider):
         """
         Load specified bands from Copernicus Sentinel-2 products.
 
-        Downloads data via S3-compatible protocol and processes bands.
+        Every product is reprojected onto a common UTM grid covering the bbox.
+        Products acquired on the same date (adjacent MGRS tiles) are mosaicked,
+        and the dates are stacked along a time dimension so the pipeline can
+        build a cloud-robust median composite. Products are read concurrently.
+
+        Two download modes are supported (see COPERNICUS_DOWNLOAD_MODE):
+        - "full": download the whole product ZIP and read bands from it
+        - "range": read the ZIP central directory with HTTP range requests
+          and window-read only the needed band files from the remote archive
+
+        Range mode falls back to a full download if the server rejects
+        range requests.
 
         Args:
             items: Product metadata from query()
@@ -255,40 +253,356 @@ class CopernicusProvider(BaseSatelliteProvider):
             bbox: Bounding box [west, south, east, north]
 
         Returns:
-            xarray DataArray with loaded band data
+            xarray DataArray with dims (time, band, y, x)
         """
         import numpy as np
-        import rasterio
-        import rasterio.windows
         import xarray as xr
-        import zipfile
-        import tempfile
-        import os as os_module
+        from concurrent.futures import ThreadPoolExecutor
+
+        band_ids, selected, grid = self._select_products(items, bands, bbox)
+
+        def load_one(item: dict):
+            try:
+                return item, self._load_product(item, band_ids, grid)
+            except Exception as e:
+                logger.warning(f"Failed to load product {item['name']}: {e}")
+                return item, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            loaded = [
+                (item, arr) for item, arr in executor.map(in_current_context(load_one), selected)
+                if arr is not None
+            ]
+
+        if not loaded:
+            raise RuntimeError("No band data loaded")
+
+        # Mosaic products from the same acquisition date (tiles straddling an MGRS boundary)
+        by_date: dict[str, 'np.ndarray'] = {}
+        for item, arr in loaded:
+            date = (item.get("properties", {}).get("datetime") or "")[:10]
+            if date in by_date:
+                mosaic = by_date[date]
+                np.copyto(mosaic, arr, where=np.isnan(mosaic))
+            else:
+                by_date[date] = arr
+
+        dates = sorted(by_date)
+        logger.info(f"Stacked {len(loaded)} products into {len(dates)} dates: {dates}")
+
+        y, x = self._grid_coords(grid)
+
+        return xr.DataArray(
+            np.stack([by_date[d] for d in dates], axis=0),
+            dims=["time", "band", "y", "x"],
+            coords={
+                "time": dates,
+                "band": self._semantic_bands(band_ids),
+                "y": y,
+                "x": x,
+            },
+            attrs={"crs": grid["crs"]},
+        )
+
+    def load_stack(
+        self,
+        items: list,
+        bands: list[str],
+        bbox: list[float],
+        stack: 'TimeStack',
+    ) -> None:
+        """
+        Load products straight into a disk-backed TimeStack, cloud-masked per product.
+
+        Like load() followed by cloud_mask(), but each product has its SCL
+        cloud classes set to NaN and is written to the stack as soon as it is
+        read (products of the same date are mosaicked in place), so only the
+        products in flight are held in memory. The SCL band is not stored.
+
+        Args:
+            items: Product metadata from query()
+            bands: Semantic band names to load ["nir", "red", "swir", "blue"]
+            bbox: Bounding box [west, south, east, north]
+            stack: Empty TimeStack with at least max_products slots
+        """
+        import numpy as np
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        from itertools import islice
+
+        band_ids, selected, grid = self._select_products(items, bands, bbox)
+        semantic_bands = self._semantic_bands(band_ids)
+        scl_index = semantic_bands.index("scl")
+        y, x = self._grid_coords(grid)
+        stack.allocate(
+            [name for name in semantic_bands if name != "scl"], y, x,
+            attrs={"crs": grid["crs"]},
+        )
+
+        def load_one(item: dict) -> 'np.ndarray | None':
+            try:
+                arr = self._load_product(item, band_ids, grid)
+            except Exception as e:
+                logger.warning(f"Failed to load product {item['name']}: {e}")
+                return None
+
+            # NaN SCL = outside the product footprint
+            scl = arr[scl_index]
+            invalid = np.isin(scl, SCL_CLOUD_CLASSES) | np.isnan(scl)
+            values = np.delete(arr, scl_index, axis=0)
+            values[:, invalid] = np.nan
+            return values
+
+        # Write in product order, so same-date mosaics are deterministic, with
+        # at most max_workers products read ahead of the one being written
+        loaded = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight: deque = deque()
+            remaining = iter(selected)
+            for item in islice(remaining, self.max_workers):
+                in_flight.append((item, executor.submit(in_current_context(load_one), item)))
+            while in_flight:
+                item, future = in_flight.popleft()
+                values = future.result()
+                next_item = next(remaining, None)
+                if next_item is not None:
+                    in_flight.append((next_item, executor.submit(in_current_context(load_one), next_item)))
+                if values is not None:
+                    stack.write((item.get("properties", {}).get("datetime") or "")[:10], values)
+                    loaded += 1
+
+        if not loaded:
+            raise RuntimeError("No band data loaded")
+
+        logger.info(f"Stacked {loaded} products into {stack.n_time} dates: {sorted(stack.labels)}")
+
+    def _select_products(self, items: list, bands: list[str], bbox: list[float]) -> tuple[list[str], list, dict]:
+        """
+        Pick the products, band IDs and target grid for a load.
 
+        Returns:
+            Tuple of (band IDs including SCL, products oldest first, target grid)
+        """
         if not items:
             raise ValueError("No items provided to load")
 
-        token = self._get_access_token()
-
         # Convert semantic band names to Sentinel-2 band IDs
         band_ids = [self.band_names[b] for b in bands]
 
-        logger.info(f"Loading {len(items)} products, bands: {band_ids}")
+        # Always load SCL band for cloud masking (add to band_ids if not present)
+        if "SCL" not in band_ids:
+            band_ids = band_ids + ["SCL"]
+
+        # Keep the clearest products, then read them oldest first
+        selected = sorted(
+            items,
+            key=lambda i: i.get("properties", {}).get("eo:cloud_cover") or 0,
+        )[:self.max_products]
+        selected.sort(key=lambda i: i.get("properties", {}).get("datetime") or "")
+
+        grid = self._target_grid(bbox)
+
+        logger.info(
+            f"Loading {len(selected)}/{len(items)} products with {self.max_workers} workers, "
+            f"bands: {band_ids}, mode: {self.download_mode}"
+        )
+        logger.info(f"Target grid: {grid['width']}x{grid['height']} pixels, CRS: {grid['crs']}")
+
+        return band_ids, selected, grid
+
+    def _semantic_bands(self, band_ids: list[str]) -> list[str]:
+        """Semantic names of the loaded bands, in the order _load_product stacks them."""
+        return [name for name, band_id in self.band_names.items() if band_id in band_ids]
+
+    def _grid_coords(self, grid: dict) -> tuple['np.ndarray', 'np.ndarray']:
+        """y and x pixel-center coordinates of a target grid (rasterio convention)."""
+        import numpy as np
 
-        # We'll load from the most recent clear product
-        # In a production system, we'd composite multiple products
-        item = items[0]
-        product_id = item["id"]
-        product_name = item["name"]
+        transform = grid["transform"]
+        return (
+            transform.f + (np.arange(grid["height"]) + 0.5) * transform.e,
+            transform.c + (np.arange(grid["width"]) + 0.5) * transform.a,
+        )
+
+    def _target_grid(self, bbox: list[float]) -> dict:
+        """
+        Build the common output grid for a bbox.
 
-        logger.info(f"Loading product: {product_name}")
+        Uses the UTM zone of the bbox center at 10m, with bounds snapped
+        outward to whole pixels so repeated runs produce identical grids.
+
+        Args:
+            bbox: Bounding box [west, south, east, north] in WGS84
+
+        Returns:
+            Dictionary with crs, transform, width and height
+        """
+        import math
+        from rasterio.transform import from_origin
+        from rasterio.warp import transform_bounds
+
+        west, south, east, north = bbox
+        lon = (west + east) / 2
+        lat = (south + north) / 2
+        zone = int((lon + 180) / 6) % 60 + 1
+        crs = f"EPSG:{(32600 if lat >= 0 else 32700) + zone}"
+
+        res = self.resolution_meters
+        left, bottom, right, top = transform_bounds("EPSG:4326", crs, *bbox)
+        left = math.floor(left / res) * res
+        bottom = math.floor(bottom / res) * res
+        right = math.ceil(right / res) * res
+        top = math.ceil(top / res) * res
+
+        return {
+            "crs": crs,
+            "transform": from_origin(left, top, res, res),
+            "width": int(round((right - left) / res)),
+            "height": int(round((top - bottom) / res)),
+        }
+
+    def _load_product(
+        self,
+        item: dict,
+        band_ids: list[str],
+        grid: dict,
+    ) -> 'np.ndarray':
+        """
+        Load one product's bands onto the target grid.
+
+        Bands already in the local band cache for this product and grid are
+        read from disk; only the missing ones are fetched (a fully cached
+        product needs no network access at all).
+
+        Args:
+            item: Product metadata from query()
+            band_ids: Sentinel-2 band IDs to read
+            grid: Target grid from _target_grid()
+
+        Returns:
+            float32 array of shape (band, y, x), NaN outside the product footprint
+        """
+        import numpy as np
+
+        band_arrays = {}
+        cache_keys = {}
+
+        if self.cache is not None:
+            grid_key = {
+                "crs": grid["crs"],
+                "transform": list(grid["transform"])[:6],
+                "shape": [grid["height"], grid["width"]],
+            }
+            for band_id in band_ids:
+                cache_keys[band_id] = self.cache.make_key("copernicus", item["id"], band_id, grid_key)
+                cached = self.cache.get(cache_keys[band_id])
+                if cached is not None:
+                    band_arrays[band_id] = cached
+
+        missing = [b for b in band_ids if b not in band_arrays]
+        if missing:
+            fetched = self._fetch_bands(item, missing, grid, self._get_access_token())
+            if self.cache is not None:
+                for band_id, arr in fetched.items():
+                    self.cache.put(cache_keys[band_id], arr, meta={"product": item["name"], "band": band_id})
+            band_arrays.update(fetched)
+        else:
+            logger.info(f"Loaded {item['name']} from band cache")
+
+        # load() labels the stack with the requested bands, so a product
+        # missing any of them is dropped rather than stacked short
+        unavailable = [b for b in band_ids if b not in band_arrays]
+        if unavailable:
+            raise RuntimeError(f"Bands not available in product: {unavailable}")
+
+        # Stack in semantic band order
+        arrays = [
+            band_arrays[band_id] for band_id in self.band_names.values()
+            if band_id in band_ids
+        ]
+
+        return np.stack(arrays, axis=0)
+
+    def _fetch_bands(
+        self,
+        item: dict,
+        band_ids: list[str],
+        grid: dict,
+        token: str,
+    ) -> dict[str, 'np.ndarray']:
+        """
+        Fetch bands from the remote product using the configured download mode.
+
+        Returns:
+            Dictionary mapping band ID to a float32 (y, x) array on the grid
+        """
+        import tempfile
+
+        if self.download_mode == "range":
+            try:
+                band_paths, gdal_env = self._locate_bands_ranged(item, band_ids, token)
+                # GDAL fetches the JP2 tiles over /vsicurl/, outside record_download()
+                record_unmeasured_download()
+                return self._read_bands(band_paths, grid, gdal_env)
+            except Exception as e:
+                logger.warning(f"Range read failed for {item['name']}: {e}, falling back to full download")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            band_paths = self._download_product(item, band_ids, token, tmpdir)
+            return self._read_bands(band_paths, grid)
+
+    def _find_band_members(self, names: list[str], band_ids: list[str]) -> dict[str, str]:
+        """
+        Locate band files inside a SAFE archive.
+
+        10m bands are read from IMG_DATA/R10m, SWIR and SCL from IMG_DATA/R20m.
+
+        Args:
+            names: Member names of the product ZIP
+            band_ids: Sentinel-2 band IDs to find
+
+        Returns:
+            Dictionary mapping band ID to member name
+        """
+        members = {}
+        for band_id in band_ids:
+            res_dir = "/IMG_DATA/R20m/" if band_id in self.BANDS_20M else "/IMG_DATA/R10m/"
+            matches = sorted(
+                name for name in names
+                if res_dir in name
+                and f"_{band_id}_" in name.rsplit("/", 1)[-1]
+                and name.endswith(".jp2")
+            )
+            if not matches:
+                logger.warning(f"Band {band_id} not found, skipping")
+                continue
+            members[band_id] = matches[0]
+        return members
+
+    def _download_product(
+        self,
+        item: dict,
+        band_ids: list[str],
+        token: str,
+        tmpdir: str,
+    ) -> dict[str, str]:
+        """
+        Download the whole product ZIP into tmpdir.
+
+        Bands are read in place through GDAL's /vsizip/ handler instead of
+        extracting the archive.
+
+        Returns:
+            Dictionary mapping band ID to a GDAL-readable path
+        """
+        import zipfile
 
         # Download the product via HTTPS (Zipper service)
         download_url = item["assets"]["download"]["href"]
 
-        logger.info(f"Downloading from: {download_url}")
+        logger.info(f"Downloading {item['name']} from: {download_url}")
 
-        response = requests.get(
+        response = get_session().get(
             download_url,
             headers={
                 "Authorization": f"Bearer {token}",
@@ -303,189 +617,153 @@ class CopernicusProvider(BaseSatelliteProvider):
             raise RuntimeError(f"Failed to download product: {response.status_code}")
 
         # The response is a ZIP file containing the SAFE format
-        # Extract to temp directory and read bands
-        with tempfile.TemporaryDirectory() as tmpdir:
-            zip_path = os_module.path.join(tmpdir, "product.zip")
+        zip_path = os.path.join(tmpdir, "product.zip")
 
-            with open(zip_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        with open(zip_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
+                record_download(len(chunk))
 
-            logger.info("Extracting product...")
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            members = self._find_band_members(zf.namelist(), band_ids)
 
-            with zipfile.ZipFile(zip_path, "r") as zf:
-                zf.extractall(tmpdir)
+        return {
+            band_id: f"/vsizip/{zip_path}/{member}"
+            for band_id, member in members.items()
+        }
 
-            # Find the SAFE directory
-            safe_dirs = [d for d in os_module.listdir(tmpdir) if d.endswith(".SAFE")]
-            if not safe_dirs:
-                raise RuntimeError("No SAFE directory found in product")
+    def _locate_bands_ranged(
+        self,
+        item: dict,
+        band_ids: list[str],
+        token: str,
+    ) -> tuple[dict[str, str], dict]:
+        """
+        Locate band files inside the remote product ZIP.
 
-            safe_dir = os_module.path.join(tmpdir, safe_dirs[0])
-            granule_dir = os_module.path.join(safe_dir, "GRANULE")
+        The central directory is parsed with HTTP range requests to find the
+        band members. SAFE archives store JP2 files uncompressed, so each
+        member is exposed to GDAL as a byte range of the remote file
+        (/vsisubfile/ over /vsicurl/) and only the JP2 tiles covering the
+        bbox are fetched.
 
-            # Find the granule
-            granules = os_module.listdir(granule_dir)
-            if not granules:
-                raise RuntimeError("No granule found in product")
+        Only the directory reads are counted by the profiler; the tile reads
+        GDAL makes are flagged as unmeasured by the caller.
 
-            granule_path = os_module.path.join(granule_dir, granules[0], "IMG_DATA", "R10m")
+        Returns:
+            Tuple of (band ID -> GDAL path, GDAL configuration options)
+        """
+        import zipfile
+        from .remote_zip import HTTPRangeReader, member_data_offset
 
-            # Load each band
-            band_arrays = {}
-            target_shape = None  # Track the shape of 10m bands for resampling
-            target_transform = None
-            target_crs = None
-            x_coords = None
-            y_coords = None
+        download_url = item["assets"]["download"]["href"]
+        headers = {"Authorization": f"Bearer {token}"}
 
-            # Always load SCL band for cloud masking (add to band_ids if not present)
-            if "SCL" not in band_ids:
-                band_ids = band_ids + ["SCL"]
+        reader = HTTPRangeReader(download_url, headers=headers)
+        logger.info(f"Remote product {item['name']}: {reader.size / 1024 / 1024:.0f} MB")
 
-            for band_id in band_ids:
-                # Handle different resolutions
-                if band_id in ("B11", "SCL"):  # SWIR and SCL are 20m
-                    res_dir = os_module.path.join(granule_dir, granules[0], "IMG_DATA", "R20m")
-                else:
-                    res_dir = granule_path
+        with zipfile.ZipFile(reader, "r") as zf:
+            infos = {info.filename: info for info in zf.infolist()}
 
-                # Find the band file
-                band_files = [f for f in os_module.listdir(res_dir) if f"_{band_id}_" in f and f.endswith(".jp2")]
-                if not band_files:
-                    logger.warning(f"Band {band_id} not found, skipping")
-                    continue
+        members = self._find_band_members(list(infos), band_ids)
 
-                band_path = os_module.path.join(res_dir, band_files[0])
+        band_paths = {}
+        for band_id, member in members.items():
+            info = infos[member]
+            if info.compress_type == zipfile.ZIP_STORED:
+                offset = member_data_offset(reader, info)
+                band_paths[band_id] = f"/vsisubfile/{offset}_{info.file_size},/vsicurl/{reader.url}"
+            else:
+                # Compressed member - let GDAL inflate it through /vsizip/
+                band_paths[band_id] = f"/vsizip//vsicurl/{reader.url}/{member}"
 
-                logger.info(f"Reading {band_id} from {band_files[0]}")
+        logger.info(
+            f"Read ZIP directory with {reader.request_count} range requests "
+            f"({reader.bytes_fetched / 1024:.0f} KB)"
+        )
 
-                with rasterio.open(band_path) as src:
-                    # Read data for the bbox
-                    # Convert bbox from WGS84 (lat/lon) to the raster's CRS
-                    from rasterio.windows import from_bounds
-                    from rasterio.warp import transform_bounds
-
-                    # Transform bbox from WGS84 to the raster's CRS
-                    src_crs = src.crs
-                    if src_crs and str(src_crs) != "EPSG:4326":
-                        transformed_bbox = transform_bounds(
-                            "EPSG:4326",  # source CRS (WGS84)
-                            src_crs,      # target CRS (UTM)
-                            *bbox
-                        )
-                    else:
-                        transformed_bbox = bbox
+        gdal_env = {
+            "GDAL_HTTP_HEADERS": f"Authorization: Bearer {token}",
+            "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+            "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+            "VSI_CACHE": "TRUE",
+        }
+        return band_paths, gdal_env
 
-                    # Get window from transformed bounds
-                    try:
-                        window = from_bounds(*transformed_bbox, src.transform)
+    def _read_bands(
+        self,
+        band_paths: dict[str, str],
+        grid: dict,
+        gdal_env: dict | None = None,
+    ) -> dict[str, 'np.ndarray']:
+        """
+        Read band windows and reproject them onto the target grid.
 
-                        # Ensure window is within raster bounds
-                        window = window.intersection(
-                            rasterio.windows.Window(0, 0, src.width, src.height)
-                        )
+        Only the source window covering the grid is read. 20m bands are
+        resampled to the 10m grid during reprojection (nearest neighbour for
+        SCL to preserve classification values).
 
-                        if window.width < 1 or window.height < 1:
-                            logger.warning(f"Window for {band_id} is empty, reading full raster")
-                            data = src.read(1)
-                        else:
-                            data = src.read(1, window=window)
-                    except Exception as e:
-                        logger.warning(f"Window error for {band_id}: {e}, reading full raster")
-                        data = src.read(1)
-
-                    # Convert DN to reflectance (divide by 10000) - except for SCL which is classification
-                    if band_id == "SCL":
-                        data = data.astype(np.float32)  # Keep as-is (0-11 classification values)
-                    else:
-                        data = data.astype(np.float32) / 10000
-
-                    # Track target shape and transform from 10m bands
-                    if band_id != "B11" and target_shape is None:
-                        target_shape = data.shape
-                        target_crs = src.crs
-
-                        # Compute x/y coordinate arrays from window
-                        if window and window.width >= 1 and window.height >= 1:
-                            # Get the transform for the window
-                            from rasterio.transform import from_bounds as transform_from_bounds
-                            win_transform = src.window_transform(window)
-
-                            # Create coordinate arrays
-                            # rasterio convention: pixel centers
-                            rows, cols = data.shape
-                            x_coords = np.array([
-                                win_transform.c + (col + 0.5) * win_transform.a
-                                for col in range(cols)
-                            ])
-                            y_coords = np.array([
-                                win_transform.f + (row + 0.5) * win_transform.e
-                                for row in range(rows)
-                            ])
-                        else:
-                            # Full raster - use src transform
-                            rows, cols = data.shape
-                            x_coords = np.array([
-                                src.transform.c + (col + 0.5) * src.transform.a
-                                for col in range(cols)
-                            ])
-                            y_coords = np.array([
-                                src.transform.f + (row + 0.5) * src.transform.e
-                                for row in range(rows)
-                            ])
-
-                        logger.info(f"Target shape: {target_shape}, CRS: {target_crs}")
-                        logger.info(f"X range: {x_coords.min():.1f} to {x_coords.max():.1f}")
-                        logger.info(f"Y range: {y_coords.min():.1f} to {y_coords.max():.1f}")
-
-                    band_arrays[band_id] = data
-
-            # Resample 20m bands (B11, SCL) to match 10m bands if needed
-            from scipy.ndimage import zoom
-            for band_20m in ["B11", "SCL"]:
-                if band_20m in band_arrays and target_shape is not None:
-                    band_data = band_arrays[band_20m]
-                    if band_data.shape != target_shape:
-                        zoom_factors = (
-                            target_shape[0] / band_data.shape[0],
-                            target_shape[1] / band_data.shape[1]
+        Args:
+            band_paths: Dictionary mapping band ID to a GDAL-readable path
+            grid: Target grid from _target_grid()
+            gdal_env: Optional GDAL configuration options for remote reads
+
+        Returns:
+            Dictionary mapping band ID to a float32 (y, x) array
+        """
+        import numpy as np
+        import rasterio
+        from rasterio.warp import reproject, transform_bounds, Resampling
+        from rasterio.windows import Window, from_bounds
+
+        height, width = grid["height"], grid["width"]
+        transform = grid["transform"]
+        grid_bounds = (
+            transform.c,
+            transform.f + height * transform.e,
+            transform.c + width * transform.a,
+            transform.f,
+        )
+
+        band_arrays = {}
+
+        with rasterio.Env(**(gdal_env or {})):
+            for band_id, band_path in band_paths.items():
+                logger.debug(f"Reading {band_id} from {band_path.rsplit('/', 1)[-1]}")
+
+                dst = np.full((height, width), np.nan, dtype=np.float32)
+
+                with rasterio.open(band_path) as src:
+                    # Find the source window covering the target grid
+                    src_bounds = transform_bounds(grid["crs"], src.crs, *grid_bounds)
+                    window = from_bounds(*src_bounds, src.transform)
+                    window = window.round_offsets("floor").round_lengths("ceil")
+                    window = window.intersection(Window(0, 0, src.width, src.height))
+
+                    if window.width >= 1 and window.height >= 1:
+                        data = src.read(1, window=window).astype(np.float32)
+
+                        # Convert DN to reflectance (divide by 10000) - except for SCL which is classification
+                        if band_id != "SCL":
+                            data /= 10000
+
+                        reproject(
+                            source=data,
+                            destination=dst,
+                            src_transform=src.window_transform(window),
+                            src_crs=src.crs,
+                            src_nodata=0,
+                            dst_transform=transform,
+                            dst_crs=grid["crs"],
+                            dst_nodata=np.nan,
+                            resampling=Resampling.nearest if band_id == "SCL" else Resampling.bilinear,
                         )
-                        # Use order=0 (nearest neighbor) for SCL to preserve classification values
-                        interp_order = 0 if band_20m == "SCL" else 1
-                        logger.info(f"Resampling {band_20m} from {band_data.shape} to {target_shape}")
-                        band_arrays[band_20m] = zoom(band_data, zoom_factors, order=interp_order)
-
-            # Stack into xarray DataArray
-            # Rename to semantic names
-            semantic_bands = []
-            arrays = []
-            for semantic_name, band_id in self.band_names.items():
-                if band_id in band_arrays:
-                    arrays.append(band_arrays[band_id])
-                    semantic_bands.append(semantic_name)
-
-            if not arrays:
-                raise RuntimeError("No band data loaded")
-
-            # Stack arrays
-            stacked = np.stack(arrays, axis=0)
-
-            # Create DataArray with proper spatial coordinates
-            coords_dict = {"band": semantic_bands}
-            if y_coords is not None:
-                coords_dict["y"] = y_coords
-            if x_coords is not None:
-                coords_dict["x"] = x_coords
-
-            result = xr.DataArray(
-                stacked,
-                dims=["band", "y", "x"],
-                coords=coords_dict,
-                attrs={"crs": str(target_crs) if target_crs else "EPSG:32616"},  # Default to UTM 16N
-            )
+                    else:
+                        logger.debug(f"Product does not cover the grid for {band_id}")
+
+                band_arrays[band_id] = dst
 
-            return result
+        return band_arrays
 
     def cloud_mask(
         self,
@@ -543,10 +821,12 @@ class CopernicusProvider(BaseSatelliteProvider):
 
             # Create empty cloud mask (all False = no clouds masked)
             first_band = data.isel(band=0)
+            if "time" in first_band.dims:
+                first_band = first_band.isel(time=0)
             cloud_mask_arr = xr.DataArray(
                 np.zeros(first_band.shape, dtype=bool),
                 dims=first_band.dims,
-                coords={k: v for k, v in first_band.coords.items() if k != 'band'},
+                coords={k: v for k, v in first_band.coords.items() if k not in ('band', 'time')},
                 attrs={'crs': data.attrs.get('crs', 'EPSG:4326')},  # Preserve CRS for zonal stats
             )
             return data, cloud_free_pct, cloud_mask_arr
@@ -554,13 +834,26 @@ class CopernicusProvider(BaseSatelliteProvider):
         # Extract SCL band
         scl = data.sel(band='scl')
 
-        # Create cloud mask: True = cloudy/invalid pixel
-        # Classes to mask: 3 (shadow), 8 (cloud med), 9 (cloud high), 10 (cirrus)
-        cloud_classes = [3, 8, 9, 10]
+        # Per-observation mask: True = cloudy/invalid pixel
+        # NaN = outside the product footprint on that date
+        invalid = np.isin(scl.values, SCL_CLOUD_CLASSES) | np.isnan(scl.values)
+
+        # Apply mask to all bands except SCL (set cloudy pixels to NaN)
+        # The mask broadcasts across bands (and per date for time-stacked data)
+        spectral_bands = [b for b in band_names if b != 'scl']
+        masked_data = data.sel(band=spectral_bands).where(
+            xr.DataArray(~invalid, dims=scl.dims, coords=scl.coords)
+        )
+
+        # A pixel is only cloudy in the composite if no date observed it clearly
+        if "time" in scl.dims:
+            invalid = invalid.all(axis=scl.dims.index("time"))
+            scl = scl.isel(time=0)
+
         cloud_mask_arr = xr.DataArray(
-            np.isin(scl.values, cloud_classes),
+            invalid,
             dims=scl.dims,
-            coords={k: v for k, v in scl.coords.items() if k != 'band'},
+            coords={k: v for k, v in scl.coords.items() if k not in ('band', 'time')},
             attrs={'crs': data.attrs.get('crs', 'EPSG:4326')},  # Preserve CRS for zonal stats
         )
 
@@ -571,11 +864,6 @@ class CopernicusProvider(BaseSatelliteProvider):
 
         logger.info(f"SCL-based cloud masking: {clear_pixels}/{total_pixels} clear pixels ({cloud_free_pct:.1%})")
 
-        # Apply mask to all bands except SCL (set cloudy pixels to NaN)
-        # Create a mask that broadcasts across all bands
-        spectral_bands = [b for b in band_names if b != 'scl']
-        masked_data = data.sel(band=spectral_bands).where(~cloud_mask_arr)
-
         return masked_data, cloud_free_pct, cloud_mask_arr
 
     def get_metadata(self, item: dict) -> dict:
@@ -5,18 +5,32 @@ Provides access to PlanetScope imagery via the Planet Data API.
 Requires API key and has per-scene costs.
 """
 import logging
+import os
+import re
 import tempfile
 import time
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
-from . import BaseSatelliteProvider, BandNames, ActivationTimeoutError, QuotaExceededError
+from . import BaseSatelliteProvider, BandNames, ActivationTimeoutError, ProviderError, QuotaExceededError
+from .cache import get_band_cache
+from profiling import in_current_context, record_download
 
 if TYPE_CHECKING:
     import xarray as xr
     import geopandas as gpd
+    import numpy as np
+    from composite import TimeStack
 
 logger = logging.getLogger(__name__)
 
+# Files of an analytic_udm2 order used by the pipeline, e.g.
+# <item_id>_3B_AnalyticMS_clip.tif and <item_id>_3B_udm2_clip.tif; other
+# delivered files (metadata, legacy UDM, ...) are ignored
+ORDER_FILE_PATTERNS = {
+    "analytic": re.compile(r"_AnalyticMS(_clip)?\.tif$"),
+    "udm2": re.compile(r"_udm2(_clip)?\.tif$"),
+}
+
 
 class PlanetScopeProvider(BaseSatelliteProvider):
     """
@@ -35,7 +49,10 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         api_key: Optional[str] = None,
         client_id: Optional[str] = None,
         client_secret: Optional[str] = None,
-        base_url: str = "https://api.planet.com/data/v1"
+        base_url: str = "https://api.planet.com/data/v1",
+        max_workers: Optional[int] = None,
+        delivery_mode: Optional[str] = None,
+        orders_url: Optional[str] = None,
     ):
         """
         Initialize the PlanetScope provider.
@@ -51,6 +68,11 @@ class PlanetScopeProvider(BaseSatelliteProvider):
             client_id: OAuth2 client ID. Falls back to PL_CLIENT_ID env var.
             client_secret: OAuth2 client secret. Falls back to PL_CLIENT_SECRET env var.
             base_url: Base URL for Planet Data API
+            max_workers: Concurrent asset downloads (defaults to PLANET_DOWNLOAD_WORKERS env var, then 4)
+            delivery_mode: "assets" downloads full scenes through the Data API,
+                "orders" has the Orders API clip them to the bbox server-side
+                (defaults to PLANET_DELIVERY_MODE env var, then "assets")
+            orders_url: Orders API endpoint (defaults to PLANET_ORDERS_URL env var)
         """
         self._api_key = api_key
         self._client_id = client_id
@@ -58,6 +80,14 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         self._base_url = base_url
         self._oauth_token: Optional[str] = None
         self._oauth_token_expires: float = 0
+        self.max_workers = max_workers or int(os.environ.get("PLANET_DOWNLOAD_WORKERS", "4"))
+        self.delivery_mode = (delivery_mode or os.environ.get("PLANET_DELIVERY_MODE", "assets")).lower()
+        self._orders_url = (
+            orders_url or os.environ.get("PLANET_ORDERS_URL", "https://api.planet.com/compute/ops/orders/v2")
+        ).rstrip("/")
+        # UDM2 masks delivered alongside ordered scenes, reused by cloud_mask()
+        self._order_udm2: dict[str, 'np.ndarray'] = {}
+        self.cache = get_band_cache()
 
     @property
     def resolution_meters(self) -> int:
@@ -94,7 +124,6 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         """Get OAuth2 client ID from parameter or environment."""
         if self._client_id:
             return self._client_id
-        import os
         return os.environ.get("PL_CLIENT_ID")
 
     @property
@@ -102,7 +131,6 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         """Get OAuth2 client secret from parameter or environment."""
         if self._client_secret:
             return self._client_secret
-        import os
         return os.environ.get("PL_CLIENT_SECRET")
 
     @property
@@ -110,7 +138,6 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         """Get API key from parameter or environment."""
         if self._api_key:
             return self._api_key
-        import os
         return os.environ.get("PL_API_KEY")
 
     def _has_oauth_credentials(self) -> bool:
@@ -135,7 +162,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
             ValueError: If OAuth2 credentials are not configured
             QuotaExceededError: If authentication fails
         """
-        import requests
+        from http_session import get_session
 
         # Check if we have a valid cached token
         if self._oauth_token and time.time() < self._oauth_token_expires:
@@ -152,7 +179,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         # Planet OAuth2 M2M uses Sentinel Hub's OAuth endpoint
         # See: https://docs.planet.com/develop/authentication/
         token_url = "https://services.sentinel-hub.com/auth/realms/main/protocol/openid-connect/token"
-        response = requests.post(
+        response = get_session().post(
             token_url,
             data={
                 "grant_type": "client_credentials",
@@ -234,11 +261,11 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         Raises:
             QuotaExceededError: If quota/rate limit exceeded
         """
-        import requests
+        from http_session import get_session
 
         # Get asset status
         asset_url = f"{self._base_url}/item-types/{item_type}/items/{item_id}/assets"
-        response = requests.get(asset_url, headers=self._get_auth_headers(), timeout=30)
+        response = get_session().get(asset_url, headers=self._get_auth_headers(), timeout=30)
 
         if response.status_code == 429:
             raise QuotaExceededError("PlanetScope", "Rate limit exceeded")
@@ -272,7 +299,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
                 raise ValueError(f"No activation link for asset {asset_type}")
 
             logger.info(f"Activating asset {asset_type} for item {item_id}...")
-            activate_response = requests.get(
+            activate_response = get_session().get(
                 activate_url,
                 headers=self._get_auth_headers(),
                 timeout=30
@@ -292,62 +319,35 @@ class PlanetScopeProvider(BaseSatelliteProvider):
 
         raise ValueError(f"Unexpected asset status: {status}")
 
-    def _wait_for_activation(
-        self,
-        item_id: str,
-        item_type: str,
-        asset_type: str,
-        timeout: int = 300,
-        poll_interval: int = 5
-    ) -> dict:
+    def _get_asset(self, item_id: str, item_type: str, asset_type: str) -> dict:
         """
-        Wait for an asset to become active.
-
-        Polls the asset status every poll_interval seconds until it becomes
-        active or the timeout is exceeded.
+        Fetch the current metadata (status, location) of one asset.
 
         Args:
             item_id: Planet item ID
             item_type: Item type (e.g., "PSScene")
             asset_type: Asset type (e.g., "ortho_analytic_4b")
-            timeout: Maximum time to wait in seconds (default 300 = 5 minutes)
-            poll_interval: Time between status checks in seconds (default 5)
 
         Returns:
-            Asset metadata dict with download location
+            Asset metadata dict
 
         Raises:
-            ActivationTimeoutError: If activation doesn't complete in time
+            QuotaExceededError: If rate limit exceeded
         """
-        import requests
+        from http_session import get_session
 
         asset_url = f"{self._base_url}/item-types/{item_type}/items/{item_id}/assets"
-        start_time = time.time()
-
-        while (time.time() - start_time) < timeout:
-            response = requests.get(asset_url, headers=self._get_auth_headers(), timeout=30)
-            response.raise_for_status()
+        response = get_session().get(asset_url, headers=self._get_auth_headers(), timeout=30)
 
-            assets = response.json()
-            asset = assets.get(asset_type)
-
-            if asset is None:
-                raise ValueError(f"Asset type {asset_type} not available for item {item_id}")
-
-            status = asset.get("status")
-
-            if status == "active":
-                logger.info(f"Asset {asset_type} for {item_id} is now active")
-                return asset
-
-            if status == "failed":
-                raise ValueError(f"Asset activation failed for {item_id}/{asset_type}")
+        if response.status_code == 429:
+            raise QuotaExceededError("PlanetScope", "Rate limit exceeded")
+        response.raise_for_status()
 
-            elapsed = int(time.time() - start_time)
-            logger.debug(f"Asset {asset_type} status: {status}, waiting... ({elapsed}s/{timeout}s)")
-            time.sleep(poll_interval)
+        asset = response.json().get(asset_type)
+        if asset is None:
+            raise ValueError(f"Asset type {asset_type} not available for item {item_id}")
 
-        raise ActivationTimeoutError(item_id, asset_type, timeout)
+        return asset
 
     def _download_asset(self, download_url: str) -> str:
         """
@@ -361,7 +361,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         Returns:
             Path to temporary file containing the downloaded data
         """
-        import requests
+        from http_session import get_session
 
         logger.debug(f"Downloading asset from {download_url[:80]}...")
 
@@ -369,13 +369,14 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         tmp_file = tempfile.NamedTemporaryFile(suffix=".tif", delete=False)
 
         try:
-            with requests.get(download_url, stream=True, timeout=300) as response:
+            with get_session().get(download_url, stream=True, timeout=300) as response:
                 response.raise_for_status()
 
                 # Stream in chunks to handle large files
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
                         tmp_file.write(chunk)
+                        record_download(len(chunk))
 
             tmp_file.close()
             logger.debug(f"Downloaded to {tmp_file.name}")
@@ -383,10 +384,273 @@ class PlanetScopeProvider(BaseSatelliteProvider):
 
         except Exception:
             tmp_file.close()
-            import os
             os.unlink(tmp_file.name)
             raise
 
+    def _grid_key(self, bbox: list[float], width: int, height: int) -> dict:
+        """Describe the output grid for band cache keys (bbox snapped to ~1cm)."""
+        return {
+            "crs": "EPSG:4326",
+            "bbox": [round(v, 7) for v in bbox],
+            "shape": [height, width],
+        }
+
+    def _fetch_assets(
+        self,
+        items: list,
+        asset_type: str,
+        process: Callable[[dict, str], Any],
+        timeout: int = 300,
+        poll_interval: int = 5,
+    ) -> dict[str, Any]:
+        """
+        Activate, await and download one asset type for many items concurrently.
+
+        All assets are activated up front, then the pending ones are polled
+        together. Each asset is handed to a download worker as soon as it
+        turns active, so downloads and processing overlap with the remaining
+        activations.
+
+        Args:
+            items: Item metadata from query()
+            asset_type: Asset type (e.g., "ortho_analytic_4b")
+            process: Called with (item, downloaded_file_path) in a worker thread;
+                     the file is deleted after it returns
+            timeout: Maximum time to wait for activations in seconds
+            poll_interval: Time between status checks in seconds
+
+        Returns:
+            Dictionary mapping item ID to the result of process(). Items that
+            time out or fail are logged and omitted.
+
+        Raises:
+            QuotaExceededError: If quota/rate limit exceeded
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        items_by_id = {item.get("id"): item for item in items}
+        futures = {}
+        pending: dict[str, dict] = {}
+
+        def download_and_process(item: dict, download_url: str):
+            tmp_file = self._download_asset(download_url)
+            try:
+                return process(item, tmp_file)
+            finally:
+                if os.path.exists(tmp_file):
+                    os.unlink(tmp_file)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+
+            def start_download(item_id: str, asset: dict) -> None:
+                download_url = asset.get("location")
+                if not download_url:
+                    logger.warning(f"No download URL for item {item_id}, skipping")
+                    return
+                futures[item_id] = executor.submit(in_current_context(download_and_process), items_by_id[item_id], download_url)
+
+            # Step 1: Request activation for every item
+            for item_id, item in items_by_id.items():
+                try:
+                    asset = self._activate_asset(item_id, item.get("item_type", "PSScene"), asset_type)
+                except QuotaExceededError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Could not activate {asset_type} for {item_id}: {e}")
+                    continue
+
+                if asset.get("status") == "active":
+                    start_download(item_id, asset)
+                else:
+                    pending[item_id] = item
+
+            # Step 2: Poll all pending activations together
+            start_time = time.time()
+            while pending and (time.time() - start_time) < timeout:
+                time.sleep(poll_interval)
+
+                for item_id, item in list(pending.items()):
+                    try:
+                        asset = self._get_asset(item_id, item.get("item_type", "PSScene"), asset_type)
+                    except QuotaExceededError:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Status check failed for {item_id}: {e}")
+                        del pending[item_id]
+                        continue
+
+                    status = asset.get("status")
+                    if status == "active":
+                        logger.info(f"Asset {asset_type} for {item_id} is now active")
+                        del pending[item_id]
+                        start_download(item_id, asset)
+                    elif status == "failed":
+                        logger.warning(f"Asset activation failed for {item_id}/{asset_type}")
+                        del pending[item_id]
+
+                elapsed = int(time.time() - start_time)
+                logger.debug(f"{len(pending)} {asset_type} assets still activating ({elapsed}s/{timeout}s)")
+
+            for item_id in pending:
+                logger.warning(f"{ActivationTimeoutError(item_id, asset_type, timeout)}, skipping")
+
+            # Step 3: Collect downloads in the order they were started
+            results = {}
+            for item_id, future in futures.items():
+                try:
+                    results[item_id] = future.result()
+                except QuotaExceededError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error processing item {item_id}: {e}")
+
+        return results
+
+    def _fetch_via_order(
+        self,
+        items: list,
+        bbox: list[float],
+        width: int,
+        height: int,
+        timeout: int = 600,
+        poll_interval: int = 10,
+        process_analytic: Optional[Callable[[str, 'np.ndarray'], Any]] = None,
+    ) -> tuple[dict[str, Any], dict[str, 'np.ndarray']]:
+        """
+        Fetch AOI-clipped scenes and UDM2 masks through the Planet Orders API.
+
+        Submits one order for all items with the clip tool, so Planet
+        delivers only the bbox (a few MB per scene instead of the full
+        ~300 MB scene). The delivered files are downloaded concurrently and
+        reprojected locally onto the same bbox grid as the asset path
+        (bilinear for the analytic scene, nearest for the UDM2).
+
+        Args:
+            items: Item metadata from query()
+            bbox: Bounding box [west, south, east, north] used as the clip AOI
+            width: Output width in pixels
+            height: Output height in pixels
+            timeout: Maximum time to wait for the order in seconds
+            poll_interval: Time between order status checks in seconds
+            process_analytic: Optional function called with (item ID, analytic
+                              array) in the download worker; its result
+                              replaces the array in the returned dictionary
+
+        Returns:
+            Tuple of (item ID -> analytic array, item ID -> UDM2 clear mask)
+
+        Raises:
+            QuotaExceededError: If quota/rate limit exceeded
+            ActivationTimeoutError: If the order doesn't complete in time
+            ProviderError: If the order fails
+        """
+        from http_session import get_session
+        from concurrent.futures import ThreadPoolExecutor
+
+        item_ids = [item.get("id") for item in items]
+        aoi = {
+            "type": "Polygon",
+            "coordinates": [[
+                [bbox[0], bbox[1]],
+                [bbox[2], bbox[1]],
+                [bbox[2], bbox[3]],
+                [bbox[0], bbox[3]],
+                [bbox[0], bbox[1]],
+            ]]
+        }
+        order_request = {
+            "name": f"openpasture-{int(time.time())}",
+            "products": [{
+                "item_ids": item_ids,
+                "item_type": items[0].get("item_type", "PSScene"),
+                "product_bundle": "analytic_udm2",
+            }],
+            # No reproject tool: it would also resample the UDM2 bit flags;
+            # delivered files are reprojected locally (UDM2 with nearest)
+            "tools": [
+                {"clip": {"aoi": aoi}},
+            ],
+        }
+
+        logger.info(f"Submitting Planet order for {len(item_ids)} items...")
+        response = get_session().post(
+            self._orders_url,
+            headers=self._get_auth_headers(),
+            json=order_request,
+            timeout=60
+        )
+
+        if response.status_code == 429:
+            raise QuotaExceededError("PlanetScope", "Rate limit exceeded during order")
+        response.raise_for_status()
+
+        order_id = response.json()["id"]
+        order_url = f"{self._orders_url}/{order_id}"
+
+        # Poll until the order reaches a terminal state
+        start_time = time.time()
+        while True:
+            response = get_session().get(order_url, headers=self._get_auth_headers(), timeout=30)
+            response.raise_for_status()
+            order = response.json()
+            state = order.get("state")
+
+            if state in ("success", "partial"):
+                break
+            if state in ("failed", "cancelled"):
+                raise ProviderError(f"Planet order {order_id} {state}: {order.get('error_hints') or ''}")
+
+            elapsed = int(time.time() - start_time)
+            if elapsed >= timeout:
+                raise ActivationTimeoutError(order_id, "order", timeout)
+
+            logger.debug(f"Order {order_id} state: {state}, waiting... ({elapsed}s/{timeout}s)")
+            time.sleep(poll_interval)
+
+        logger.info(f"Planet order {order_id} {state} after {int(time.time() - start_time)}s")
+
+        # Match delivered files to items: <item_id>_..._AnalyticMS_clip.tif / <item_id>_..._udm2_clip.tif
+        downloads = []
+        for result in order.get("_links", {}).get("results", []):
+            name = result.get("name", "")
+            basename = name.rsplit("/", 1)[-1]
+            if not basename.endswith(".tif"):
+                continue
+            item_id = next((i for i in item_ids if basename.startswith(f"{i}_")), None)
+            if item_id is None:
+                continue
+            kind = next((k for k, pattern in ORDER_FILE_PATTERNS.items() if pattern.search(basename)), None)
+            if kind is None:
+                continue
+            downloads.append((item_id, kind, result["location"]))
+
+        def download_and_process(item_id: str, kind: str, location: str):
+            tmp_file = self._download_asset(location)
+            try:
+                if kind == "udm2":
+                    return self._reproject_udm2(tmp_file, bbox, width, height)
+                dst_data = self._reproject_analytic(tmp_file, bbox, width, height)
+                return process_analytic(item_id, dst_data) if process_analytic else dst_data
+            finally:
+                if os.path.exists(tmp_file):
+                    os.unlink(tmp_file)
+
+        analytic: dict[str, Any] = {}
+        udm2: dict[str, 'np.ndarray'] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                (item_id, kind, executor.submit(in_current_context(download_and_process), item_id, kind, location))
+                for item_id, kind, location in downloads
+            ]
+            for item_id, kind, future in futures:
+                try:
+                    (udm2 if kind == "udm2" else analytic)[item_id] = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {kind} for item {item_id}: {e}")
+
+        return analytic, udm2
+
     def query(
         self,
         bbox: list[float],
@@ -406,7 +670,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         Returns:
             List of item metadata dictionaries
         """
-        import requests
+        from http_session import get_session
 
         # Planet API request for PlanetScope items
         # Build filter for geometry, date range, and cloud cover
@@ -453,7 +717,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
             "item_types": ["PSScene"]
         }
 
-        response = requests.post(
+        response = get_session().post(
             url,
             headers=self._get_auth_headers(),
             json=payload,
@@ -490,11 +754,16 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         """
         Load PlanetScope bands and clip to bounding box.
 
-        Implements the Planet asset activation workflow:
-        1. Activate the asset if not already active
-        2. Wait for activation to complete
-        3. Download the asset
-        4. Reproject and clip to bbox
+        With PLANET_DELIVERY_MODE=orders, scenes are clipped server-side through
+        the Orders API instead (see _fetch_via_order). Otherwise this implements
+        the Planet asset activation workflow for all items at once:
+        1. Activate every item's asset up front
+        2. Poll the pending activations together
+        3. Download each asset as soon as it turns active
+        4. Reproject and clip to bbox (concurrently with other downloads)
+
+        Wall time is roughly the slowest single activation rather than the
+        sum of all of them.
 
         Args:
             items: Item metadata from query()
@@ -505,124 +774,47 @@ class PlanetScopeProvider(BaseSatelliteProvider):
             xarray DataArray with loaded band data
         """
         import numpy as np
-        import rasterio
-        from rasterio.warp import calculate_default_transform, reproject, Resampling
-        from rasterio.windows import from_bounds
         import xarray as xr
-        import os
 
-        all_band_arrays = []
+        width, height = self._output_shape(bbox)
+
+        loaded: dict[str, 'np.ndarray'] = {}
+        cache_keys: dict[str, str] = {}
 
         for item in items:
             item_id = item.get("id")
-            item_type = item.get("item_type", "PSScene")
-
-            logger.info(f"Processing item {item_id}...")
-
-            try:
-                # Step 1: Activate the analytic asset
-                asset = self._activate_asset(item_id, item_type, "ortho_analytic_4b")
-
-                # Step 2: Wait for activation if needed
-                if asset.get("status") != "active":
-                    asset = self._wait_for_activation(
-                        item_id, item_type, "ortho_analytic_4b",
-                        timeout=300  # 5 minute timeout
-                    )
-
-                # Step 3: Get download URL and download
-                download_url = asset.get("location")
-                if not download_url:
-                    logger.warning(f"No download URL for item {item_id}, skipping")
-                    continue
-
-                tmp_file = self._download_asset(download_url)
-
-                try:
-                    # Step 4: Process the downloaded file
-                    with rasterio.open(tmp_file) as src:
-                        src_crs = src.crs
-                        dst_crs = "EPSG:4326"  # WGS84
-
-                        # Calculate output dimensions at 3m resolution over the bbox
-                        # ~111km per degree at equator
-                        width = int((bbox[2] - bbox[0]) * 111000 / 3)
-                        height = int((bbox[3] - bbox[1]) * 111000 / 3)
-
-                        # Ensure reasonable bounds
-                        width = max(min(width, 2000), 100)
-                        height = max(min(height, 2000), 100)
-
-                        # Calculate the transform ONCE for all bands
-                        dst_transform, dst_width, dst_height = calculate_default_transform(
-                            src_crs, dst_crs, src.width, src.height,
-                            *src.bounds,
-                            dst_width=width, dst_height=height
-                        )
-
-                        # Override to use exact bbox
-                        from rasterio.transform import from_bounds as transform_from_bounds
-                        dst_transform = transform_from_bounds(
-                            bbox[0], bbox[1], bbox[2], bbox[3],
-                            width, height
-                        )
-
-                        # Read and reproject all 4 bands at once
-                        # PlanetScope 4-band order: Blue (1), Green (2), Red (3), NIR (4)
-                        dst_data = np.zeros((4, height, width), dtype=np.float32)
-
-                        for band_idx in range(4):
-                            src_band = src.read(band_idx + 1)
-
-                            reproject(
-                                source=src_band,
-                                destination=dst_data[band_idx],
-                                src_transform=src.transform,
-                                src_crs=src_crs,
-                                dst_transform=dst_transform,
-                                dst_crs=dst_crs,
-                                resampling=Resampling.bilinear
-                            )
-
-                        # Normalize to 0-1 reflectance
-                        # PlanetScope typically uses 0-10000 scale
-                        max_val = np.nanmax(dst_data)
-                        if max_val > 1:
-                            # Assume 0-10000 or similar scale
-                            if max_val > 100:
-                                dst_data = dst_data / 10000.0
-                            else:
-                                dst_data = dst_data / max_val
-
-                        # Create xarray DataArray
-                        # Map bands: 0=Blue, 1=Green, 2=Red, 3=NIR
-                        da = xr.DataArray(
-                            dst_data,
-                            dims=["band", "y", "x"],
-                            coords={
-                                "band": ["blue", "green", "red", "nir"],
-                                "y": np.linspace(bbox[3], bbox[1], height),
-                                "x": np.linspace(bbox[0], bbox[2], width),
-                            }
-                        )
-
-                        all_band_arrays.append(da)
-                        logger.info(f"  Loaded {item_id}: {width}x{height} pixels")
-
-                finally:
-                    # Clean up temporary file
-                    if os.path.exists(tmp_file):
-                        os.unlink(tmp_file)
-
-            except ActivationTimeoutError:
-                logger.warning(f"Activation timeout for item {item_id}, skipping")
-                continue
-            except QuotaExceededError as e:
-                logger.error(f"Quota exceeded: {e}")
-                raise
-            except Exception as e:
-                logger.error(f"Error processing item {item_id}: {e}")
+            if self.cache is None:
                 continue
+            cache_keys[item_id] = self._cache_key(item_id, "ortho_analytic_4b", bbox, width, height)
+            cached = self.cache.get(cache_keys[item_id])
+            if cached is not None:
+                logger.info(f"  Loaded {item_id} from band cache")
+                loaded[item_id] = np.array(cached)
+
+        to_fetch = [item for item in items if item.get("id") not in loaded]
+        if to_fetch:
+            logger.info(f"Fetching {len(to_fetch)} PlanetScope items ({len(loaded)} cached)...")
+            if self.delivery_mode == "orders":
+                fetched, udm2_masks = self._fetch_via_order(to_fetch, bbox, width, height)
+                self._order_udm2.update(udm2_masks)
+            else:
+                fetched = self._fetch_assets(
+                    to_fetch,
+                    "ortho_analytic_4b",
+                    lambda item, path: self._reproject_analytic(path, bbox, width, height),
+                    timeout=300,  # 5 minute timeout
+                )
+            for item_id, dst_data in fetched.items():
+                if self.cache is not None:
+                    self.cache.put(cache_keys[item_id], dst_data, meta={"item": item_id, "asset": "ortho_analytic_4b"})
+                logger.info(f"  Loaded {item_id}: {width}x{height} pixels")
+            loaded.update(fetched)
+
+        # Keep query order for the time dimension
+        all_band_arrays = [
+            self._to_data_array(loaded[item.get("id")], bbox)
+            for item in items if item.get("id") in loaded
+        ]
 
         if not all_band_arrays:
             raise ValueError("No valid PlanetScope items could be loaded")
@@ -635,6 +827,230 @@ class PlanetScopeProvider(BaseSatelliteProvider):
 
         return result
 
+    def load_stack(
+        self,
+        items: list,
+        bands: list[str],
+        bbox: list[float],
+        stack: 'TimeStack',
+    ) -> None:
+        """
+        Load scenes straight into a disk-backed TimeStack, cloud-masked per scene.
+
+        Like load() followed by cloud_mask(), but each scene is written to the
+        stack as soon as it is reprojected, so only the scenes in flight are
+        held in memory. Each scene is then masked with its own UDM2 rather
+        than the union of all scenes' clear pixels.
+
+        Args:
+            items: Item metadata from query()
+            bands: Semantic band names to load (all four bands are always stored)
+            bbox: Bounding box [west, south, east, north]
+            stack: Empty TimeStack with a slot per item
+        """
+        import numpy as np
+
+        width, height = self._output_shape(bbox)
+        y, x = self._grid_coords(bbox, width, height)
+        stack.allocate(["blue", "green", "red", "nir"], y, x, attrs={"crs": "EPSG:4326"})
+
+        def store(item_id: str, dst_data: 'np.ndarray') -> None:
+            if self.cache is not None:
+                self.cache.put(
+                    self._cache_key(item_id, "ortho_analytic_4b", bbox, width, height),
+                    dst_data,
+                    meta={"item": item_id, "asset": "ortho_analytic_4b"},
+                )
+            stack.write(item_id, dst_data)
+            logger.info(f"  Loaded {item_id}: {width}x{height} pixels")
+
+        to_fetch = []
+        for item in items:
+            item_id = item.get("id")
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.get(self._cache_key(item_id, "ortho_analytic_4b", bbox, width, height))
+            if cached is not None:
+                logger.info(f"  Loaded {item_id} from band cache")
+                stack.write(item_id, np.asarray(cached))
+            else:
+                to_fetch.append(item)
+
+        if to_fetch:
+            logger.info(f"Fetching {len(to_fetch)} PlanetScope items ({stack.n_time} cached)...")
+            if self.delivery_mode == "orders":
+                _, udm2_masks = self._fetch_via_order(to_fetch, bbox, width, height, process_analytic=store)
+                self._order_udm2.update(udm2_masks)
+            else:
+                self._fetch_assets(
+                    to_fetch,
+                    "ortho_analytic_4b",
+                    lambda item, path: store(item.get("id"), self._reproject_analytic(path, bbox, width, height)),
+                    timeout=300,  # 5 minute timeout
+                )
+
+        if stack.n_time == 0:
+            raise ValueError("No valid PlanetScope items could be loaded")
+
+        loaded = [item for item in items if item.get("id") in stack.labels]
+        clear_masks = self._clear_masks(loaded, bbox, width, height)
+        for item in loaded:
+            item_id = item.get("id")
+            if item_id in clear_masks:
+                stack.mask(item_id, clear_masks[item_id])
+            else:
+                logger.debug(f"UDM2 not available for {item_id}, assuming all clear")
+
+    def _cache_key(self, item_id: str, asset_type: str, bbox: list[float], width: int, height: int) -> str:
+        """Band cache key of an item's asset reprojected onto the bbox grid."""
+        return self.cache.make_key("planetscope", item_id, asset_type, self._grid_key(bbox, width, height))
+
+    def _output_shape(self, bbox: list[float]) -> tuple[int, int]:
+        """Output (width, height) at ~3m over the bbox, clamped to 100-2000 pixels."""
+        # ~111km per degree at equator
+        width = int((bbox[2] - bbox[0]) * 111000 / 3)
+        height = int((bbox[3] - bbox[1]) * 111000 / 3)
+
+        # Ensure reasonable bounds
+        width = max(min(width, 2000), 100)
+        height = max(min(height, 2000), 100)
+        return width, height
+
+    def _reproject_analytic(
+        self,
+        path: str,
+        bbox: list[float],
+        width: int,
+        height: int,
+    ) -> 'np.ndarray':
+        """
+        Reproject a downloaded 4-band analytic scene onto the bbox grid.
+
+        Args:
+            path: Path to the downloaded GeoTIFF
+            bbox: Bounding box [west, south, east, north]
+            width: Output width in pixels
+            height: Output height in pixels
+
+        Returns:
+            float32 array (4, height, width) in 0-1 reflectance, band order Blue, Green, Red, NIR
+        """
+        import numpy as np
+        import rasterio
+        from rasterio.transform import from_bounds as transform_from_bounds
+        from rasterio.warp import reproject, Resampling
+
+        dst_transform = transform_from_bounds(
+            bbox[0], bbox[1], bbox[2], bbox[3],
+            width, height
+        )
+
+        with rasterio.open(path) as src:
+            # Read and reproject all 4 bands at once
+            # PlanetScope 4-band order: Blue (1), Green (2), Red (3), NIR (4)
+            dst_data = np.zeros((4, height, width), dtype=np.float32)
+
+            for band_idx in range(4):
+                reproject(
+                    source=src.read(band_idx + 1),
+                    destination=dst_data[band_idx],
+                    src_transform=src.transform,
+                    src_crs=src.crs,
+                    dst_transform=dst_transform,
+                    dst_crs="EPSG:4326",  # WGS84
+                    resampling=Resampling.bilinear
+                )
+
+        # Normalize to 0-1 reflectance
+        # PlanetScope typically uses 0-10000 scale
+        max_val = np.nanmax(dst_data)
+        if max_val > 1:
+            # Assume 0-10000 or similar scale
+            if max_val > 100:
+                dst_data = dst_data / 10000.0
+            else:
+                dst_data = dst_data / max_val
+
+        return dst_data
+
+    def _reproject_udm2(
+        self,
+        path: str,
+        bbox: list[float],
+        width: int,
+        height: int,
+    ) -> 'np.ndarray':
+        """
+        Build a clear-pixel mask from a downloaded UDM2 asset on the bbox grid.
+
+        Args:
+            path: Path to the downloaded UDM2 GeoTIFF
+            bbox: Bounding box [west, south, east, north]
+            width: Output width in pixels
+            height: Output height in pixels
+
+        Returns:
+            Boolean array (height, width), True = clear pixel
+        """
+        import numpy as np
+        import rasterio
+        from rasterio.transform import from_bounds as transform_from_bounds
+        from rasterio.warp import reproject, Resampling
+
+        dst_transform = transform_from_bounds(
+            bbox[0], bbox[1], bbox[2], bbox[3],
+            width, height
+        )
+
+        with rasterio.open(path) as src:
+            # Read Band 1 (clear mask) and Band 6 (cloud mask)
+            dst_clear = np.zeros((height, width), dtype=np.uint8)
+            dst_cloud = np.zeros((height, width), dtype=np.uint8)
+
+            for band_idx, destination in ((1, dst_clear), (6, dst_cloud)):
+                reproject(
+                    source=src.read(band_idx),
+                    destination=destination,
+                    src_transform=src.transform,
+                    src_crs=src.crs,
+                    dst_transform=dst_transform,
+                    dst_crs="EPSG:4326",
+                    resampling=Resampling.nearest
+                )
+
+        # Clear where: clear_band == 1 AND cloud_band == 0
+        # In UDM2: 1 = condition true, 0 = condition false
+        return (dst_clear == 1) & (dst_cloud == 0)
+
+    def _to_data_array(self, dst_data: 'np.ndarray', bbox: list[float]) -> 'xr.DataArray':
+        """Wrap a reprojected (4, y, x) PlanetScope array as a DataArray over the bbox."""
+        import xarray as xr
+
+        _, height, width = dst_data.shape
+        y, x = self._grid_coords(bbox, width, height)
+
+        # Map bands: 0=Blue, 1=Green, 2=Red, 3=NIR
+        return xr.DataArray(
+            dst_data,
+            dims=["band", "y", "x"],
+            coords={
+                "band": ["blue", "green", "red", "nir"],
+                "y": y,
+                "x": x,
+            }
+        )
+
+    def _grid_coords(self, bbox: list[float], width: int, height: int) -> tuple['np.ndarray', 'np.ndarray']:
+        """y and x pixel centers of the from_bounds(bbox) grid scenes are reprojected onto."""
+        import numpy as np
+
+        res_x = (bbox[2] - bbox[0]) / width
+        res_y = (bbox[3] - bbox[1]) / height
+        return (
+            bbox[3] - (np.arange(height) + 0.5) * res_y,
+            bbox[0] + (np.arange(width) + 0.5) * res_x,
+        )
+
     def cloud_mask(
         self,
         data: 'xr.DataArray',
@@ -655,6 +1071,7 @@ class PlanetScopeProvider(BaseSatelliteProvider):
         - Band 8: Unusable pixels mask
 
         We use Band 1 (clear) OR combine Band 1 AND NOT Band 6 (cloud).
+        UDM2 assets for all items are activated and downloaded concurrently.
 
         Args:
             data: xarray DataArray with band data
@@ -665,10 +1082,6 @@ class PlanetScopeProvider(BaseSatelliteProvider):
             Tuple of (masked_data, cloud_free_percentage)
         """
         import numpy as np
-        import rasterio
-        from rasterio.warp import reproject, Resampling
-        from rasterio.transform import from_bounds as transform_from_bounds
-        import os
 
         # Target dimensions from data
         height = data.sizes.get("y", 100)
@@ -686,88 +1099,18 @@ class PlanetScopeProvider(BaseSatelliteProvider):
                     float(y_coords.max()),
                 ]
 
-        # Build a clear mask from all items
+        item_masks = self._clear_masks(items, bbox, width, height) if bbox else {}
+
+        # Build a clear mask from all items (union of clear pixels across all items)
+        # Items without a UDM2 (not available, timed out or failed) are assumed all clear
         combined_clear_mask = None
 
         for item in items:
-            item_id = item.get("id")
-            item_type = item.get("item_type", "PSScene")
-
-            try:
-                # Try to activate and get UDM2 asset
-                try:
-                    asset = self._activate_asset(item_id, item_type, "ortho_udm2")
-
-                    if asset.get("status") != "active":
-                        asset = self._wait_for_activation(
-                            item_id, item_type, "ortho_udm2",
-                            timeout=120  # Shorter timeout for UDM2
-                        )
-
-                    download_url = asset.get("location")
-                    if not download_url:
-                        raise ValueError("No download URL")
-
-                    tmp_file = self._download_asset(download_url)
-
-                    try:
-                        with rasterio.open(tmp_file) as src:
-                            # Read Band 1 (clear mask) and Band 6 (cloud mask)
-                            clear_band = src.read(1)
-                            cloud_band = src.read(6)
-
-                            # Create destination array at target resolution
-                            dst_clear = np.zeros((height, width), dtype=np.uint8)
-                            dst_cloud = np.zeros((height, width), dtype=np.uint8)
-
-                            # Calculate transform for reprojection
-                            if bbox:
-                                dst_transform = transform_from_bounds(
-                                    bbox[0], bbox[1], bbox[2], bbox[3],
-                                    width, height
-                                )
-
-                                # Reproject clear band
-                                reproject(
-                                    source=clear_band,
-                                    destination=dst_clear,
-                                    src_transform=src.transform,
-                                    src_crs=src.crs,
-                                    dst_transform=dst_transform,
-                                    dst_crs="EPSG:4326",
-                                    resampling=Resampling.nearest
-                                )
-
-                                # Reproject cloud band
-                                reproject(
-                                    source=cloud_band,
-                                    destination=dst_cloud,
-                                    src_transform=src.transform,
-                                    src_crs=src.crs,
-                                    dst_transform=dst_transform,
-                                    dst_crs="EPSG:4326",
-                                    resampling=Resampling.nearest
-                                )
-
-                            # Clear where: clear_band == 1 AND cloud_band == 0
-                            # In UDM2: 1 = condition true, 0 = condition false
-                            item_mask = (dst_clear == 1) & (dst_cloud == 0)
-
-                    finally:
-                        if os.path.exists(tmp_file):
-                            os.unlink(tmp_file)
-
-                except (ActivationTimeoutError, ValueError) as e:
-                    logger.debug(f"UDM2 not available for {item_id}: {e}, assuming all clear")
-                    # No UDM2 available - assume all pixels are clear
-                    item_mask = np.ones((height, width), dtype=bool)
-
-            except Exception as e:
-                logger.warning(f"Error getting cloud mask for {item_id}: {e}")
-                # On error, assume all clear
+            item_mask = item_masks.get(item.get("id"))
+            if item_mask is None:
+                logger.debug(f"UDM2 not available for {item.get('id')}, assuming all clear")
                 item_mask = np.ones((height, width), dtype=bool)
 
-            # Combine masks (union of clear pixels across all items)
             if combined_clear_mask is None:
                 combined_clear_mask = item_mask
             else:
@@ -786,6 +1129,60 @@ class PlanetScopeProvider(BaseSatelliteProvider):
 
         return masked, cloud_free_pct
 
+    def _clear_masks(self, items: list, bbox: list[float], width: int, height: int) -> dict[str, 'np.ndarray']:
+        """
+        Get each item's UDM2 clear-pixel mask on the bbox grid.
+
+        Masks come from the band cache, from an order's delivered UDM2 or
+        from downloading the ortho_udm2 assets (activated concurrently).
+
+        Returns:
+            Dictionary mapping item ID to a boolean (height, width) mask, True =
+            clear. Items whose UDM2 is unavailable, timed out or failed are omitted.
+        """
+        import numpy as np
+
+        item_masks: dict[str, 'np.ndarray'] = {}
+        cache_keys: dict[str, str] = {}
+
+        for item in items:
+            item_id = item.get("id")
+            if self.cache is None:
+                continue
+            cache_keys[item_id] = self._cache_key(item_id, "ortho_udm2", bbox, width, height)
+            cached = self.cache.get(cache_keys[item_id])
+            if cached is not None:
+                item_masks[item_id] = np.array(cached)
+
+        # Masks delivered with an order for this grid need no extra download
+        for item in items:
+            item_id = item.get("id")
+            order_mask = self._order_udm2.get(item_id)
+            if item_id not in item_masks and order_mask is not None and order_mask.shape == (height, width):
+                item_masks[item_id] = order_mask
+                if self.cache is not None:
+                    self.cache.put(cache_keys[item_id], order_mask, meta={"item": item_id, "asset": "ortho_udm2"})
+
+        to_fetch = [item for item in items if item.get("id") not in item_masks]
+        if to_fetch:
+            try:
+                fetched = self._fetch_assets(
+                    to_fetch,
+                    "ortho_udm2",
+                    lambda item, path: self._reproject_udm2(path, bbox, width, height),
+                    timeout=120,  # Shorter timeout for UDM2
+                )
+            except Exception as e:
+                logger.warning(f"Error getting cloud masks: {e}")
+                fetched = {}
+
+            for item_id, item_mask in fetched.items():
+                if self.cache is not None:
+                    self.cache.put(cache_keys[item_id], item_mask, meta={"item": item_id, "asset": "ortho_udm2"})
+            item_masks.update(fetched)
+
+        return item_masks
+
     def get_metadata(self, item: dict) -> dict:
         """
         Extract metadata from a Planet item.
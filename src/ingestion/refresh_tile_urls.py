@@ -6,30 +6,57 @@ Generates new presigned URLs for existing tiles in R2 and updates
 the Convex database. Temporary fix while the ingestion service is
 being rewired for better R2 connectivity.
 
+The bucket is listed once, the existing Convex records of all selected
+farms are fetched in one query, URLs are signed concurrently and the
+updates are written in batched mutations.
+
 Usage:
     cd src/ingestion
     python refresh_tile_urls.py
     python refresh_tile_urls.py --farm-id farm-1 --expiry-days 30
+    python refresh_tile_urls.py --farm-id farm-1 --farm-id farm-2
+    python refresh_tile_urls.py --all-farms --workers 16
     python refresh_tile_urls.py --no-cleanup-demos
+
+With tile_server.py deployed, run once with --tile-server-url to switch the
+records to stable URLs; re-signing is then no longer needed.
+
+    python refresh_tile_urls.py --all-farms --tile-server-url https://tiles.example.com
+
+The stable URLs are signed with TILE_URL_SECRET, which must match the tile
+server's; re-run the migration after changing the secret.
 """
 import argparse
 import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Optional
 
 import boto3
-import requests
 from botocore.config import Config
 
+from http_session import get_session
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 logger = logging.getLogger(__name__)
 
+# Tile URL updates per Convex mutation
+DEFAULT_BATCH_SIZE = 100
+
+# Concurrent presigning threads
+DEFAULT_WORKERS = 8
+
+# Farms per tile-record query; one query over every farm's tiles would
+# exceed Convex's per-query read limits
+FARMS_PER_QUERY = 10
+
 
 def load_env(env_path: str = ".env.local"):
     """Load environment variables from .env.local file."""
@@ -71,13 +98,13 @@ def create_r2_client():
         endpoint_url=f"https://{account_id}.r2.cloudflarestorage.com",
         aws_access_key_id=access_key,
         aws_secret_access_key=secret_key,
-        config=Config(signature_version="s3v4"),
+        config=Config(signature_version="s3v4", max_pool_connections=DEFAULT_WORKERS),
     )
 
 
-def list_r2_tiles(client, bucket: str, farm_id: str) -> list[dict]:
-    """List all tiles for a farm in R2."""
-    prefix = f"{farm_id}/"
+def list_r2_tiles(client, bucket: str, farm_id: Optional[str] = None) -> list[dict]:
+    """List all tiles for a farm in R2 (every farm if farm_id is None)."""
+    prefix = f"{farm_id}/" if farm_id else ""
     tiles = []
 
     paginator = client.get_paginator("list_objects_v2")
@@ -85,8 +112,9 @@ def list_r2_tiles(client, bucket: str, farm_id: str) -> list[dict]:
         for obj in page.get("Contents", []):
             key = obj["Key"]
             parts = key.split("/")
-            if len(parts) >= 5:
-                # Format: farm_id/year/month/date/type_resolution.ext
+            # Format: farm_id/year/month/date/type_resolution.ext
+            # (tile pyramids live deeper, under date/tiles/, and have no records)
+            if len(parts) == 5:
                 capture_date = parts[3]
                 filename = parts[4]
                 tile_type_res = filename.rsplit(".", 1)[0]  # e.g. "ndvi_heatmap_10m"
@@ -94,6 +122,7 @@ def list_r2_tiles(client, bucket: str, farm_id: str) -> list[dict]:
 
                 tiles.append(
                     {
+                        "farm_id": parts[0],
                         "r2_key": key,
                         "capture_date": capture_date,
                         "tile_type": tile_type,
@@ -124,7 +153,7 @@ def convex_query(deployment_url: str, api_key: str, path: str, args: dict):
     }
     payload = {"path": path, "args": args, "format": "json"}
 
-    response = requests.post(url, json=payload, headers=headers, timeout=30)
+    response = get_session().post(url, json=payload, headers=headers, timeout=30)
     response.raise_for_status()
     result = response.json()
 
@@ -143,7 +172,7 @@ def convex_mutation(deployment_url: str, api_key: str, path: str, args: dict):
     }
     payload = {"path": path, "args": args, "format": "json"}
 
-    response = requests.post(url, json=payload, headers=headers, timeout=30)
+    response = get_session().post(url, json=payload, headers=headers, timeout=30)
     response.raise_for_status()
     result = response.json()
 
@@ -153,14 +182,175 @@ def convex_mutation(deployment_url: str, api_key: str, path: str, args: dict):
     return result.get("value")
 
 
+def get_tile_refs(
+    deployment_url: str, api_key: str, farm_ids: list[str], farms_per_query: int = FARMS_PER_QUERY
+) -> list[dict]:
+    """
+    Get the tile records of many farms, querying a chunk of farms at a time.
+
+    Returns:
+        Tile refs (_id, farmExternalId, captureDate, tileType, r2Key, expiresAt)
+        of all farms, merged across chunks
+    """
+    farms_per_query = max(1, farms_per_query)
+    refs = []
+    for i in range(0, len(farm_ids), farms_per_query):
+        refs.extend(convex_query(
+            deployment_url,
+            api_key,
+            "satelliteTiles:getTileRefsForFarmsByExternalIds",
+            {"farmExternalIds": farm_ids[i : i + farms_per_query]},
+        ) or [])
+    return refs
+
+
+def dedupe_r2_tiles(r2_tiles: list[dict]) -> dict[str, dict]:
+    """Index R2 tiles by "farm:date:type", preferring .png over .tif when both exist."""
+    tile_map: dict[str, dict] = {}
+    for r2_tile in r2_tiles:
+        key = f"{r2_tile['farm_id']}:{r2_tile['capture_date']}:{r2_tile['tile_type']}"
+        existing = tile_map.get(key)
+        if existing:
+            # Prefer PNG over GeoTIFF (MapLibre can only display PNG/JPEG)
+            if r2_tile["r2_key"].endswith(".png"):
+                tile_map[key] = r2_tile
+        else:
+            tile_map[key] = r2_tile
+    return tile_map
+
+
+def write_url_updates(
+    deployment_url: str, api_key: str, updates: list[dict], batch_size: int
+) -> tuple[int, int]:
+    """
+    Write tile URL updates to Convex in batched mutations.
+
+    Returns:
+        (updated, errors) tile counts
+    """
+    updated = 0
+    errors = 0
+    batch_size = max(1, batch_size)
+
+    for i in range(0, len(updates), batch_size):
+        batch = updates[i : i + batch_size]
+        try:
+            result = convex_mutation(
+                deployment_url,
+                api_key,
+                "satelliteTiles:refreshTileUrlsBatch",
+                {"updates": batch},
+            )
+            updated += result.get("updated", 0)
+            errors += result.get("missing", 0)
+            logger.info(f"  Updated batch {i // batch_size + 1} ({len(batch)} tiles)")
+        except Exception as e:
+            logger.error(f"  Error updating batch {i // batch_size + 1}: {e}")
+            errors += len(batch)
+
+    return updated, errors
+
+
+def get_retention_expiry(client, bucket: str, key: str) -> tuple[bool, Optional[str]]:
+    """
+    Read an object's retention expiry (the expires_at metadata R2Storage writes).
+
+    Returns:
+        (found, expires_at); expires_at is None for objects kept indefinitely
+    """
+    try:
+        response = client.head_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        logger.warning(f"  Could not read {key}: {e}")
+        return False, None
+    return True, response.get("Metadata", {}).get("expires_at")
+
+
+def migrate_to_tile_server(
+    deployment_url: str,
+    api_key: str,
+    r2_client,
+    bucket: str,
+    farm_ids: list[str],
+    tile_server_url: str,
+    url_secret: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> None:
+    """
+    Point every tile record of the farms at {tile_server_url}/tiles/{r2_key}.
+
+    Re-signed records carry the presigned URL's 7-day expiry in expiresAt,
+    which deleteExpiredTiles would act on, so each record's expiresAt is
+    reset to its object's retention expiry (cleared when it has none).
+    Records whose object cannot be read keep their expiry. With url_secret
+    (TILE_URL_SECRET) each URL carries the ?sig= the tile server checks.
+    """
+    from storage.r2 import tile_url_signature
+
+    if not url_secret:
+        logger.warning("TILE_URL_SECRET not set; tile server URLs are unsigned")
+
+    base = f"{tile_server_url.rstrip('/')}/tiles"
+
+    existing_tiles = get_tile_refs(deployment_url, api_key, farm_ids)
+    logger.info(f"Rewriting {len(existing_tiles)} tile records of {len(farm_ids)} farms to {base}/...")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        retention = list(executor.map(
+            lambda tile: get_retention_expiry(r2_client, bucket, tile["r2Key"]),
+            existing_tiles,
+        ))
+
+    updates = []
+    for tile, (found, expires_at) in zip(existing_tiles, retention):
+        url = f"{base}/{tile['r2Key']}"
+        if url_secret:
+            url += f"?sig={tile_url_signature(url_secret, tile['r2Key'])}"
+        update = {"tileId": tile["_id"], "r2Url": url}
+        if found:
+            update["expiresAt"] = expires_at
+        updates.append(update)
+
+    updated, errors = write_url_updates(deployment_url, api_key, updates, batch_size)
+    logger.info(f"\nMigration complete: {updated} tiles updated, {errors} errors")
+
+
+def cleanup_demo_farms(deployment_url: str, api_key: str, enabled: bool) -> None:
+    """Cleanup demo farms so they pick up fresh URLs on next seed."""
+    if enabled:
+        logger.info("\nCleaning up demo farms...")
+        try:
+            result = convex_mutation(
+                deployment_url,
+                api_key,
+                "demo:forceCleanupAllDemoFarms",
+                {},
+            )
+            deleted = (
+                result.get("deletedCount", 0) if isinstance(result, dict) else result
+            )
+            logger.info(f"Cleaned up {deleted} demo farms")
+        except Exception as e:
+            logger.error(f"Error cleaning up demo farms: {e}")
+
+    logger.info("\nDone. New demo sessions will use fresh tile URLs.")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Refresh presigned R2 URLs for satellite tiles"
     )
     parser.add_argument(
         "--farm-id",
-        default="farm-1",
-        help="Farm external ID (default: farm-1)",
+        action="append",
+        dest="farm_ids",
+        help="Farm external ID, repeatable (default: farm-1)",
+    )
+    parser.add_argument(
+        "--all-farms",
+        action="store_true",
+        help="Refresh every farm with tiles in the bucket",
     )
     parser.add_argument(
         "--expiry-days",
@@ -168,6 +358,22 @@ def main():
         default=7,
         help="Presigned URL expiry in days (default: 7, max: 7 for R2/S3)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Concurrent presigning threads (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Tile updates per Convex mutation (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--tile-server-url",
+        help="Rewrite records to stable tile server URLs ({url}/tiles/{r2_key}) instead of re-signing",
+    )
     parser.add_argument(
         "--cleanup-demos",
         action="store_true",
@@ -182,6 +388,9 @@ def main():
     )
     args = parser.parse_args()
 
+    if not args.all_farms and not args.farm_ids:
+        args.farm_ids = ["farm-1"]
+
     # Load environment
     load_env()
 
@@ -204,120 +413,93 @@ def main():
     logger.info("Connecting to R2...")
     r2_client = create_r2_client()
 
-    # List tiles in R2 for the farm
-    logger.info(f"Listing tiles for {args.farm_id} in R2 bucket {bucket}...")
-    r2_tiles = list_r2_tiles(r2_client, bucket, args.farm_id)
-    logger.info(f"Found {len(r2_tiles)} tiles in R2")
+    # List tiles in R2 (one listing of the bucket for --all-farms)
+    if args.all_farms:
+        logger.info(f"Listing tiles for all farms in R2 bucket {bucket}...")
+        r2_tiles = list_r2_tiles(r2_client, bucket)
+        farm_ids = sorted({tile["farm_id"] for tile in r2_tiles})
+    else:
+        farm_ids = list(dict.fromkeys(args.farm_ids))
+        logger.info(f"Listing tiles for {', '.join(farm_ids)} in R2 bucket {bucket}...")
+        r2_tiles = [
+            tile for farm_id in farm_ids for tile in list_r2_tiles(r2_client, bucket, farm_id)
+        ]
+    logger.info(f"Found {len(r2_tiles)} tiles for {len(farm_ids)} farms in R2")
 
     if not r2_tiles:
         logger.warning("No tiles found in R2. Nothing to refresh.")
         return
 
-    # Get existing tile records from Convex
+    if args.tile_server_url:
+        migrate_to_tile_server(
+            deployment_url,
+            api_key,
+            r2_client,
+            bucket,
+            farm_ids,
+            args.tile_server_url,
+            url_secret=os.getenv("TILE_URL_SECRET"),
+            workers=args.workers,
+            batch_size=args.batch_size,
+        )
+        cleanup_demo_farms(deployment_url, api_key, args.cleanup_demos)
+        return
+
+    # Get existing tile records of the selected farms, a chunk of farms per query
     logger.info("Querying existing tile records from Convex...")
-    existing_tiles = convex_query(
-        deployment_url,
-        api_key,
-        "satelliteTiles:getTilesForFarmByExternalId",
-        {"farmExternalId": args.farm_id},
-    )
-    logger.info(f"Found {len(existing_tiles or [])} existing tile records in Convex")
+    existing_tiles = get_tile_refs(deployment_url, api_key, farm_ids)
+    logger.info(f"Found {len(existing_tiles)} existing tile records in Convex")
 
     # Build lookup of existing tiles
     existing_map = {}
-    for tile in existing_tiles or []:
-        key = f"{tile['captureDate']}:{tile['tileType']}"
+    for tile in existing_tiles:
+        key = f"{tile['farmExternalId']}:{tile['captureDate']}:{tile['tileType']}"
         existing_map[key] = tile
 
-    # Deduplicate R2 tiles: prefer .png over .tif when both exist
-    tile_map: dict[str, dict] = {}
-    for r2_tile in r2_tiles:
-        key = f"{r2_tile['capture_date']}:{r2_tile['tile_type']}"
-        existing = tile_map.get(key)
-        if existing:
-            # Prefer PNG over GeoTIFF (MapLibre can only display PNG/JPEG)
-            if r2_tile["r2_key"].endswith(".png"):
-                tile_map[key] = r2_tile
-        else:
-            tile_map[key] = r2_tile
-    r2_tiles_deduped = list(tile_map.values())
-    if len(r2_tiles_deduped) < len(r2_tiles):
+    tile_map = dedupe_r2_tiles(r2_tiles)
+    if len(tile_map) < len(r2_tiles):
         logger.info(
-            f"Deduplicated {len(r2_tiles)} -> {len(r2_tiles_deduped)} tiles "
+            f"Deduplicated {len(r2_tiles)} -> {len(tile_map)} tiles "
             "(preferring .png over .tif)"
         )
 
-    # Generate fresh presigned URLs and update Convex
-    expiry_seconds = args.expiry_days * 24 * 60 * 60
-    expires_at = (datetime.now() + timedelta(days=args.expiry_days)).isoformat()
-
-    updated = 0
-    skipped = 0
-    errors = 0
-
-    for r2_tile in r2_tiles_deduped:
-        key = f"{r2_tile['capture_date']}:{r2_tile['tile_type']}"
-
-        # Generate fresh presigned URL
-        presigned_url = generate_presigned_url(
-            r2_client, bucket, r2_tile["r2_key"], expiry_seconds
+    # Diff: only tiles with a Convex record can be refreshed
+    to_refresh = [(key, r2_tile) for key, r2_tile in tile_map.items() if key in existing_map]
+    skipped = len(tile_map) - len(to_refresh)
+    for key in tile_map.keys() - existing_map.keys():
+        logger.warning(
+            f"  No existing record for {key} - "
+            "skipping (run full pipeline to create with bounds)"
         )
 
-        existing = existing_map.get(key)
+    # Generate fresh presigned URLs concurrently
+    expiry_seconds = args.expiry_days * 24 * 60 * 60
+    expires_at = (datetime.now() + timedelta(days=args.expiry_days)).isoformat()
 
-        if existing:
-            # Update existing tile record
-            try:
-                convex_mutation(
-                    deployment_url,
-                    api_key,
-                    "satelliteTiles:refreshTileUrl",
-                    {
-                        "farmExternalId": args.farm_id,
-                        "captureDate": r2_tile["capture_date"],
-                        "tileType": r2_tile["tile_type"],
-                        "r2Url": presigned_url,
-                        "expiresAt": expires_at,
-                    },
-                )
-                updated += 1
-                logger.info(
-                    f"  Updated: {r2_tile['capture_date']}/{r2_tile['tile_type']}"
-                )
-            except Exception as e:
-                logger.error(f"  Error updating {key}: {e}")
-                errors += 1
-        else:
-            # No existing record - create one using createTileByExternalId
-            # Need bounds from the source farm. Query the farm geometry.
-            logger.warning(
-                f"  No existing record for {key} - "
-                "skipping (run full pipeline to create with bounds)"
-            )
-            skipped += 1
+    logger.info(f"Signing {len(to_refresh)} tile URLs with {args.workers} workers...")
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        presigned_urls = list(executor.map(
+            lambda item: generate_presigned_url(r2_client, bucket, item[1]["r2_key"], expiry_seconds),
+            to_refresh,
+        ))
+
+    updates = [
+        {
+            "tileId": existing_map[key]["_id"],
+            "r2Url": presigned_url,
+            "expiresAt": expires_at,
+        }
+        for (key, _), presigned_url in zip(to_refresh, presigned_urls)
+    ]
+
+    # Write updates to Convex in batches
+    updated, errors = write_url_updates(deployment_url, api_key, updates, args.batch_size)
 
     logger.info(
         f"\nRefresh complete: {updated} updated, {skipped} skipped, {errors} errors"
     )
 
-    # Cleanup demo farms so they pick up fresh URLs on next seed
-    if args.cleanup_demos:
-        logger.info("\nCleaning up demo farms...")
-        try:
-            result = convex_mutation(
-                deployment_url,
-                api_key,
-                "demo:forceCleanupAllDemoFarms",
-                {},
-            )
-            deleted = (
-                result.get("deletedCount", 0) if isinstance(result, dict) else result
-            )
-            logger.info(f"Cleaned up {deleted} demo farms")
-        except Exception as e:
-            logger.error(f"Error cleaning up demo farms: {e}")
-
-    logger.info("\nDone. New demo sessions will use fresh tile URLs.")
+    cleanup_demo_farms(deployment_url, api_key, args.cleanup_demos)
 
 
 if __name__ == "__main__":
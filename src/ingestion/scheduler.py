@@ -16,10 +16,12 @@ Usage:
     python scheduler.py --loop       # Run continuously (for Docker, default 4h interval)
 """
 import argparse
+import asyncio
 import logging
 import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Optional
 
@@ -30,9 +32,11 @@ try:
 except ImportError:
     pass
 
-from config import FarmConfig, create_farm_config_from_convex, load_env_config
+from async_convex import AsyncConvexClient, ConvexPrefetcher, FarmBundle
+from config import FarmConfig, PipelineConfig, create_farm_config_from_convex, load_env_config
+from job_pool import JobPool
 from pipeline import run_pipeline_for_farm
-from imagery_checker import check_new_imagery_available
+from imagery_checker import check_new_imagery_for_farms
 
 logging.basicConfig(
     level=logging.INFO,
@@ -43,7 +47,15 @@ logger = logging.getLogger(__name__)
 # Max processing time limits (in seconds)
 MAX_HOURLY_PROCESSING_TIME = 30 * 60  # 30 minutes
 MAX_DAILY_PROCESSING_TIME = 60 * 60   # 60 minutes
-JOB_TIMEOUT = 10 * 60  # 10 minutes per job
+JOB_TIMEOUT = int(os.environ.get("JOB_TIMEOUT_SECONDS", str(10 * 60)))  # 10 minutes per job
+JOB_MEMORY_LIMIT_MB = int(os.environ.get("JOB_MEMORY_LIMIT_MB", "4096"))  # RSS cap per job worker
+JOB_WORKER_MAX_JOBS = int(os.environ.get("JOB_WORKER_MAX_JOBS", "10"))  # Recycle workers after N jobs
+
+# Jobs processed concurrently (each is mostly waiting on provider and Convex I/O)
+DEFAULT_SCHEDULER_WORKERS = 4
+
+# Jobs beyond the running ones whose farm data is fetched ahead of time
+DEFAULT_SCHEDULER_PREFETCH = 4
 
 
 class Scheduler:
@@ -55,10 +67,45 @@ class Scheduler:
     - daily: Check for new imagery, then process all pending jobs
     """
 
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, isolate_jobs: Optional[bool] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            workers: Number of jobs processed concurrently
+                     (defaults to SCHEDULER_WORKERS env var, then 4)
+            isolate_jobs: Run each job in a worker process with JOB_TIMEOUT and
+                          JOB_MEMORY_LIMIT_MB enforced (defaults to
+                          JOB_PROCESS_ISOLATION env var, then True)
+        """
         self.convex = ConvexClient()
         self.pipeline_config = load_env_config()
         self.pipeline_config.write_to_convex = True
+        self.workers = max(1, workers or int(os.environ.get("SCHEDULER_WORKERS", str(DEFAULT_SCHEDULER_WORKERS))))
+        self.prefetch = int(os.environ.get("SCHEDULER_PREFETCH", str(DEFAULT_SCHEDULER_PREFETCH)))
+        self.async_convex = AsyncConvexClient(self.convex)
+        if isolate_jobs is None:
+            isolate_jobs = os.environ.get("JOB_PROCESS_ISOLATION", "true").lower() in ("true", "1", "yes")
+        self.isolate_jobs = isolate_jobs
+        self._job_pool: Optional[JobPool] = None
+
+    @property
+    def job_pool(self) -> JobPool:
+        """Worker processes for isolated jobs, started on first use."""
+        if self._job_pool is None:
+            self._job_pool = JobPool(
+                size=self.workers,
+                timeout=JOB_TIMEOUT,
+                memory_limit_mb=JOB_MEMORY_LIMIT_MB,
+                max_jobs_per_worker=JOB_WORKER_MAX_JOBS,
+            )
+        return self._job_pool
+
+    def close(self):
+        """Stop job worker processes."""
+        if self._job_pool is not None:
+            self._job_pool.close()
+            self._job_pool = None
 
     def run_hourly(self) -> int:
         """
@@ -233,25 +280,33 @@ class Scheduler:
         farms_to_check = self.convex.get_farms_needing_imagery_check()
         logger.info(f"Found {len(farms_to_check)} farms needing imagery check")
 
+        # Get farm geometries for the check (one query for all farms)
+        try:
+            geometries = self.convex.get_farm_geometries(
+                [farm_info['farmExternalId'] for farm_info in farms_to_check]
+            )
+        except Exception as e:
+            logger.error(f"  Error loading farm geometries: {e}")
+            return
+
+        farms = []
         for farm_info in farms_to_check:
             farm_id = farm_info['farmExternalId']
-            last_date = farm_info.get('lastNewImageryDate')
-
-            try:
-                logger.info(f"Checking imagery for farm {farm_id}...")
+            if farm_id not in geometries:
+                logger.warning(f"  Farm {farm_id} not found, skipping")
+                continue
 
-                # Get farm geometry for the check
-                farm_data = self.convex.get_farm(farm_id)
-                if not farm_data:
-                    logger.warning(f"  Farm {farm_id} not found, skipping")
-                    continue
+            farms.append({
+                'farmExternalId': farm_id,
+                'geometry': geometries[farm_id],
+                'lastNewImageryDate': farm_info.get('lastNewImageryDate'),
+            })
 
-                # Check for new imagery
-                has_new, latest_date = check_new_imagery_available(
-                    farm_geometry=farm_data.get('geometry', {}),
-                    last_known_date=last_date,
-                )
+        # Check for new imagery (one catalog query per group of nearby farms)
+        results = check_new_imagery_for_farms(farms)
 
+        for farm_id, (has_new, latest_date) in results.items():
+            try:
                 # Update check timestamp
                 check_time = datetime.utcnow().isoformat()
                 self.convex.update_imagery_check_time(
@@ -268,12 +323,21 @@ class Scheduler:
                     logger.info(f"  No new imagery for {farm_id}")
 
             except Exception as e:
-                logger.error(f"  Error checking imagery for {farm_id}: {e}")
+                logger.error(f"  Error recording imagery check for {farm_id}: {e}")
                 continue
 
     def _process_jobs(self, jobs: list[dict], start_time: float, max_time: float) -> int:
         """
-        Process a list of jobs with timeout protection.
+        Process a list of jobs concurrently with timeout protection.
+
+        Up to self.workers jobs run at once. Each job is claimed with the
+        atomic claim_job mutation right before it runs, so jobs already taken
+        by another scheduler replica are skipped. No new job is claimed once
+        max_time has elapsed; jobs already running are allowed to finish.
+
+        Farm, paddock and settings data for the running jobs and the next
+        self.prefetch jobs is fetched concurrently in the background, so a
+        job only waits on its claim_job call before the pipeline starts.
 
         Args:
             jobs: List of job documents
@@ -283,15 +347,14 @@ class Scheduler:
         Returns:
             Number of jobs successfully processed
         """
-        processed = 0
+        if not jobs:
+            return 0
 
-        for job in jobs:
+        def run(job: dict) -> Optional[bool]:
             # Check if we've exceeded max processing time
             elapsed = time.time() - start_time
             if elapsed >= max_time:
-                logger.warning(f"Reached max processing time ({elapsed:.0f}s), stopping job processing")
-                logger.info(f"Remaining jobs: {len(jobs) - processed}")
-                break
+                return None
 
             job_id = job['_id']
 
@@ -299,19 +362,62 @@ class Scheduler:
             claimed = self.convex.claim_job(job_id)
             if not claimed:
                 logger.warning(f"Job {job_id} already claimed, skipping")
-                continue
+                prefetcher.discard(job['farmExternalId'])
+                return False
 
-            if self._process_single_job(claimed):
-                processed += 1
+            try:
+                bundle = prefetcher.get(claimed['farmExternalId'])
+            except Exception as e:
+                logger.warning(f"Prefetch failed for job {job_id}, fetching in job: {e}")
+                bundle = None
+
+            return self._process_single_job(claimed, bundle=bundle)
+
+        workers = min(self.workers, len(jobs))
+        logger.info(f"Processing {len(jobs)} jobs with {workers} workers")
+
+        processed = 0
+        skipped = 0
+
+        prefetcher = ConvexPrefetcher(
+            self.async_convex,
+            [job['farmExternalId'] for job in jobs],
+            lookahead=workers + self.prefetch,
+        )
+
+        with prefetcher, ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job") as executor:
+            futures = [executor.submit(run, job) for job in jobs]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Job worker failed: {e}", exc_info=True)
+                    continue
+
+                if result is None:
+                    skipped += 1
+                elif result:
+                    processed += 1
+
+        if skipped:
+            elapsed = time.time() - start_time
+            logger.warning(f"Reached max processing time ({elapsed:.0f}s), stopping job processing")
+            logger.info(f"Remaining jobs: {skipped}")
 
         return processed
 
-    def _process_single_job(self, job: dict) -> bool:
+    def _process_single_job(self, job: dict, bundle: Optional[FarmBundle] = None) -> bool:
         """
         Process a single claimed job.
 
+        The pipeline runs in a job worker process (unless isolation is
+        disabled); the job is completed from here, so a worker that is
+        killed for exceeding JOB_TIMEOUT or JOB_MEMORY_LIMIT_MB still gets
+        its job marked as failed.
+
         Args:
             job: Claimed job document
+            bundle: Prefetched farm, paddocks and settings (fetched here if None)
 
         Returns:
             True if successful
@@ -326,33 +432,10 @@ class Scheduler:
         logger.info(f"  Provider: {provider}, Triggered by: {triggered_by}")
 
         try:
-            # Fetch farm data from Convex
-            farm_data = self.convex.get_farm(farm_id)
-            if not farm_data:
-                raise ValueError(f"Farm {farm_id} not found")
-
-            # Fetch paddocks
-            paddocks_data = self.convex.get_paddocks(farm_id)
-
-            # Fetch settings
-            settings_data = self.convex.get_settings(farm_id)
-
-            # Create farm config
-            farm_config = create_farm_config_from_convex(
-                farm_data=farm_data,
-                settings_data=settings_data,
-                paddocks_data=paddocks_data,
-            )
-
-            logger.info(f"  Farm: {farm_config.name}")
-            logger.info(f"  Paddocks: {len(farm_config.paddocks)}")
-            logger.info(f"  Tier: {farm_config.subscription_tier}")
-
-            # Run the pipeline
-            result = run_pipeline_for_farm(
-                farm_config=farm_config,
-                pipeline_config=self.pipeline_config,
-            )
+            if self.isolate_jobs:
+                result = self.job_pool.run(execute_job, job, self.pipeline_config, bundle)
+            else:
+                result = execute_job(job, self.pipeline_config, bundle, self.convex)
 
             # Complete the job - success only if we got valid observations
             valid_count = result.get('valid_observations', 0)
@@ -369,7 +452,7 @@ class Scheduler:
 
         except Exception as e:
             job_elapsed = time.time() - job_start
-            logger.error(f"  Job failed after {job_elapsed:.1f}s: {e}", exc_info=True)
+            logger.error(f"  Job failed after {job_elapsed:.1f}s: {e}", exc_info=not self.isolate_jobs)
 
             # Complete the job as failed
             self.convex.complete_job(
@@ -381,6 +464,59 @@ class Scheduler:
             return False
 
 
+def execute_job(
+    job: dict,
+    pipeline_config: PipelineConfig,
+    bundle: Optional[FarmBundle] = None,
+    convex: Optional['ConvexClient'] = None,
+) -> dict:
+    """
+    Run the pipeline for a job's farm.
+
+    Runs inside a job worker process, so it takes and returns plain data.
+
+    Args:
+        job: Claimed job document
+        pipeline_config: Pipeline configuration
+        bundle: Prefetched farm, paddocks and settings (fetched here if None)
+        convex: Convex client (a new one is created in worker processes)
+
+    Returns:
+        Dict with valid_observations and observation_date
+    """
+    farm_id = job['farmExternalId']
+
+    if bundle is None:
+        # Fetch farm, paddocks and settings concurrently
+        bundle = asyncio.run(AsyncConvexClient(convex or ConvexClient()).get_farm_bundle(farm_id))
+
+    farm_data = bundle['farm']
+    if not farm_data:
+        raise ValueError(f"Farm {farm_id} not found")
+
+    # Create farm config
+    farm_config = create_farm_config_from_convex(
+        farm_data=farm_data,
+        settings_data=bundle['settings'],
+        paddocks_data=bundle['paddocks'],
+    )
+
+    logger.info(f"  Farm: {farm_config.name}")
+    logger.info(f"  Paddocks: {len(farm_config.paddocks)}")
+    logger.info(f"  Tier: {farm_config.subscription_tier}")
+
+    # Run the pipeline
+    result = run_pipeline_for_farm(
+        farm_config=farm_config,
+        pipeline_config=pipeline_config,
+    )
+
+    return {
+        "valid_observations": result.get('valid_observations', 0),
+        "observation_date": result.get('observation_date'),
+    }
+
+
 class ConvexClient:
     """HTTP client for Convex queries and mutations."""
 
@@ -397,7 +533,7 @@ class ConvexClient:
 
     def _query(self, function_name: str, args: dict = None) -> any:
         """Execute a Convex query."""
-        import requests
+        from http_session import get_session
 
         url = f"{self.deployment_url}/api/query"
         headers = {
@@ -410,7 +546,7 @@ class ConvexClient:
             "format": "json",
         }
 
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        response = get_session().post(url, json=payload, headers=headers, timeout=30)
         response.raise_for_status()
 
         result = response.json()
@@ -421,7 +557,7 @@ class ConvexClient:
 
     def _mutation(self, function_name: str, args: dict = None) -> any:
         """Execute a Convex mutation."""
-        import requests
+        from http_session import get_session
 
         url = f"{self.deployment_url}/api/mutation"
         headers = {
@@ -434,7 +570,7 @@ class ConvexClient:
             "format": "json",
         }
 
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        response = get_session().post(url, json=payload, headers=headers, timeout=30)
         response.raise_for_status()
 
         result = response.json()
@@ -516,6 +652,13 @@ class ConvexClient:
         """Get farm by external ID."""
         return self._query("farms:getByExternalId", {"externalId": external_id})
 
+    def get_farm_geometries(self, external_ids: list[str]) -> dict[str, dict]:
+        """Get the boundaries of several farms in one query; unknown IDs are omitted."""
+        if not external_ids:
+            return {}
+        rows = self._query("farms:getGeometriesByExternalIds", {"externalIds": external_ids}) or []
+        return {row["externalId"]: row.get("geometry") or {} for row in rows}
+
     def get_paddocks(self, farm_external_id: str) -> list[dict]:
         """Get paddocks (pastures) for a farm by external ID."""
         return self._query("paddocks:listPasturesByFarm", {"farmId": farm_external_id}) or []
@@ -568,6 +711,7 @@ Examples:
 
     args = parser.parse_args()
 
+    scheduler = None
     try:
         scheduler = Scheduler()
 
@@ -597,6 +741,9 @@ Examples:
     except Exception as e:
         logger.error(f"Scheduler failed: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        if scheduler is not None:
+            scheduler.close()
 
 
 if __name__ == "__main__":
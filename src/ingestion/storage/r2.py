@@ -4,18 +4,76 @@ Cloudflare R2 storage integration for satellite imagery tiles.
 Provides S3-compatible storage operations for GeoTIFF tiles with
 signed URL generation and retention management.
 """
+import hashlib
+import hmac
 import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import BinaryIO, TypedDict
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
+from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+# Tiles above the threshold (large COGs) are uploaded as concurrent multipart parts
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MULTIPART_CONCURRENCY = 4
+
+# Tiles uploaded at once by upload_tiles
+UPLOAD_WORKERS = 4
+
+# Object metadata key holding the SHA-256 of the uploaded bytes
+CONTENT_HASH_METADATA = "sha256"
+
+# Pyramid tile keys {prefix}/{z}/{x}/{y}.png share one signature over {prefix}
+PYRAMID_TILE_KEY = re.compile(r"(.+/tiles/[a-z0-9_]+)/\d+/\d+/\d+\.png")
+
+# Hex characters of the HMAC-SHA256 kept in tile server URLs (128 bits)
+TILE_SIGNATURE_LENGTH = 32
+
+
+def tile_url_scope(r2_key: str) -> str:
+    """
+    Get the part of a tile key covered by its tile server URL signature.
+
+    A pyramid's URL template is signed once for its prefix, so every
+    {z}/{x}/{y} tile under it is covered; other tiles sign their own key.
+    """
+    match = PYRAMID_TILE_KEY.fullmatch(r2_key)
+    return match.group(1) if match else r2_key
+
+
+def tile_url_signature(secret: str, scope: str) -> str:
+    """
+    Sign a tile key (or pyramid prefix) for a stable tile server URL.
+
+    Args:
+        secret: TILE_URL_SECRET shared with tile_server.py
+        scope: R2 key, or pyramid prefix from tile_url_scope()
+
+    Returns:
+        Truncated hex HMAC-SHA256, sent as the sig query parameter
+    """
+    digest = hmac.new(secret.encode(), scope.encode(), hashlib.sha256).hexdigest()
+    return digest[:TILE_SIGNATURE_LENGTH]
+
+
+def _file_sha256(path: Path) -> str:
+    """Hash a file in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class TileUploadResult(TypedDict):
     """Result of uploading a tile to R2."""
@@ -25,6 +83,15 @@ class TileUploadResult(TypedDict):
     expires_at: str | None
 
 
+class PyramidUploadResult(TypedDict):
+    """Result of uploading an XYZ tile pyramid to R2."""
+    r2_prefix: str
+    url_template: str  # {z}/{x}/{y} placeholders for MapLibre raster sources
+    tile_count: int
+    total_size_bytes: int
+    expires_at: str | None
+
+
 @dataclass
 class R2Config:
     """Configuration for R2 storage."""
@@ -33,6 +100,10 @@ class R2Config:
     secret_access_key: str
     bucket_name: str
     public_url_base: str | None = None
+    # tile_server.py base URL; tile records get stable {base}/tiles/{key} URLs
+    tile_server_url: str | None = None
+    # Secret shared with tile_server.py; stable URLs carry ?sig={HMAC of the key}
+    tile_url_secret: str | None = None
 
     @classmethod
     def from_env(cls) -> "R2Config":
@@ -42,6 +113,8 @@ class R2Config:
         secret_access_key = os.getenv("R2_SECRET_ACCESS_KEY")
         bucket_name = os.getenv("R2_BUCKET_NAME", "grazing-satellite-tiles")
         public_url_base = os.getenv("R2_PUBLIC_URL_BASE")
+        tile_server_url = os.getenv("TILE_SERVER_URL")
+        tile_url_secret = os.getenv("TILE_URL_SECRET")
 
         if not all([account_id, access_key_id, secret_access_key]):
             raise ValueError(
@@ -55,6 +128,8 @@ class R2Config:
             secret_access_key=secret_access_key,
             bucket_name=bucket_name,
             public_url_base=public_url_base,
+            tile_server_url=tile_server_url.rstrip("/") if tile_server_url else None,
+            tile_url_secret=tile_url_secret or None,
         )
 
 
@@ -74,6 +149,8 @@ class R2Storage:
                   ndvi_10m.tif
                   evi_10m.tif
                   ndwi_10m.tif
+                  tiles/
+                    {tile_type}/{z}/{x}/{y}.png
     """
 
     def __init__(self, config: R2Config | None = None):
@@ -94,8 +171,15 @@ class R2Storage:
             config=Config(
                 signature_version="s3v4",
                 retries={"max_attempts": 3, "mode": "adaptive"},
+                # Concurrent tile uploads x multipart parts per upload
+                max_pool_connections=UPLOAD_WORKERS * MULTIPART_CONCURRENCY,
             ),
         )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MULTIPART_CONCURRENCY,
+        )
 
     def _get_tile_key(
         self,
@@ -125,91 +209,138 @@ class R2Storage:
 
         return f"{farm_external_id}/{year}/{month}/{capture_date}/{tile_type}_{resolution_meters}m.{file_extension}"
 
-    def upload_tile(
+    def _get_pyramid_prefix(
         self,
-        file_path: str | Path,
         farm_external_id: str,
         capture_date: str,
         tile_type: str,
-        resolution_meters: int,
-        retention_days: int | None = None,
-    ) -> TileUploadResult:
+    ) -> str:
         """
-        Upload a tile image to R2.
-
-        Supports both PNG (for RGB tiles) and GeoTIFF (for index tiles).
+        Generate the R2 key prefix for a tile pyramid.
 
         Args:
-            file_path: Path to the local image file (PNG or GeoTIFF)
             farm_external_id: Farm identifier
             capture_date: Capture date YYYY-MM-DD
-            tile_type: Type of tile (rgb, ndvi, evi, ndwi)
-            resolution_meters: Resolution in meters
-            retention_days: Optional retention period (for lifecycle management)
+            tile_type: Type of tile (rgb, ndvi_heatmap)
 
         Returns:
-            TileUploadResult with R2 key, URL, and metadata
+            Prefix under which {z}/{x}/{y}.png keys are stored
         """
-        file_path = Path(file_path)
+        dt = datetime.strptime(capture_date, "%Y-%m-%d")
+        return f"{farm_external_id}/{dt.strftime('%Y')}/{dt.strftime('%m')}/{capture_date}/tiles/{tile_type}"
 
-        if not file_path.exists():
-            raise FileNotFoundError(f"Tile file not found: {file_path}")
+    def _find_identical(self, r2_key: str, content_hash: str) -> dict | None:
+        """
+        Get an existing object's head if it holds the same content.
 
-        # Detect file type and set appropriate content type
-        file_extension = file_path.suffix.lower().lstrip('.')
-        if file_extension == 'png':
-            content_type = "image/png"
-        elif file_extension in ('tif', 'tiff'):
-            content_type = "image/tiff"
-            file_extension = "tif"
-        else:
-            content_type = "application/octet-stream"
+        Args:
+            r2_key: R2 object key
+            content_hash: SHA-256 of the bytes about to be uploaded
+
+        Returns:
+            head_object response, or None if missing or different
+        """
+        try:
+            head = self._client.head_object(Bucket=self.config.bucket_name, Key=r2_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                logger.warning(f"Could not check existing tile {r2_key}: {e}")
+            return None
+
+        if head.get("Metadata", {}).get(CONTENT_HASH_METADATA) != content_hash:
+            return None
+        return head
 
+    def _get_tile_url(self, r2_key: str) -> str:
+        """
+        Get the URL stored in a tile record.
+
+        Prefers the public bucket URL, then a stable tile server URL, and
+        falls back to a 7-day presigned URL (which must be refreshed).
+        """
+        if self.config.public_url_base:
+            return f"{self.config.public_url_base}/{r2_key}"
+        if self.config.tile_server_url:
+            return f"{self.config.tile_server_url}/tiles/{r2_key}{self._tile_url_query(r2_key)}"
+
+        # Generate presigned URL valid for 7 days
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.config.bucket_name, "Key": r2_key},
+            ExpiresIn=7 * 24 * 60 * 60,  # 7 days
+        )
+
+    def _tile_url_query(self, scope: str) -> str:
+        """Query string signing a tile server URL, empty without TILE_URL_SECRET."""
+        if not self.config.tile_url_secret:
+            return ""
+        return f"?sig={tile_url_signature(self.config.tile_url_secret, scope)}"
+
+    def _content_type(self, file_extension: str) -> str:
+        """Get the content type for a tile file extension."""
+        if file_extension == "png":
+            return "image/png"
+        if file_extension == "tif":
+            return "image/tiff"
+        return "application/octet-stream"
+
+    def _upload_object(
+        self,
+        fileobj: BinaryIO,
+        file_size: int,
+        content_hash: str,
+        file_extension: str,
+        farm_external_id: str,
+        capture_date: str,
+        tile_type: str,
+        resolution_meters: int,
+        retention_days: int | None,
+        skip_unchanged: bool,
+    ) -> TileUploadResult:
+        """Upload a tile stream (shared by upload_tile and upload_tile_bytes)."""
         r2_key = self._get_tile_key(
             farm_external_id, capture_date, tile_type, resolution_meters, file_extension
         )
 
-        file_size = file_path.stat().st_size
-
-        logger.info(f"Uploading tile to R2: {r2_key} ({file_size / 1024 / 1024:.2f} MB)")
+        existing = self._find_identical(r2_key, content_hash) if skip_unchanged else None
 
         # Calculate expiration if retention specified
         expires_at = None
         extra_args = {
-            "ContentType": content_type,
+            "ContentType": self._content_type(file_extension),
             "Metadata": {
                 "farm_external_id": farm_external_id,
                 "capture_date": capture_date,
                 "tile_type": tile_type,
                 "resolution_meters": str(resolution_meters),
+                CONTENT_HASH_METADATA: content_hash,
             },
         }
 
-        if retention_days:
-            expires_at = (datetime.now() + timedelta(days=retention_days)).isoformat()
-            extra_args["Metadata"]["expires_at"] = expires_at
+        if existing is not None:
+            # Keep reporting the expiry stored with the object
+            expires_at = existing.get("Metadata", {}).get("expires_at")
+            logger.info(f"Tile unchanged in R2, skipping upload: {r2_key}")
+        else:
+            logger.info(f"Uploading tile to R2: {r2_key} ({file_size / 1024 / 1024:.2f} MB)")
 
-        # Upload file
-        with open(file_path, "rb") as f:
+            if retention_days:
+                expires_at = (datetime.now() + timedelta(days=retention_days)).isoformat()
+                extra_args["Metadata"]["expires_at"] = expires_at
+
+            # Multipart above MULTIPART_THRESHOLD
             self._client.upload_fileobj(
-                f,
+                fileobj,
                 self.config.bucket_name,
                 r2_key,
                 ExtraArgs=extra_args,
+                Config=self._transfer_config,
             )
 
-        # Generate URL
-        if self.config.public_url_base:
-            r2_url = f"{self.config.public_url_base}/{r2_key}"
-        else:
-            # Generate presigned URL valid for 7 days
-            r2_url = self._client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": self.config.bucket_name, "Key": r2_key},
-                ExpiresIn=7 * 24 * 60 * 60,  # 7 days
-            )
+        r2_url = self._get_tile_url(r2_key)
 
-        logger.info(f"Uploaded tile successfully: {r2_key}")
+        if existing is None:
+            logger.info(f"Uploaded tile successfully: {r2_key}")
 
         return TileUploadResult(
             r2_key=r2_key,
@@ -218,6 +349,121 @@ class R2Storage:
             expires_at=expires_at,
         )
 
+    def upload_tile(
+        self,
+        file_path: str | Path,
+        farm_external_id: str,
+        capture_date: str,
+        tile_type: str,
+        resolution_meters: int,
+        retention_days: int | None = None,
+        skip_unchanged: bool = True,
+    ) -> TileUploadResult:
+        """
+        Upload a tile image to R2.
+
+        Supports both PNG (for RGB tiles) and GeoTIFF (for index tiles).
+
+        Uploads are keyed by content hash: the SHA-256 of the file is stored
+        in the object metadata, and when the object at the tile's key already
+        has the same hash (e.g. a manual refresh regenerated an unchanged
+        capture) the upload is skipped after a single HEAD request.
+
+        Args:
+            file_path: Path to the local image file (PNG or GeoTIFF)
+            farm_external_id: Farm identifier
+            capture_date: Capture date YYYY-MM-DD
+            tile_type: Type of tile (rgb, ndvi, evi, ndwi)
+            resolution_meters: Resolution in meters
+            retention_days: Optional retention period (for lifecycle management)
+            skip_unchanged: Skip the upload if R2 already holds identical bytes
+
+        Returns:
+            TileUploadResult with R2 key, URL, and metadata
+        """
+        file_path = Path(file_path)
+
+        if not file_path.exists():
+            raise FileNotFoundError(f"Tile file not found: {file_path}")
+
+        # Detect file type from the extension
+        file_extension = file_path.suffix.lower().lstrip('.')
+        if file_extension == 'tiff':
+            file_extension = "tif"
+
+        with open(file_path, "rb") as f:
+            return self._upload_object(
+                f,
+                file_size=file_path.stat().st_size,
+                content_hash=_file_sha256(file_path),
+                file_extension=file_extension,
+                farm_external_id=farm_external_id,
+                capture_date=capture_date,
+                tile_type=tile_type,
+                resolution_meters=resolution_meters,
+                retention_days=retention_days,
+                skip_unchanged=skip_unchanged,
+            )
+
+    def upload_tiles(
+        self,
+        tiles: dict[str, str | Path | dict],
+        farm_external_id: str,
+        capture_date: str,
+        resolution_meters: int,
+        retention_days: int | None = None,
+        workers: int = UPLOAD_WORKERS,
+    ) -> dict[str, TileUploadResult]:
+        """
+        Upload all tiles of a capture concurrently.
+
+        Each tile goes through upload_tile or upload_tile_bytes, so large
+        COGs are split into concurrent multipart parts as well.
+
+        Args:
+            tiles: By tile type, a local file path or an in-memory tile
+                   ({"data": bytes, "file_extension": "png" | "tif"},
+                   pipeline.EncodedTile)
+            farm_external_id: Farm identifier
+            capture_date: Capture date YYYY-MM-DD
+            resolution_meters: Resolution in meters
+            retention_days: Optional retention period (for lifecycle management)
+            workers: Tiles uploaded at once
+
+        Returns:
+            TileUploadResult by tile type, in the order of tiles
+
+        Raises:
+            Exception: The first upload error, after the other uploads finish
+        """
+        def upload(tile_type: str, tile: str | Path | dict) -> TileUploadResult:
+            if isinstance(tile, dict):
+                return self.upload_tile_bytes(
+                    tile["data"],
+                    farm_external_id=farm_external_id,
+                    capture_date=capture_date,
+                    tile_type=tile_type,
+                    resolution_meters=resolution_meters,
+                    retention_days=retention_days,
+                    file_extension=tile["file_extension"],
+                )
+            return self.upload_tile(
+                file_path=tile,
+                farm_external_id=farm_external_id,
+                capture_date=capture_date,
+                tile_type=tile_type,
+                resolution_meters=resolution_meters,
+                retention_days=retention_days,
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                tile_type: executor.submit(upload, tile_type, tile)
+                for tile_type, tile in tiles.items()
+            }
+
+        return {tile_type: future.result() for tile_type, future in futures.items()}
+
     def upload_tile_bytes(
         self,
         data: bytes | BinaryIO,
@@ -226,10 +472,15 @@ class R2Storage:
         tile_type: str,
         resolution_meters: int,
         retention_days: int | None = None,
+        file_extension: str = "tif",
+        skip_unchanged: bool = True,
     ) -> TileUploadResult:
         """
         Upload tile data directly from bytes or file-like object.
 
+        Used for tiles encoded in memory, so nothing is written to or read
+        back from local disk. Deduplicated by content hash like upload_tile.
+
         Args:
             data: Tile data as bytes or file-like object
             farm_external_id: Farm identifier
@@ -237,65 +488,140 @@ class R2Storage:
             tile_type: Type of tile (rgb, ndvi, evi, ndwi)
             resolution_meters: Resolution in meters
             retention_days: Optional retention period
+            file_extension: File extension (tif, png)
+            skip_unchanged: Skip the upload if R2 already holds identical bytes
 
         Returns:
             TileUploadResult with R2 key, URL, and metadata
         """
         from io import BytesIO
 
-        r2_key = self._get_tile_key(
-            farm_external_id, capture_date, tile_type, resolution_meters
+        # Convert to bytes so the content can be hashed before uploading
+        if not isinstance(data, bytes):
+            data.seek(0)
+            data = data.read()
+
+        return self._upload_object(
+            BytesIO(data),
+            file_size=len(data),
+            content_hash=hashlib.sha256(data).hexdigest(),
+            file_extension=file_extension,
+            farm_external_id=farm_external_id,
+            capture_date=capture_date,
+            tile_type=tile_type,
+            resolution_meters=resolution_meters,
+            retention_days=retention_days,
+            skip_unchanged=skip_unchanged,
         )
 
-        # Convert bytes to file-like object if needed
-        if isinstance(data, bytes):
-            file_size = len(data)
-            data = BytesIO(data)
+    def upload_pyramid(
+        self,
+        tiles: str | Path | dict[str, bytes],
+        farm_external_id: str,
+        capture_date: str,
+        tile_type: str,
+        retention_days: int | None = None,
+        workers: int = 8,
+        skip_unchanged: bool = True,
+    ) -> PyramidUploadResult:
+        """
+        Upload a {z}/{x}/{y}.png tile pyramid to R2.
+
+        Tiles are small, so they are uploaded concurrently with put_object
+        rather than one managed transfer at a time. Existing tiles are listed
+        once, and tiles whose ETag (the MD5 of a single-part upload) matches
+        the local file are not uploaded again.
+
+        Args:
+            tiles: Encoded tiles by "{z}/{x}/{y}.png" path (tile_pyramid.generate_pyramid),
+                   or a directory containing them
+            farm_external_id: Farm identifier
+            capture_date: Capture date YYYY-MM-DD
+            tile_type: Type of tile (rgb, ndvi_heatmap)
+            retention_days: Optional retention period (for lifecycle management)
+            workers: Concurrent uploads
+            skip_unchanged: Skip tiles R2 already holds with identical bytes
+
+        Returns:
+            PyramidUploadResult with the key prefix and XYZ URL template
+        """
+        if isinstance(tiles, dict):
+            sources: dict[str, bytes | Path] = dict(tiles)
         else:
-            # Get size from file-like object
-            data.seek(0, 2)
-            file_size = data.tell()
-            data.seek(0)
+            directory = Path(tiles)
+            if not directory.is_dir():
+                raise FileNotFoundError(f"Tile pyramid not found: {directory}")
+            sources = {
+                path.relative_to(directory).as_posix(): path
+                for path in sorted(directory.glob("*/*/*.png"))
+            }
 
-        logger.info(f"Uploading tile to R2: {r2_key} ({file_size / 1024 / 1024:.2f} MB)")
+        prefix = self._get_pyramid_prefix(farm_external_id, capture_date, tile_type)
 
-        # Calculate expiration if retention specified
         expires_at = None
-        extra_args = {
-            "ContentType": "image/tiff",
-            "Metadata": {
-                "farm_external_id": farm_external_id,
-                "capture_date": capture_date,
-                "tile_type": tile_type,
-                "resolution_meters": str(resolution_meters),
-            },
+        metadata = {
+            "farm_external_id": farm_external_id,
+            "capture_date": capture_date,
+            "tile_type": tile_type,
         }
-
         if retention_days:
             expires_at = (datetime.now() + timedelta(days=retention_days)).isoformat()
-            extra_args["Metadata"]["expires_at"] = expires_at
+            metadata["expires_at"] = expires_at
 
-        self._client.upload_fileobj(
-            data,
-            self.config.bucket_name,
-            r2_key,
-            ExtraArgs=extra_args,
-        )
+        existing_etags: dict[str, str] = {}
+        if skip_unchanged:
+            paginator = self._client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.config.bucket_name, Prefix=f"{prefix}/"):
+                for obj in page.get("Contents", []):
+                    existing_etags[obj["Key"]] = obj["ETag"].strip('"')
+
+        logger.info(f"Uploading {len(sources)} pyramid tiles to R2: {prefix}/")
+
+        def upload(item: tuple[str, bytes | Path]) -> tuple[int, bool]:
+            relative_path, source = item
+            body = source if isinstance(source, bytes) else source.read_bytes()
+            key = f"{prefix}/{relative_path}"
+            if existing_etags.get(key) == hashlib.md5(body).hexdigest():
+                return len(body), False
+
+            self._client.put_object(
+                Bucket=self.config.bucket_name,
+                Key=key,
+                Body=body,
+                ContentType="image/png",
+                Metadata=metadata,
+            )
+            return len(body), True
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(upload, sources.items()))
+
+        total_size = sum(size for size, _ in results)
+        uploaded = sum(1 for _, was_uploaded in results if was_uploaded)
+        if uploaded < len(results):
+            logger.info(f"  {len(results) - uploaded} pyramid tiles unchanged in R2, skipped")
 
-        # Generate URL
         if self.config.public_url_base:
-            r2_url = f"{self.config.public_url_base}/{r2_key}"
+            url_template = f"{self.config.public_url_base}/{prefix}/{{z}}/{{x}}/{{y}}.png"
+        elif self.config.tile_server_url:
+            url_template = (
+                f"{self.config.tile_server_url}/tiles/{prefix}/{{z}}/{{x}}/{{y}}.png"
+                f"{self._tile_url_query(prefix)}"
+            )
         else:
-            r2_url = self._client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": self.config.bucket_name, "Key": r2_key},
-                ExpiresIn=7 * 24 * 60 * 60,
+            # Presigned URLs are per object, so pyramids need a public bucket or the tile server
+            url_template = f"{prefix}/{{z}}/{{x}}/{{y}}.png"
+            logger.warning(
+                "Neither R2_PUBLIC_URL_BASE nor TILE_SERVER_URL set; pyramid URL template is a bare key prefix"
             )
 
-        return TileUploadResult(
-            r2_key=r2_key,
-            r2_url=r2_url,
-            file_size_bytes=file_size,
+        logger.info(f"Uploaded tile pyramid successfully: {prefix}/ ({total_size / 1024 / 1024:.2f} MB)")
+
+        return PyramidUploadResult(
+            r2_prefix=prefix,
+            url_template=url_template,
+            tile_count=len(sources),
+            total_size_bytes=total_size,
             expires_at=expires_at,
         )
 
@@ -323,6 +649,34 @@ class R2Storage:
             ExpiresIn=expires_in_seconds,
         )
 
+    def get_tile_object(
+        self,
+        r2_key: str,
+        byte_range: str | None = None,
+        head: bool = False,
+    ) -> dict:
+        """
+        Fetch a tile object (or its headers) for streaming.
+
+        Args:
+            r2_key: R2 object key
+            byte_range: HTTP Range header value passed through to R2
+            head: Only fetch headers
+
+        Returns:
+            get_object/head_object response; "Body" is a streaming body unless head
+
+        Raises:
+            botocore.exceptions.ClientError: If the object is missing or the range is invalid
+        """
+        params = {"Bucket": self.config.bucket_name, "Key": r2_key}
+        if byte_range:
+            params["Range"] = byte_range
+
+        if head:
+            return self._client.head_object(**params)
+        return self._client.get_object(**params)
+
     def delete_tile(self, r2_key: str) -> bool:
         """
         Delete a tile from R2.
@@ -0,0 +1,198 @@
+"""
+Web-mercator XYZ tile pyramids for map layers.
+
+A single full-resolution PNG per layer forces the map to download and decode
+the whole image on every pan, which gets slow for large stations. This module
+cuts an RGBA layer into 256 px z/x/y tiles covering only the farm's bbox for
+a range of zoom levels, so the frontend loads just the tiles in view.
+"""
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, TypedDict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+
+# Half the circumference of the EPSG:3857 world square in meters
+ORIGIN_SHIFT = 20037508.342789244
+
+# Ground resolution of zoom 0 at the equator (m/px for 256 px tiles)
+ZOOM0_RESOLUTION = 2 * ORIGIN_SHIFT / TILE_SIZE
+
+
+class PyramidResult(TypedDict):
+    """Tiles rendered for one layer."""
+    tiles: dict[str, bytes]  # "{z}/{x}/{y}.png" -> PNG bytes
+    min_zoom: int
+    max_zoom: int
+    tile_count: int
+    skipped_empty: int
+
+
+def tile_range(bbox: tuple[float, float, float, float], zoom: int) -> tuple[range, range]:
+    """
+    Get the x and y tile indices covering a WGS84 bbox at a zoom level.
+
+    Args:
+        bbox: (west, south, east, north) in degrees
+        zoom: Zoom level
+
+    Returns:
+        (x range, y range) of tile indices
+    """
+    west, south, east, north = bbox
+    n = 2 ** zoom
+
+    def tile_x(lon: float) -> int:
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+    def tile_y(lat: float) -> int:
+        lat = max(min(lat, 85.0511), -85.0511)
+        y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+        return min(n - 1, max(0, int(y)))
+
+    return range(tile_x(west), tile_x(east) + 1), range(tile_y(north), tile_y(south) + 1)
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> tuple[float, float, float, float]:
+    """Get the EPSG:3857 bounds (west, south, east, north) of a tile."""
+    size = 2 * ORIGIN_SHIFT / 2 ** zoom
+    west = -ORIGIN_SHIFT + x * size
+    north = ORIGIN_SHIFT - y * size
+    return west, north - size, west + size, north
+
+
+def native_zoom(resolution_meters: float, latitude: float) -> int:
+    """
+    Get the lowest zoom level whose pixels are at least as fine as the source.
+
+    Args:
+        resolution_meters: Source ground resolution
+        latitude: Latitude of the layer (web-mercator pixels shrink with cos(lat))
+
+    Returns:
+        Zoom level
+    """
+    ground = ZOOM0_RESOLUTION * math.cos(math.radians(latitude))
+    return max(0, math.ceil(math.log2(ground / resolution_meters)))
+
+
+def _render_tile(
+    rgba: 'np.ndarray',
+    src_transform,
+    src_crs: str,
+    x: int,
+    y: int,
+    zoom: int,
+    resampling,
+) -> Optional['np.ndarray']:
+    """Warp the layer into one tile; None if the tile is fully transparent."""
+    import numpy as np
+    from rasterio.transform import from_bounds
+    from rasterio.warp import reproject
+
+    tile = np.zeros((4, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    reproject(
+        source=rgba,
+        destination=tile,
+        src_transform=src_transform,
+        src_crs=src_crs,
+        dst_transform=from_bounds(*tile_bounds(x, y, zoom), TILE_SIZE, TILE_SIZE),
+        dst_crs="EPSG:3857",
+        resampling=resampling,
+    )
+
+    if not tile[3].any():
+        return None
+    return tile
+
+
+def generate_pyramid(
+    rgba: 'np.ndarray',
+    bounds: tuple[float, float, float, float],
+    crs: str,
+    min_zoom: int,
+    max_zoom: Optional[int] = None,
+    resolution_meters: Optional[float] = None,
+    workers: int = 4,
+) -> PyramidResult:
+    """
+    Render an RGBA layer as a {z}/{x}/{y}.png tile pyramid in memory.
+
+    Only tiles intersecting the layer bounds are rendered, and tiles with no
+    opaque pixels are skipped. Tiles are rendered on a thread pool (GDAL
+    warping and PNG encoding release the GIL).
+
+    Args:
+        rgba: (H, W, 4) or (4, H, W) uint8 RGBA array
+        bounds: Outer pixel edges of the layer (west, south, east, north) in `crs`
+        crs: Layer CRS
+        min_zoom: Lowest zoom level
+        max_zoom: Highest zoom level (defaults to the source's native zoom)
+        resolution_meters: Source resolution, used for the default max_zoom
+        workers: Rendering threads
+
+    Returns:
+        PyramidResult with the encoded tiles by relative path
+    """
+    import io
+
+    import numpy as np
+    from PIL import Image
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_bounds
+    from rasterio.warp import transform_bounds
+
+    if rgba.shape[-1] == 4 and rgba.shape[0] != 4:
+        rgba = np.ascontiguousarray(np.transpose(rgba, (2, 0, 1)))
+
+    _, height, width = rgba.shape
+    src_transform = from_bounds(*bounds, width, height)
+    wgs84_bounds = transform_bounds(crs, "EPSG:4326", *bounds)
+
+    if max_zoom is None:
+        resolution = resolution_meters or abs(src_transform.a)
+        max_zoom = native_zoom(resolution, (wgs84_bounds[1] + wgs84_bounds[3]) / 2)
+    min_zoom = min(min_zoom, max_zoom)
+
+    def encode_tile(x: int, y: int, zoom: int) -> Optional[bytes]:
+        # Average when downsampling, nearest at and above native resolution
+        resampling = Resampling.average if zoom < max_zoom else Resampling.nearest
+        tile = _render_tile(rgba, src_transform, crs, x, y, zoom, resampling)
+        if tile is None:
+            return None
+
+        buffer = io.BytesIO()
+        Image.fromarray(np.transpose(tile, (1, 2, 0)), mode="RGBA").save(buffer, "PNG")
+        return buffer.getvalue()
+
+    jobs = []
+    for zoom in range(min_zoom, max_zoom + 1):
+        xs, ys = tile_range(wgs84_bounds, zoom)
+        jobs.extend((x, y, zoom) for x in xs for y in ys)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        encoded = list(executor.map(lambda job: encode_tile(*job), jobs))
+
+    tiles = {
+        f"{zoom}/{x}/{y}.png": data
+        for (x, y, zoom), data in zip(jobs, encoded)
+        if data is not None
+    }
+    logger.info(
+        f"  Tile pyramid z{min_zoom}-{max_zoom}: {len(tiles)} tiles "
+        f"({len(jobs) - len(tiles)} empty skipped)"
+    )
+
+    return PyramidResult(
+        tiles=tiles,
+        min_zoom=min_zoom,
+        max_zoom=max_zoom,
+        tile_count=len(tiles),
+        skipped_empty=len(jobs) - len(tiles),
+    )
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Stable tile URLs backed by on-demand presigned R2 URLs.
+
+Tile records used to store 7-day presigned URLs, which refresh_tile_urls.py
+had to re-sign and re-write in Convex every week. This service serves
+GET /tiles/{r2_key} and signs on demand instead, so records can store a
+stable URL (TILE_SERVER_URL + /tiles/ + r2_key) that never expires.
+
+Tile keys are predictable (farm ID, date, tile type), so URLs are
+authenticated with an HMAC: ingestion and refresh_tile_urls.py append
+?sig={HMAC-SHA256 of the key under TILE_URL_SECRET}, and requests without a
+valid signature get 403. Pyramid URL templates are signed once for their
+prefix, which covers every {z}/{x}/{y} tile under it. The server refuses to
+start without TILE_URL_SECRET unless --allow-unsigned is passed; only use
+that when the service sits behind an authenticating proxy, since it then
+serves any tile in the bucket to anyone who can reach it.
+
+Modes:
+    redirect (default): 302 to a presigned URL. Signatures are cached in
+        process and reused until half their lifetime has passed; the
+        browser re-sends Range headers to R2 itself.
+    proxy: stream the object through this service, passing Range requests
+        through to R2 (206 responses), for clients that cannot follow
+        cross-origin redirects.
+
+Usage:
+    cd src/ingestion
+    python tile_server.py
+    python tile_server.py --port 8080 --mode proxy
+    python tile_server.py --allow-unsigned   # behind an authenticating proxy only
+"""
+import argparse
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from storage.r2 import R2Storage, tile_url_scope, tile_url_signature
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Lifetime of the presigned URLs handed out by redirects
+DEFAULT_URL_EXPIRY_SECONDS = 3600
+
+# Presigned URLs kept in the in-process cache
+SIGNATURE_CACHE_SIZE = 10000
+
+# Browser cache lifetime of redirect responses (well inside the signature lifetime)
+REDIRECT_MAX_AGE = 300
+
+# Browser cache lifetime of proxied tiles
+PROXY_MAX_AGE = 3600
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Keys written by R2Storage: {farm}/{yyyy}/{mm}/{date}/{type}_{res}m.(png|tif)
+# and pyramid tiles {farm}/{yyyy}/{mm}/{date}/tiles/{type}/{z}/{x}/{y}.png.
+# Nothing else in the bucket is served.
+TILE_KEY_PATTERN = re.compile(
+    r"[A-Za-z0-9_-]+/\d{4}/\d{2}/\d{4}-\d{2}-\d{2}/"
+    r"(?:[a-z0-9_]+_\d+m\.(?:png|tif)|tiles/[a-z0-9_]+/\d{1,2}/\d+/\d+\.png)"
+)
+
+
+class SignedUrlCache:
+    """
+    Thread-safe LRU cache of presigned URLs.
+
+    A URL is reused until half of its lifetime has passed, so a redirect
+    always leaves the client at least expiry_seconds / 2 to fetch the tile.
+    """
+
+    def __init__(self, storage: R2Storage, expiry_seconds: int, max_entries: int = SIGNATURE_CACHE_SIZE):
+        self.storage = storage
+        self.expiry_seconds = expiry_seconds
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, r2_key: str) -> str:
+        """Get a presigned URL for a key, signing if the cached one is too old."""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(r2_key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(r2_key)
+                return entry[0]
+
+        # Signing is local (no request to R2), so it is done outside the lock
+        url = self.storage.get_signed_url(r2_key, expires_in_seconds=self.expiry_seconds)
+
+        with self._lock:
+            self._entries[r2_key] = (url, now + self.expiry_seconds / 2)
+            self._entries.move_to_end(r2_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return url
+
+
+def parse_tile_key(path: str) -> Optional[str]:
+    """Extract the R2 key from a /tiles/{r2_key} path; None unless it is a tile key."""
+    path = unquote(urlsplit(path).path)
+    if not path.startswith("/tiles/"):
+        return None
+
+    key = path[len("/tiles/"):]
+    if not TILE_KEY_PATTERN.fullmatch(key):
+        return None
+    return key
+
+
+def has_valid_signature(path: str, r2_key: str, secret: str) -> bool:
+    """Check the sig query parameter of a tile request against the key's HMAC."""
+    signatures = parse_qs(urlsplit(path).query).get("sig", [])
+    if len(signatures) != 1:
+        return False
+
+    expected = tile_url_signature(secret, tile_url_scope(r2_key))
+    return hmac.compare_digest(signatures[0], expected)
+
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    """Serve /tiles/{r2_key} by redirect or proxy, and /health."""
+
+    server: 'TileServer'
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_empty(self, status: int, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_OPTIONS(self) -> None:
+        self._send_empty(204, {
+            "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
+            "Access-Control-Allow-Headers": "Range",
+            "Access-Control-Max-Age": "86400",
+        })
+
+    def do_HEAD(self) -> None:
+        self._serve(head=True)
+
+    def do_GET(self) -> None:
+        self._serve(head=False)
+
+    def _serve(self, head: bool) -> None:
+        if urlsplit(self.path).path == "/health":
+            self._send_empty(200)
+            return
+
+        r2_key = parse_tile_key(self.path)
+        if r2_key is None:
+            self._send_empty(404)
+            return
+
+        if self.server.url_secret and not has_valid_signature(self.path, r2_key, self.server.url_secret):
+            self._send_empty(403)
+            return
+
+        if self.server.mode == "redirect":
+            self._send_empty(302, {
+                "Location": self.server.signatures.get(r2_key),
+                "Cache-Control": f"private, max-age={REDIRECT_MAX_AGE}",
+            })
+            return
+
+        self._proxy(r2_key, head)
+
+    def _proxy(self, r2_key: str, head: bool) -> None:
+        from botocore.exceptions import ClientError
+
+        byte_range = self.headers.get("Range")
+        try:
+            obj = self.server.storage.get_tile_object(r2_key, byte_range=byte_range, head=head)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                self._send_empty(404)
+            elif code == "InvalidRange":
+                self._send_empty(416)
+            else:
+                logger.error(f"Error fetching tile {r2_key}: {e}")
+                self._send_empty(502)
+            return
+
+        self.send_response(206 if obj.get("ContentRange") else 200)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "Content-Range, Content-Length, ETag")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", f"public, max-age={PROXY_MAX_AGE}")
+        self.send_header("Content-Type", obj.get("ContentType", "application/octet-stream"))
+        self.send_header("Content-Length", str(obj["ContentLength"]))
+        if obj.get("ContentRange"):
+            self.send_header("Content-Range", obj["ContentRange"])
+        if obj.get("ETag"):
+            self.send_header("ETag", obj["ETag"])
+        self.end_headers()
+
+        if head:
+            return
+
+        body = obj["Body"]
+        try:
+            for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug(f"Client closed connection while streaming {r2_key}")
+        finally:
+            body.close()
+
+
+class TileServer(ThreadingHTTPServer):
+    """HTTP server holding the shared R2 client and signature cache."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        storage: R2Storage,
+        mode: str = "redirect",
+        url_expiry_seconds: int = DEFAULT_URL_EXPIRY_SECONDS,
+        url_secret: Optional[str] = None,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            address: (host, port) to listen on
+            storage: R2 storage client
+            mode: "redirect" or "proxy"
+            url_expiry_seconds: Lifetime of presigned URLs used for redirects
+            url_secret: TILE_URL_SECRET that tile URL signatures are checked
+                against; None serves every tile key unauthenticated
+        """
+        if mode not in ("redirect", "proxy"):
+            raise ValueError(f"Unknown tile server mode: {mode}")
+
+        super().__init__(address, TileRequestHandler)
+        self.storage = storage
+        self.mode = mode
+        self.url_secret = url_secret
+        self.signatures = SignedUrlCache(storage, url_expiry_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve satellite tiles from R2 at stable URLs"
+    )
+    parser.add_argument(
+        "--host",
+        default=os.getenv("TILE_SERVER_HOST", "0.0.0.0"),
+        help="Listen address (default: TILE_SERVER_HOST or 0.0.0.0)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("TILE_SERVER_PORT", os.getenv("PORT", "8080"))),
+        help="Listen port (default: TILE_SERVER_PORT, PORT or 8080)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["redirect", "proxy"],
+        default=os.getenv("TILE_SERVER_MODE", "redirect"),
+        help="Redirect to presigned URLs or stream through (default: TILE_SERVER_MODE or redirect)",
+    )
+    parser.add_argument(
+        "--url-expiry-seconds",
+        type=int,
+        default=int(os.getenv("TILE_URL_EXPIRY_SECONDS", str(DEFAULT_URL_EXPIRY_SECONDS))),
+        help=f"Presigned URL lifetime (default: TILE_URL_EXPIRY_SECONDS or {DEFAULT_URL_EXPIRY_SECONDS})",
+    )
+    parser.add_argument(
+        "--allow-unsigned",
+        action="store_true",
+        help="Serve tiles without TILE_URL_SECRET signatures (only behind an authenticating proxy)",
+    )
+    args = parser.parse_args()
+
+    url_secret = os.getenv("TILE_URL_SECRET") or None
+    if url_secret is None:
+        if not args.allow_unsigned:
+            parser.error("TILE_URL_SECRET is not set (pass --allow-unsigned only behind an authenticating proxy)")
+        logger.warning("Serving unsigned tile URLs; any tile key is served to any caller")
+
+    server = TileServer(
+        (args.host, args.port),
+        R2Storage(),
+        mode=args.mode,
+        url_expiry_seconds=args.url_expiry_seconds,
+        url_secret=url_secret,
+    )
+    logger.info(f"Tile server ({args.mode}) listening on {args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down tile server")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
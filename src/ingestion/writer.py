@@ -13,6 +13,7 @@ from urllib.parse import urljoin
 
 import requests
 
+from http_session import get_session
 from observation_types import ObservationRecord
 
 logger = logging.getLogger(__name__)
@@ -152,7 +153,7 @@ class ConvexWriter:
                     obs_list = payload['args']['observations']
                     logger.info(f"Observations in payload: {len(obs_list)} items")
                 
-                response = requests.post(url, json=payload, headers=headers, timeout=30)
+                response = get_session().post(url, json=payload, headers=headers, timeout=30)
                 
                 # Log response status
                 logger.debug(f"Convex HTTP response status: {response.status_code}")
@@ -286,6 +287,25 @@ class ConvexWriter:
         )
         return result.get("_id", "") if isinstance(result, dict) else str(result)
 
+    def write_satellite_tiles(self, tiles: list['SatelliteTileRecord']) -> list[str]:
+        """
+        Write all tile records of a capture to Convex in one mutation.
+
+        Args:
+            tiles: Satellite tile metadata
+
+        Returns:
+            Convex document IDs in input order
+        """
+        if not tiles:
+            return []
+
+        result = self._make_request(
+            "satelliteTiles:createTilesByExternalId",
+            {"tiles": [tile.to_dict() for tile in tiles]},
+        )
+        return [str(tile_id) for tile_id in result] if isinstance(result, list) else []
+
 
 def create_convex_writer() -> Optional[ConvexWriter]:
     """
@@ -398,6 +418,30 @@ def write_satellite_tile_to_convex(tile: 'SatelliteTileRecord') -> str:
         raise
 
 
+def write_satellite_tiles_to_convex(tiles: list['SatelliteTileRecord']) -> list[str]:
+    """
+    Write satellite tile records to Convex in one batch (convenience function).
+
+    Args:
+        tiles: Satellite tile metadata
+
+    Returns:
+        Convex document IDs
+    """
+    writer = create_convex_writer()
+    if not writer:
+        logger.warning("Convex writer not configured, skipping tile write")
+        return []
+
+    try:
+        result = writer.write_satellite_tiles(tiles)
+        logger.info(f"Successfully wrote {len(result)} satellite tiles to Convex")
+        return result
+    except Exception as e:
+        logger.error(f"Error writing satellite tiles to Convex: {e}", exc_info=True)
+        raise
+
+
 def notify_completion(
     farm_external_id: str,
     success: bool,
@@ -453,7 +497,7 @@ def notify_completion(
         if failure_reason:
             logger.info(f"  Failure reason: {failure_reason}")
 
-        response = requests.post(
+        response = get_session().post(
             webhook_url,
             json=payload,
             headers={"Content-Type": "application/json"},
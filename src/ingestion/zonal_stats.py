@@ -4,7 +4,7 @@ Zonal statistics computation for paddock-level analysis.
 Aggregates raster data (NDVI, EVI, NDWI) within polygon boundaries
 (paddocks) to produce per-paddock statistics.
 """
-from typing import TYPE_CHECKING, TypedDict
+from typing import TYPE_CHECKING, Literal, TypedDict
 
 import numpy as np
 import xarray as xr
@@ -93,6 +93,8 @@ def compute_zonal_stats(
     paddocks: list[dict],
     resolution_meters: int = 10,
     cloud_mask: 'Optional[xr.DataArray]' = None,
+    method: Literal["clip", "raster"] = "raster",
+    farm_id: 'Optional[str]' = None,
 ) -> list[ZonalStatsResult]:
     """
     Compute zonal statistics for multiple paddocks.
@@ -105,12 +107,20 @@ def compute_zonal_stats(
     - Cloud-free percentage (per-paddock)
 
     Args:
-        data: Composite DataArray with band dimension (nir, red, swir, blue)
+        data: Index cube from composite.compute_index_cube (index dimension
+              with ndvi, evi, ndwi), or a composite DataArray with band
+              dimension (nir, red, swir, blue) to compute indices per paddock
         paddocks: List of paddock dictionaries with:
             - id: Paddock identifier
             - geometry: GeoJSON polygon or Shapely polygon
         resolution_meters: Resolution of the data in meters
         cloud_mask: Optional boolean DataArray where True = cloudy pixel
+        method: "raster" reduces all paddocks in a single pass over a label
+                grid of cached paddock footprints (see
+                compute_zonal_stats_raster); "clip" reprojects the paddocks and
+                clips the raster once per paddock
+        farm_id: Farm external ID, used by the "raster" method to prune
+                 cached footprints of changed paddocks
 
     Returns:
         List of ZonalStatsResult dictionaries
@@ -180,6 +190,10 @@ def compute_zonal_stats(
 
     print(f"DEBUG: Paddock GeoDataFrame CRS: {gdf.crs}")
 
+    if method == "raster":
+        # Paddocks are projected and rasterized per geometry through the mask cache
+        return compute_zonal_stats_raster(data, gdf, cloud_mask=cloud_mask, farm_id=farm_id)
+
     # Check paddock bounds
     for idx, row in gdf.iterrows():
         geom = row["geometry"]
@@ -231,8 +245,10 @@ def compute_zonal_stats(
                 continue
 
             # Get pixel values as numpy array
-            # Handle both banded and single-band data
-            if "band" in clipped.dims:
+            # Handle index cubes, banded and single-band data
+            if "index" in clipped.dims:
+                ndvi_data, evi_data, ndwi_data = _index_layers(clipped)
+            elif "band" in clipped.dims:
                 # Multi-band data - extract each band
                 band_names = list(clipped.coords.get("band", range(clipped.sizes["band"])))
                 print(f"DEBUG: Band names: {band_names}")
@@ -332,6 +348,189 @@ def compute_zonal_stats(
     return results
 
 
+def compute_zonal_stats_raster(
+    data: xr.DataArray,
+    gdf: gpd.GeoDataFrame,
+    cloud_mask: 'Optional[xr.DataArray]' = None,
+    farm_id: 'Optional[str]' = None,
+) -> list[ZonalStatsResult]:
+    """
+    Compute zonal statistics for all paddocks in one vectorized pass.
+
+    Paddocks are rasterized into an integer label grid (0 = outside any
+    paddock, i + 1 = paddock i) and every statistic is reduced per label with
+    bincount-style operations instead of clipping the raster per paddock.
+    Where paddocks overlap, the shared pixels count toward the later paddock.
+
+    Paddock footprints come from the paddock mask cache, so only paddocks
+    whose geometry or target grid changed are reprojected and rasterized.
+    With a farm_id, footprints of the farm's changed or removed paddocks are
+    pruned from the cache.
+
+    Args:
+        data: Index cube or composite with CRS written (index or band dimension, or single-band NDVI)
+        gdf: Paddock GeoDataFrame (paddock_id, geometry)
+        cloud_mask: Optional boolean DataArray where True = cloudy pixel
+        farm_id: Farm external ID whose paddock mask index is updated
+
+    Returns:
+        List of ZonalStatsResult dictionaries in GeoDataFrame order
+    """
+    from paddock_masks import get_paddock_mask_cache
+
+    height, width = data.sizes["y"], data.sizes["x"]
+    n_labels = len(gdf) + 1
+
+    # all_touched footprints, matching the per-paddock clip
+    labels = get_paddock_mask_cache().label_grid(
+        list(zip(gdf["paddock_id"], gdf.geometry)),
+        crs=data.rio.crs,
+        transform=data.rio.transform(recalc=True),
+        shape=(height, width),
+        geometry_crs=gdf.crs,
+        farm_id=farm_id,
+    )
+
+    # Indices over the whole raster
+    if "index" in data.dims:
+        ndvi, evi, ndwi = _index_layers(data)
+        evi = evi.ravel() if evi is not None else None
+        ndwi = ndwi.ravel() if ndwi is not None else None
+        ndvi = ndvi.ravel()
+    elif "band" in data.dims:
+        band_names = list(data.coords.get("band", range(data.sizes["band"])))
+        ndvi = compute_ndvi_from_bands(data, band_names).ravel()
+        evi = compute_evi_from_bands(data, band_names).ravel()
+        ndwi = compute_ndwi_from_bands(data, band_names).ravel()
+    else:
+        ndvi = data.values.ravel()
+        evi = None
+        ndwi = None
+
+    ndvi_count, ndvi_sum, ndvi_min, ndvi_max, ndvi_std = _label_reduce(labels, ndvi, n_labels, extremes=True)
+    evi_mean = _label_mean(labels, evi, n_labels)
+    ndwi_mean = _label_mean(labels, ndwi, n_labels)
+
+    # Per-paddock cloud-free fraction over all pixels inside the paddock
+    cloud_free = np.ones(n_labels)
+    if cloud_mask is not None:
+        try:
+            mask = cloud_mask
+            if mask.shape != (height, width):
+                from rasterio.enums import Resampling
+                if mask.rio.crs is None:
+                    mask = mask.rio.write_crs(mask.attrs.get("crs", data.rio.crs))
+                mask = mask.astype("uint8").rio.reproject_match(data, resampling=Resampling.nearest)
+            cloudy = np.asarray(mask.values, dtype=bool).ravel()
+            total = np.bincount(labels, minlength=n_labels)
+            cloudy_count = np.bincount(labels, weights=cloudy, minlength=n_labels)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cloud_free = np.where(total > 0, 1.0 - cloudy_count / total, 0.0)
+        except Exception as e:
+            print(f"DEBUG: Error computing cloud-free fractions: {e}")
+
+    # For a ~15ha paddock at 10m resolution, we expect ~1500 pixels
+    # Use a minimum threshold of 100 pixels (1 hectare equivalent)
+    min_pixels = 100
+
+    results = []
+    for i, paddock_id in enumerate(gdf["paddock_id"]):
+        label = i + 1
+        pixel_count = int(ndvi_count[label])
+
+        if pixel_count == 0:
+            results.append(create_invalid_result(str(paddock_id)))
+            continue
+
+        paddock_cloud_free_pct = float(cloud_free[label])
+        results.append(ZonalStatsResult(
+            paddock_id=str(paddock_id),
+            ndvi_mean=float(ndvi_sum[label] / pixel_count),
+            ndvi_min=float(ndvi_min[label]),
+            ndvi_max=float(ndvi_max[label]),
+            ndvi_std=float(ndvi_std[label]) if pixel_count > 1 else 0.0,
+            evi_mean=float(evi_mean[label]),
+            ndwi_mean=float(ndwi_mean[label]),
+            pixel_count=pixel_count,
+            cloud_free_pct=paddock_cloud_free_pct,
+            is_valid=pixel_count >= min_pixels and paddock_cloud_free_pct >= MIN_CLOUD_FREE_PCT,
+        ))
+
+    print(f"DEBUG: Raster zonal stats: {len(results)} paddocks, {sum(r['is_valid'] for r in results)} valid")
+
+    return results
+
+
+def _label_reduce(
+    labels: np.ndarray,
+    values: np.ndarray,
+    n_labels: int,
+    extremes: bool = False,
+) -> tuple:
+    """
+    Reduce values per label, ignoring NaN and background (label 0).
+
+    Args:
+        labels: Flat int label array
+        values: Flat value array, same length as labels
+        n_labels: Number of labels including background
+        extremes: Also compute min, max and std
+
+    Returns:
+        (count, sum) or (count, sum, min, max, std), each an array indexed by label
+    """
+    valid = (labels > 0) & ~np.isnan(values)
+    lab = labels[valid]
+    vals = values[valid].astype(np.float64)
+
+    count = np.bincount(lab, minlength=n_labels)
+    total = np.bincount(lab, weights=vals, minlength=n_labels)
+
+    if not extremes:
+        return count, total
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        # Two-pass variance for numerical stability (population std, like np.nanstd)
+        sq_dev = np.bincount(lab, weights=(vals - mean[lab]) ** 2, minlength=n_labels)
+        std = np.sqrt(sq_dev / count)
+
+    minimum = np.full(n_labels, np.nan)
+    maximum = np.full(n_labels, np.nan)
+    if lab.size:
+        # Group values by label, then reduce each contiguous run
+        order = np.argsort(lab, kind="stable")
+        sorted_lab = lab[order]
+        sorted_vals = vals[order]
+        starts = np.flatnonzero(np.r_[True, sorted_lab[1:] != sorted_lab[:-1]])
+        present = sorted_lab[starts]
+        minimum[present] = np.minimum.reduceat(sorted_vals, starts)
+        maximum[present] = np.maximum.reduceat(sorted_vals, starts)
+
+    return count, total, minimum, maximum, std
+
+
+def _label_mean(labels: np.ndarray, values: 'Optional[np.ndarray]', n_labels: int) -> np.ndarray:
+    """Per-label NaN-ignoring mean (NaN where a label has no valid values)."""
+    if values is None:
+        return np.full(n_labels, np.nan)
+    count, total = _label_reduce(labels, values, n_labels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _index_layers(data: xr.DataArray) -> tuple:
+    """Get (ndvi, evi, ndwi) arrays from an index cube (None for missing layers)."""
+    names = list(data.coords["index"].values)
+    layers = [
+        data.sel(index=name).values if name in names else None
+        for name in ("ndvi", "evi", "ndwi")
+    ]
+    if layers[0] is None:
+        raise ValueError(f"Index cube has no ndvi layer. Available: {names}")
+    return tuple(layers)
+
+
 def compute_ndvi_from_bands(data: xr.DataArray, band_names: list) -> np.ndarray:
     """Compute NDVI array from band data."""
     try: